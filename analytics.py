@@ -0,0 +1,97 @@
+"""
+Posting analytics read from the rollup tables.
+
+user_daily_stats and user_hourly_stats are kept up to date as posts change
+status and as engagement is synced (see database.py), so these queries
+read at most one row per day in the range plus 168 hour-of-week rows,
+however many posts a user has. All buckets are UTC.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from database import db, UserDailyStats, UserHourlyStats
+
+# Longest range the analytics API serves, in days
+MAX_DAYS = 3660
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+FIELDS = ('published', 'failed', 'scheduled', 'likes', 'comments')
+
+def _success_rate(published, failed):
+    attempts = published + failed
+    return round(published / attempts * 100, 2) if attempts else None
+
+def get_best_hours(user_id, limit=3):
+    """The hours of the week whose posts drew the most engagement per post.
+    
+    Falls back to the hours with the most published posts while no
+    engagement has been synced.
+    """
+    rows = db.session.execute(
+        select(UserHourlyStats).where(UserHourlyStats.user_id == user_id, UserHourlyStats.published > 0)
+    ).scalars().all()
+    
+    def engagement(row):
+        return (row.likes + row.comments) / row.published
+    
+    ranked = sorted(rows, key=lambda row: (engagement(row), row.published), reverse=True)
+    return [
+        {
+            'weekday': WEEKDAYS[row.weekday],
+            'hour': row.hour,
+            'published': row.published,
+            'engagement_per_post': round(engagement(row), 2),
+            'success_rate': _success_rate(row.published, row.failed)
+        }
+        for row in ranked[:limit]
+    ]
+
+def get_analytics(user_id, days=90, now=None):
+    """Totals, daily and weekly series and best posting hours over the last `days` days.
+    
+    Days with no activity are left out of the daily series.
+    """
+    now = now or datetime.utcnow()
+    days = max(1, min(int(days), MAX_DAYS))
+    today = now.date()
+    start = today - timedelta(days=days - 1)
+    
+    rows = db.session.execute(
+        select(UserDailyStats)
+        .where(UserDailyStats.user_id == user_id, UserDailyStats.day >= start, UserDailyStats.day <= today)
+        .order_by(UserDailyStats.day.asc())
+    ).scalars().all()
+    
+    totals = dict.fromkeys(FIELDS, 0)
+    weeks = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+    daily = []
+    for row in rows:
+        counts = {field: getattr(row, field) for field in FIELDS}
+        daily.append({'day': row.day.isoformat(), **counts})
+        week = weeks[row.day - timedelta(days=row.day.weekday())]
+        for field, value in counts.items():
+            totals[field] += value
+            week[field] += value
+    
+    weekly = [
+        {'week_start': week_start.isoformat(), **counts,
+         'success_rate': _success_rate(counts['published'], counts['failed'])}
+        for week_start, counts in sorted(weeks.items())
+    ]
+    
+    return {
+        'days': days,
+        'start': start.isoformat(),
+        'end': today.isoformat(),
+        'totals': {
+            **totals,
+            'success_rate': _success_rate(totals['published'], totals['failed']),
+            'posts_per_week': round(totals['published'] / (days / 7), 2),
+            'engagement_per_post': round((totals['likes'] + totals['comments']) / totals['published'], 2)
+            if totals['published'] else None
+        },
+        'daily': daily,
+        'weekly': weekly,
+        'best_hours': get_best_hours(user_id)
+    }
@@ -1,23 +1,30 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
+import hashlib
+import json
 import os
 import uuid
-from PIL import Image
+from functools import wraps
 
 # Import our modules
 # Use production config if FLASK_ENV is set to production
-if os.environ.get('FLASK_ENV') == 'production':
-    from config_production import Config
-else:
-    try:
-        from config_local import Config
-    except ImportError:
-        from config import Config
-from database import db, init_db, User, Post, PostStatus, get_user_stats
+from config import load_config
+Config = load_config()
+from database import db, init_db, User, Post, PostStatus, MediaStatus, get_user_stats, get_posts_page, get_retry_stats, get_post_version, POST_CARD_COLUMNS, post_card_dict
 from linkedin_api import LinkedInAPI
 from scheduler import PostScheduler
+from media import MediaPipeline, InvalidImageError, get_cached_asset, remember_asset, remove_after_commit
+from rate_limiter import RateLimiter, member_bucket, APP_BUCKET
+from retry_policy import retry_metrics
+from bulk_import import detect_format, text_stream, iter_rows, import_posts
+from engagement_sync import get_engagement_series
+from analytics import get_analytics
+from user_cache import UserCache
+from fragment_cache import init_fragment_cache
+from bulk_operations import ACTIONS, build_criteria, count_matching, parse_shift_minutes, parse_time, run_bulk_action
+import metrics
 
 # Create Flask app
 app = Flask(__name__)
@@ -32,12 +39,17 @@ login_manager.login_message = 'Please connect your LinkedIn account to access th
 # Initialize database
 init_db(app)
 
+# {% cache %} blocks in templates (rendered post cards)
+init_fragment_cache(app)
+
+# Time every request for /metrics
+metrics.init_app(app)
+
+# Initialize the shared LinkedIn rate limiter (used by the API clients below)
+rate_limiter = RateLimiter(app)
+
 # Initialize LinkedIn API
-linkedin_api = LinkedInAPI(
-    app.config['LINKEDIN_CLIENT_ID'],
-    app.config['LINKEDIN_CLIENT_SECRET'],
-    app.config['LINKEDIN_REDIRECT_URI']
-)
+linkedin_api = LinkedInAPI.from_config(app.config)
 
 # Initialize scheduler
 post_scheduler = PostScheduler(app)
@@ -45,23 +57,89 @@ post_scheduler = PostScheduler(app)
 # Create upload folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Initialize media pipeline (image processing in worker processes)
+media_pipeline = MediaPipeline(app)
+
+# Every web process may run this: pending images are claimed in the
+# database, so each is processed by one process, and images whose process
+# stopped are taken over once their lease runs out
+if media_pipeline.active:
+    media_pipeline.recover_pending()
+    post_scheduler.scheduler.add_job(
+        func=media_pipeline.recover_pending,
+        trigger='interval',
+        seconds=app.config['MEDIA_PENDING_RECHECK_SECONDS'],
+        id='recover_pending_media',
+        jobstore='local',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+
+# Logged-in users are cached per process, without their tokens
+user_cache = UserCache.from_config(app.config)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id))
+
+# Dashboard tabs and the statuses each one lists
+STATUS_FILTERS = {
+    'draft': [PostStatus.DRAFT],
+    'scheduled': [PostStatus.SCHEDULED],
+    'published': [PostStatus.PUBLISHED],
+    'failed': [PostStatus.FAILED],
+    'cancelled': [PostStatus.CANCELLED],
+    'history': [PostStatus.PUBLISHED, PostStatus.FAILED],
+}
+
+def parse_status_filter(value):
+    """Turn a comma separated ?status= value into a list of PostStatus, or None for all"""
+    if not value:
+        return None
+    statuses = []
+    for name in value.split(','):
+        name = name.strip().lower()
+        if name not in STATUS_FILTERS:
+            raise ValueError(f"Unknown status: {name}")
+        statuses.extend(STATUS_FILTERS[name])
+    return statuses
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def resize_image(image_path, max_size=(1200, 1200)):
-    """Resize image to fit within max_size while maintaining aspect ratio"""
-    try:
-        with Image.open(image_path) as img:
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            img.save(image_path, optimize=True, quality=85)
-        return True
-    except Exception as e:
-        print(f"Error resizing image: {e}")
-        return False
+def posts_etag():
+    """Weak ETag for the current user's posts at their current version"""
+    key = ':'.join(str(part) for part in (
+        app.config['ETAG_SALT'], current_user.id, get_post_version(current_user.id),
+        current_user.name, current_user.profile_picture
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+def conditional_on_posts(view):
+    """Answer If-None-Match with 304 while the user's posts are unchanged, before running the view.
+    
+    For views whose response depends only on the user's posts and profile.
+    Pages with flash messages waiting are always rendered in full.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not app.config['CONDITIONAL_GET_ENABLED'] or session.get('_flashes'):
+            return view(*args, **kwargs)
+        
+        # Read before the view runs: a write in between only makes the tag stale, never wrong
+        etag = posts_etag()
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
+    return wrapper
 
 # Routes
 @app.route('/')
@@ -108,9 +186,7 @@ def linkedin_callback():
     
     if user:
         # Update existing user
-        user.access_token = token_data['access_token']
-        user.refresh_token = token_data.get('refresh_token')
-        user.token_expires_at = datetime.utcnow() + timedelta(seconds=token_data.get('expires_in', 3600))
+        user.set_tokens(token_data)
         user.last_login = datetime.utcnow()
         user.name = profile_data['name']
         user.email = profile_data.get('email')
@@ -129,6 +205,7 @@ def linkedin_callback():
         db.session.add(user)
     
     db.session.commit()
+    user_cache.invalidate(user.id)
     login_user(user)
     flash('Successfully connected to LinkedIn!', 'success')
     return redirect(url_for('dashboard'))
@@ -137,30 +214,48 @@ def linkedin_callback():
 @login_required
 def logout():
     """Logout user"""
+    user_cache.invalidate(current_user.id)
     logout_user()
     flash('Successfully logged out!', 'info')
     return redirect(url_for('index'))
 
 @app.route('/dashboard')
 @login_required
+@conditional_on_posts
 def dashboard():
     """Main dashboard"""
-    # Get user's posts
-    posts = Post.query.filter_by(user_id=current_user.id).order_by(Post.created_at.desc()).all()
+    page_size = app.config['POSTS_PAGE_SIZE']
+    
+    # First page of each tab, further pages are loaded from /api/posts.
+    # Cards only need a preview, so full post bodies are never read here.
+    posts, posts_cursor = get_posts_page(current_user.id, limit=page_size, columns=POST_CARD_COLUMNS)
+    drafts, drafts_cursor = get_posts_page(
+        current_user.id, statuses=STATUS_FILTERS['draft'], limit=page_size, columns=POST_CARD_COLUMNS
+    )
+    history_posts, history_cursor = get_posts_page(
+        current_user.id, statuses=STATUS_FILTERS['history'], limit=page_size, columns=POST_CARD_COLUMNS
+    )
     
     # Get statistics
     stats = get_user_stats(current_user.id)
     
     # Get scheduled posts for calendar
-    scheduled_posts = Post.query.filter_by(
-        user_id=current_user.id,
-        status=PostStatus.SCHEDULED
-    ).order_by(Post.scheduled_time.asc()).all()
+    scheduled_posts, scheduled_cursor = get_posts_page(
+        current_user.id, statuses=STATUS_FILTERS['scheduled'], limit=page_size, order='scheduled',
+        columns=POST_CARD_COLUMNS
+    )
     
     return render_template('dashboard.html', 
                          posts=posts, 
+                         posts_cursor=posts_cursor,
+                         drafts=drafts,
+                         drafts_cursor=drafts_cursor,
+                         history_posts=history_posts,
+                         history_cursor=history_cursor,
                          stats=stats, 
-                         scheduled_posts=scheduled_posts)
+                         scheduled_posts=scheduled_posts,
+                         scheduled_cursor=scheduled_cursor,
+                         poll_seconds=app.config['DASHBOARD_POLL_SECONDS'])
 
 @app.route('/create-post')
 @login_required
@@ -168,6 +263,42 @@ def create_post():
     """Create new post page"""
     return render_template('create_post.html')
 
+@app.route('/api/posts', methods=['GET'])
+@login_required
+@conditional_on_posts
+def api_list_posts():
+    """API endpoint to page through the user's posts (?view=preview for card fields only)"""
+    preview = request.args.get('view') == 'preview'
+    try:
+        statuses = parse_status_filter(request.args.get('status'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    order = request.args.get('order', 'created')
+    if order not in ('created', 'scheduled'):
+        return jsonify({'error': 'order must be "created" or "scheduled"'}), 400
+    
+    limit = request.args.get('limit', app.config['POSTS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['POSTS_PAGE_SIZE_MAX']))
+    
+    try:
+        posts, next_cursor = get_posts_page(
+            current_user.id,
+            statuses=statuses,
+            cursor=request.args.get('cursor') or None,
+            limit=limit,
+            order=order,
+            columns=POST_CARD_COLUMNS if preview else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'posts': [post_card_dict(post) if preview else post.to_dict() for post in posts],
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
+
 @app.route('/api/posts', methods=['POST'])
 @login_required
 def api_create_post():
@@ -180,32 +311,36 @@ def api_create_post():
         if not content:
             return jsonify({'error': 'Post content is required'}), 400
         
-        # Handle image upload
+        # Handle image upload - stored by content hash, resized in the background
         image_path = None
+        media = None
+        media_created = False
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                # Generate unique filename
                 filename = secure_filename(file.filename)
-                name, ext = os.path.splitext(filename)
-                unique_filename = f"{name}_{uuid.uuid4().hex[:8]}{ext}"
-                
-                # Save file
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(file_path)
+                _, ext = os.path.splitext(filename)
                 
-                # Resize image
-                if resize_image(file_path):
-                    image_path = f"uploads/{unique_filename}"
-                else:
-                    os.remove(file_path)
-                    return jsonify({'error': 'Failed to process image'}), 400
+                # Identical images share one stored copy
+                try:
+                    media, media_created = media_pipeline.store_upload(file, ext)
+                except InvalidImageError as e:
+                    return jsonify({'error': str(e)}), 400
+                image_path = f"uploads/{media.filename}"
         
         # Handle different schedule types
         scheduled_time = None
         post_status = PostStatus.DRAFT
         
-        if schedule_type == 'now':
+        if schedule_type == 'now' and media and media.status != MediaStatus.READY:
+            # Publish as soon as the image is processed
+            post_status = PostStatus.SCHEDULED
+            scheduled_time = datetime.utcnow()
+        elif schedule_type == 'now' and not app.config['RUN_SCHEDULER']:
+            # A worker process does the publishing - keep LinkedIn calls out of the request
+            post_status = PostStatus.SCHEDULED
+            scheduled_time = datetime.utcnow()
+        elif schedule_type == 'now':
             # Publish immediately - don't use scheduler
             post_status = PostStatus.DRAFT  # Start as draft, will be updated after publishing
             scheduled_time = None
@@ -228,6 +363,8 @@ def api_create_post():
             user_id=current_user.id,
             content=content,
             image_path=image_path,
+            media_hash=media.content_hash if media else None,
+            media_status=media.status if media else None,
             status=post_status,
             scheduled_time=scheduled_time
         )
@@ -235,53 +372,64 @@ def api_create_post():
         db.session.add(post)
         db.session.commit()
         
+        if media_created and not media_pipeline.enqueue(media.content_hash, media.filename):
+            media_pipeline.set_status(media.content_hash, MediaStatus.FAILED)
+            db.session.commit()
+            return jsonify({'error': 'Failed to process image'}), 400
+        
         # Handle immediate publishing
-        if schedule_type == 'now':
+        if schedule_type == 'now' and post_status != PostStatus.SCHEDULED:
             try:
-                # Publish immediately to LinkedIn
+                # Publish immediately to LinkedIn; the cached user has no token, so read it now
+                access_token = current_user.access_token
                 image_asset_id = None
                 if image_path:
+                    image_asset_id = get_cached_asset(current_user.id, media.content_hash)
                     image_file_path = os.path.join('static', image_path.lstrip('/static/'))
-                    if os.path.exists(image_file_path):
+                    if not image_asset_id and os.path.exists(image_file_path):
                         image_asset_id = linkedin_api.upload_image(
-                            current_user.access_token,
+                            access_token,
                             image_file_path,
                             current_user.linkedin_id
                         )
+                        if image_asset_id:
+                            remember_asset(current_user.id, media.content_hash, image_asset_id,
+                                           app.config['LINKEDIN_ASSET_CACHE_TTL_HOURS'])
                 
                 # Create LinkedIn post
                 linkedin_post_id = linkedin_api.create_post(
-                    current_user.access_token,
+                    access_token,
                     current_user.linkedin_id,
                     content,
                     image_asset_id
                 )
                 
-                if linkedin_post_id:
-                    # Update post status to published
-                    post.status = PostStatus.PUBLISHED
-                    post.published_time = datetime.utcnow()
-                    post.linkedin_post_id = linkedin_post_id
-                    db.session.commit()
-                    flash('Post published successfully!', 'success')
-                else:
-                    # Publishing failed
-                    post.status = PostStatus.FAILED
-                    post.error_message = 'Failed to publish to LinkedIn'
-                    db.session.commit()
-                    flash('Failed to publish post to LinkedIn', 'error')
-                    
+                # create_post raises when LinkedIn returns no id, so failures all go through the retry policy
+                metrics.record_published(post)
+                post.status = PostStatus.PUBLISHED
+                post.published_time = datetime.utcnow()
+                post.linkedin_post_id = linkedin_post_id
+                db.session.commit()
+                flash('Post published successfully!', 'success')
+            
             except Exception as e:
                 print(f"Error publishing post immediately: {e}")
-                post.status = PostStatus.FAILED
-                post.error_message = str(e)
+                # Same retry policy as scheduled posts: outages and rate limits are retried later
+                if post_scheduler.record_failure(post, e):
+                    flash('LinkedIn could not take the post right now - it will be retried automatically', 'warning')
+                else:
+                    flash('Failed to publish post immediately', 'error')
                 db.session.commit()
-                flash('Failed to publish post immediately', 'error')
-                
-        # Schedule post if needed (for future posts)
+        
+        # Schedule post if needed (for future posts, or 'now' posts waiting on their image)
         elif scheduled_time and post_status == PostStatus.SCHEDULED:
             if post_scheduler.schedule_post(post.id, scheduled_time):
-                flash('Post scheduled successfully!', 'success')
+                if schedule_type == 'now' and media and media.status != MediaStatus.READY:
+                    flash('Post will be published as soon as its image is processed', 'success')
+                elif schedule_type == 'now':
+                    flash('Post is being published...', 'success')
+                else:
+                    flash('Post scheduled successfully!', 'success')
             else:
                 post.status = PostStatus.DRAFT
                 db.session.commit()
@@ -294,11 +442,88 @@ def api_create_post():
             'post_id': post.id,
             'redirect': url_for('dashboard')
         })
-        
+    
     except Exception as e:
         print(f"Error creating post: {e}")
         return jsonify({'error': 'An error occurred while creating the post'}), 500
 
+@app.route('/api/posts/import', methods=['POST'])
+@login_required
+def api_import_posts():
+    """API endpoint to import posts from a CSV or JSONL file, streaming progress as NDJSON"""
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({'error': 'A CSV or JSONL file is required'}), 400
+    
+    try:
+        fmt = detect_format(file.filename, request.form.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Rows are parsed and inserted while the response streams, one batch at a time
+    events = import_posts(
+        current_user.id,
+        iter_rows(text_stream(file.stream), fmt),
+        post_scheduler,
+        batch_size=app.config['BULK_IMPORT_BATCH_SIZE'],
+        max_rows=app.config['BULK_IMPORT_MAX_ROWS'],
+        dry_run=request.form.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    )
+    return Response(
+        stream_with_context(json.dumps(event) + '\n' for event in events),
+        mimetype='application/x-ndjson'
+    )
+
+@app.route('/api/posts/bulk', methods=['POST'])
+@login_required
+def api_bulk_posts():
+    """API endpoint to delete, cancel, reschedule or shift many posts at once"""
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    if action not in ACTIONS:
+        return jsonify({'error': f"Action must be one of: {', '.join(ACTIONS)}"}), 400
+    
+    now = datetime.utcnow()
+    scheduled_time = None
+    shift_seconds = 0
+    try:
+        criteria = build_criteria(current_user.id, data.get('ids'), data.get('filter'), now)
+        if action == 'reschedule':
+            if not data.get('scheduled_time'):
+                return jsonify({'error': 'Scheduled time is required'}), 400
+            scheduled_time = parse_time(data['scheduled_time'], 'scheduled time')
+            if scheduled_time <= now:
+                return jsonify({'error': 'Scheduled time must be in the future'}), 400
+        elif action == 'shift':
+            shift_seconds = parse_shift_minutes(data.get('shift_minutes')) * 60
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if data.get('dry_run'):
+        matched = count_matching(action, criteria, shift_seconds, now)
+        return jsonify({'success': True, 'dry_run': True, 'action': action,
+                        'count': sum(matched.values()), 'by_status': matched})
+    
+    try:
+        changed = run_bulk_action(
+            action, criteria, post_scheduler, media_pipeline,
+            scheduled_time=scheduled_time, shift_seconds=shift_seconds, now=now
+        )
+        return jsonify({'success': True, 'action': action, 'count': sum(changed.values()), 'by_status': changed})
+    except Exception as e:
+        print(f"Error in bulk {action}: {e}")
+        return jsonify({'error': f'Failed to {action} posts'}), 500
+
+@app.route('/api/posts/<int:post_id>', methods=['GET'])
+@login_required
+@conditional_on_posts
+def api_get_post(post_id):
+    """API endpoint for one post with its full content"""
+    post = Post.query.filter_by(id=post_id, user_id=current_user.id).first()
+    if not post:
+        return jsonify({'error': 'Post not found'}), 404
+    return jsonify(post.to_dict())
+
 @app.route('/api/posts/<int:post_id>', methods=['DELETE'])
 @login_required
 def api_delete_post(post_id):
@@ -313,20 +538,21 @@ def api_delete_post(post_id):
         if post.status == PostStatus.SCHEDULED:
             post_scheduler.cancel_scheduled_post(post.id)
         
-        # Delete image file if exists
-        if post.image_path:
-            image_file_path = os.path.join('static', post.image_path.lstrip('/static/'))
-            if os.path.exists(image_file_path):
-                os.remove(image_file_path)
+        # Release the image - the file is removed once no post uses it
+        if post.media_hash:
+            media_pipeline.release(post.media_hash)
+        elif post.image_path:
+            remove_after_commit(os.path.join('static', post.image_path.lstrip('/static/')))
         
-        # Delete post
+        # Delete post (image files go only once this commits)
         db.session.delete(post)
         db.session.commit()
         
         return jsonify({'success': True})
-        
+    
     except Exception as e:
         print(f"Error deleting post: {e}")
+        db.session.rollback()
         return jsonify({'error': 'Failed to delete post'}), 500
 
 @app.route('/api/posts/<int:post_id>/publish', methods=['POST'])
@@ -354,7 +580,7 @@ def api_publish_post(post_id):
             post.status = PostStatus.DRAFT
             db.session.commit()
             return jsonify({'error': 'Failed to schedule post for publishing'}), 500
-            
+    
     except Exception as e:
         print(f"Error publishing post: {e}")
         return jsonify({'error': 'Failed to publish post'}), 500
@@ -387,15 +613,64 @@ def api_reschedule_post(post_id):
             return jsonify({'success': True, 'message': 'Post rescheduled successfully'})
         else:
             return jsonify({'error': 'Failed to reschedule post'}), 500
-            
+    
     except ValueError:
         return jsonify({'error': 'Invalid scheduled time format'}), 400
     except Exception as e:
         print(f"Error rescheduling post: {e}")
         return jsonify({'error': 'Failed to reschedule post'}), 500
 
+@app.route('/api/posts/<int:post_id>/engagement')
+@login_required
+def api_post_engagement(post_id):
+    """API endpoint for a published post's likes and comments over time"""
+    post = Post.query.filter_by(id=post_id, user_id=current_user.id).first()
+    
+    if not post:
+        return jsonify({'error': 'Post not found'}), 404
+    
+    return jsonify({
+        'post_id': post.id,
+        'like_count': post.like_count,
+        'comment_count': post.comment_count,
+        'synced_at': post.engagement_synced_at.isoformat() if post.engagement_synced_at else None,
+        'next_sync_at': post.engagement_next_sync_at.isoformat() if post.engagement_next_sync_at else None,
+        'snapshots': [
+            {'captured_at': captured_at.isoformat(), 'like_count': likes, 'comment_count': comments}
+            for captured_at, likes, comments in get_engagement_series(post.id)
+        ]
+    })
+
+@app.route('/api/rate-limits')
+@login_required
+def api_rate_limits():
+    """API endpoint to show how full the current user's and the app's rate limit buckets are"""
+    return jsonify({'buckets': rate_limiter.levels([member_bucket(current_user.linkedin_id), APP_BUCKET])})
+
+@app.route('/api/retries')
+@login_required
+def api_retries():
+    """API endpoint to show the retry policy and the current user's failed and retrying posts"""
+    policy = post_scheduler.retry_policy
+    return jsonify({
+        'posts': get_retry_stats(current_user.id),
+        'max_attempts': {cls.value: cap for cls, cap in policy.max_attempts.items()},
+        'process_metrics': retry_metrics.snapshot()
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (bearer token protected when METRICS_TOKEN is set)"""
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({'error': 'Not found'}), 404
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return metrics.metrics_response(app)
+
 @app.route('/api/stats')
 @login_required
+@conditional_on_posts
 def api_stats():
     """API endpoint to get user statistics"""
     stats = get_user_stats(current_user.id)
@@ -407,13 +682,25 @@ def analytics():
     """Analytics page"""
     stats = get_user_stats(current_user.id)
     
-    # Get recent posts for detailed analytics
-    recent_posts = Post.query.filter_by(user_id=current_user.id)\
-                           .filter(Post.status.in_([PostStatus.PUBLISHED, PostStatus.FAILED]))\
-                           .order_by(Post.created_at.desc())\
-                           .limit(20).all()
+    # Recent published and failed posts, as previews
+    recent_posts, _ = get_posts_page(
+        current_user.id, statuses=STATUS_FILTERS['history'], limit=20, columns=POST_CARD_COLUMNS
+    )
     
-    return render_template('analytics.html', stats=stats, recent_posts=recent_posts)
+    # Last 30 days and best posting hours, from the rollup tables
+    insights = get_analytics(current_user.id, days=30)
+    
+    return render_template('analytics.html', stats=stats, recent_posts=recent_posts, insights=insights)
+
+@app.route('/api/analytics')
+@login_required
+def api_analytics():
+    """API endpoint for posting cadence, success rate over time and best posting hours"""
+    try:
+        days = int(request.args.get('days', 90))
+    except ValueError:
+        return jsonify({'error': 'days must be a whole number'}), 400
+    return jsonify(get_analytics(current_user.id, days=days))
 
 if __name__ == '__main__':
     print("Starting LinkedIn Scheduler App...")
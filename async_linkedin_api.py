@@ -0,0 +1,240 @@
+import asyncio
+from contextlib import asynccontextmanager
+import json
+import time
+from urllib.parse import quote
+import aiohttp
+from linkedin_api import (
+    DEFAULT_TIMEOUT,
+    DEFAULT_UPLOAD_TIMEOUT,
+    DEFAULT_BASE_URL,
+    build_register_upload_request,
+    parse_register_upload_response,
+    build_post_payload,
+    post_id_from_response,
+    LinkedInAPIError,
+)
+from metrics import observe_api_call
+from rate_limiter import RateLimited, get_rate_limiter, member_bucket, parse_retry_after, APP_BUCKET
+
+DEFAULT_CONCURRENCY = 100
+
+class AsyncLinkedInAPI:
+    """asyncio counterpart of LinkedInAPI's publishing calls.
+    
+    Use as an async context manager so the connection pool is opened once
+    per batch and closed afterwards:
+        
+        async with AsyncLinkedInAPI.from_config(app.config) as api:
+            await api.create_post(token, member_id, 'Hello')
+    """
+    
+    def __init__(self, base_url=DEFAULT_BASE_URL, concurrency=DEFAULT_CONCURRENCY,
+                 timeout=DEFAULT_TIMEOUT, upload_timeout=DEFAULT_UPLOAD_TIMEOUT, rate_limiter=None):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter
+        self.timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        self.upload_timeout = aiohttp.ClientTimeout(sock_connect=upload_timeout[0], sock_read=upload_timeout[1])
+        self.session = None
+    
+    @classmethod
+    def from_config(cls, config, rate_limiter=None):
+        """Build a client from Flask config, sharing the process-wide rate limiter"""
+        connect_timeout = config.get('LINKEDIN_HTTP_CONNECT_TIMEOUT', DEFAULT_TIMEOUT[0])
+        return cls(
+            base_url=config.get('LINKEDIN_API_BASE_URL', DEFAULT_BASE_URL),
+            concurrency=config.get('PUBLISH_ASYNC_CONCURRENCY', DEFAULT_CONCURRENCY),
+            timeout=(connect_timeout, config.get('LINKEDIN_HTTP_READ_TIMEOUT', DEFAULT_TIMEOUT[1])),
+            upload_timeout=(connect_timeout, config.get('LINKEDIN_HTTP_UPLOAD_TIMEOUT', DEFAULT_UPLOAD_TIMEOUT[1])),
+            rate_limiter=rate_limiter or get_rate_limiter()
+        )
+    
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+        self.session = None
+    
+    async def _throttle(self, member_id=None):
+        """Wait for a rate limit token without blocking the event loop (raises RateLimited)"""
+        if not self.rate_limiter:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.rate_limiter.max_wait
+        while True:
+            wait, key = await asyncio.to_thread(self.rate_limiter.reserve, member_id)
+            if not wait:
+                return
+            if loop.time() + wait > deadline:
+                raise RateLimited(key, wait)
+            await asyncio.sleep(wait)
+    
+    async def _check_rate_limited(self, response, member_id=None):
+        """On a 429, hold the member's calls for Retry-After and raise RateLimited"""
+        if response.status != 429:
+            return
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if self.rate_limiter:
+            await asyncio.to_thread(self.rate_limiter.block, member_id, retry_after)
+        raise RateLimited(member_bucket(member_id) if member_id else APP_BUCKET, retry_after, from_linkedin=True)
+    
+    @asynccontextmanager
+    async def _request(self, endpoint, method, url, **kwargs):
+        """Open a response on the shared session, timing the call under `endpoint`"""
+        started = time.perf_counter()
+        observed = False
+        try:
+            async with self.session.request(method, url, **kwargs) as response:
+                observe_api_call(endpoint, method, response.status, time.perf_counter() - started)
+                observed = True
+                yield response
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if not observed:
+                observe_api_call(endpoint, method, type(e).__name__, time.perf_counter() - started)
+            raise
+    
+    def _headers(self, access_token):
+        return {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        }
+    
+    async def upload_image(self, access_token, image_path, user_id):
+        """Upload image to LinkedIn; returns the asset URN.
+        
+        Raises LinkedInAPIError on failure and RateLimited when throttled.
+        """
+        try:
+            # Step 1: Register upload
+            await self._throttle(user_id)
+            async with self._request(
+                'register_upload', 'POST',
+                f"{self.base_url}/assets?action=registerUpload",
+                headers=self._headers(access_token),
+                data=json.dumps(build_register_upload_request(user_id))
+            ) as register_response:
+                await self._check_rate_limited(register_response, user_id)
+                register_response.raise_for_status()
+                register_result = await register_response.json(content_type=None)
+            
+            # Step 2: Upload the image (read off the event loop)
+            upload_url, asset_id = parse_register_upload_response(register_result)
+            image_data = await asyncio.to_thread(_read_file, image_path)
+            
+            async with self._request(
+                'upload', 'PUT', upload_url, data=image_data, timeout=self.upload_timeout
+            ) as upload_response:
+                await self._check_rate_limited(upload_response, user_id)
+                upload_response.raise_for_status()
+            
+            return asset_id
+        except aiohttp.ClientResponseError as e:
+            print(f"Error uploading image: {e}")
+            raise LinkedInAPIError(f"Failed to upload image to LinkedIn: {e}", e.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error uploading image: {e!r}")
+            raise LinkedInAPIError(f"Failed to upload image to LinkedIn: {e!r}")
+    
+    async def create_post(self, access_token, user_id, content, image_asset_id=None):
+        """Create a LinkedIn post; returns its id.
+        
+        Raises LinkedInAPIError on failure, including a success response
+        without a readable id, and RateLimited when throttled.
+        """
+        await self._throttle(user_id)
+        try:
+            async with self._request(
+                'ugc_posts', 'POST',
+                f"{self.base_url}/ugcPosts",
+                headers=self._headers(access_token),
+                data=json.dumps(build_post_payload(user_id, content, image_asset_id))
+            ) as response:
+                await self._check_rate_limited(response, user_id)
+                if response.status >= 400:
+                    print(f"Error creating post: {response.status}")
+                    print(f"Response: {await response.text()}")
+                    raise LinkedInAPIError(
+                        f"Failed to create post on LinkedIn: HTTP {response.status}", response.status
+                    )
+                # The post was most likely created, so a bad body keeps its status
+                # and is not retried like a network error
+                try:
+                    body = await response.json(content_type=None)
+                except ValueError:
+                    body = None
+                return post_id_from_response(body, response.status)
+        except aiohttp.ClientError as e:
+            print(f"Error creating post: {e}")
+            raise LinkedInAPIError(f"Failed to create post on LinkedIn: {e}")
+        except asyncio.TimeoutError:
+            print("Error creating post: request timed out")
+            raise LinkedInAPIError("Failed to create post on LinkedIn: request timed out")
+    
+    async def get_post_stats(self, access_token, post_id, member_id=None):
+        """Get statistics for a specific post (raises RateLimited instead of failing when throttled)"""
+        await self._throttle(member_id)
+        try:
+            async with self._request(
+                'social_actions', 'GET',
+                f"{self.base_url}/socialActions/{quote(post_id, safe='')}",
+                headers=self._headers(access_token)
+            ) as response:
+                await self._check_rate_limited(response, member_id)
+                response.raise_for_status()
+                return await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error getting post stats: {e}")
+            return None
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+async def publish_many(api, jobs, concurrency=DEFAULT_CONCURRENCY, before_create=None):
+    """Publish many posts on one event loop with at most `concurrency` in flight.
+    
+    Each job is a dict with post_id, access_token, linkedin_id, content,
+    image_path (or None) and image_asset_id (an already uploaded asset, or
+    None). Returns one result dict per job with post_id, image_asset_id,
+    linkedin_post_id, and on failure error (a message) and exception (the
+    error raised, for the retry policy to classify).
+    
+    before_create(job), if given, is called right before a post is created;
+    when it returns False the post is not created and its result has
+    skipped set.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def publish_one(job):
+        async with semaphore:
+            result = {'post_id': job['post_id'], 'image_asset_id': None, 'linkedin_post_id': None,
+                      'error': None, 'exception': None, 'skipped': False}
+            try:
+                image_asset_id = job.get('image_asset_id')
+                if job.get('image_path') and not image_asset_id:
+                    image_asset_id = await api.upload_image(
+                        job['access_token'], job['image_path'], job['linkedin_id']
+                    )
+                    result['image_asset_id'] = image_asset_id
+                
+                if before_create and not before_create(job):
+                    result['skipped'] = True
+                    return result
+                result['linkedin_post_id'] = await api.create_post(
+                    job['access_token'], job['linkedin_id'], job['content'], image_asset_id
+                )
+            except Exception as e:
+                result['error'] = str(e)
+                result['exception'] = e
+            return result
+    
+    return await asyncio.gather(*(publish_one(job) for job in jobs))
+
+async def publish_batch(config, jobs, before_create=None):
+    """Open a client from Flask config and publish the jobs with publish_many"""
+    async with AsyncLinkedInAPI.from_config(config) as api:
+        return await publish_many(api, jobs, api.concurrency, before_create)
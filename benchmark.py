@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks for the publish pipeline and the dashboard.
+
+Seeds a scratch database and runs each phase in its own process against
+a local fake LinkedIn API (fake_linkedin.py), then writes the results as
+JSON so runs can be compared across commits:
+    
+    python benchmark.py --users 50 --posts 2000 --image-ratio 0.2 --output bench.json
+    python benchmark.py --phase web --history 5000 --clients 16
+    python benchmark.py --mode dispatcher --latency lognormal:150:0.5 --error-rate 0.01
+
+publish  publishes every seeded post through PostScheduler and reports
+         posts/second, p50/p95/p99 schedule lag, peak RSS and SQL counts
+web      hits /dashboard, /api/stats and /api/posts from concurrent
+         clients, each a user with a long post history
+
+Other settings pass through the environment, e.g. DISPATCH_POLL_SECONDS=1.
+--database-url drops and recreates every table: only use a scratch database.
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PHASES = ('publish', 'web')
+WEB_ENDPOINTS = ('/dashboard', '/api/stats', '/api/posts')
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(values, scale=1, digits=1):
+    """p50/p95/p99/max of a list of numbers, multiplied by scale"""
+    summary = {}
+    for name, pct in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100)):
+        value = percentile(values, pct)
+        summary[name] = round(value * scale, digits) if value is not None else None
+    return summary
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its children, in MB"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {'process': round(own / divisor, 1), 'children': round(children / divisor, 1)}
+
+def db_query_counts():
+    """SQL statements executed so far in this process, by kind (from metrics.py)"""
+    from prometheus_client import REGISTRY
+    counts = {}
+    for statement in ('select', 'insert', 'update', 'delete', 'other'):
+        counts[statement] = int(REGISTRY.get_sample_value('db_queries_total', {'statement': statement}) or 0)
+    return counts
+
+def query_delta(before, after, per=None):
+    delta = {statement: after[statement] - before[statement] for statement in after}
+    delta['total'] = sum(delta.values())
+    if per:
+        delta['per_item'] = round(delta['total'] / per, 2)
+    return delta
+
+# Seeding
+
+def reset_database(app):
+    from database import db, init_db
+    
+    init_db(app)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+def seed_users(count, now):
+    """Insert `count` users with long-lived tokens; returns their ids"""
+    from sqlalchemy import insert, select
+    from database import db, User
+    
+    db.session.execute(insert(User), [{
+        'linkedin_id': f'bench{i}',
+        'name': f'Benchmark User {i}',
+        'email': f'bench{i}@example.com',
+        'access_token': f'bench-token-{i}',
+        'token_expires_at': now + timedelta(days=60),
+        'created_at': now,
+        'updated_at': now
+    } for i in range(count)])
+    db.session.commit()
+    return db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+
+def seed_posts(rows, chunk_size=5000):
+    """Bulk insert post rows, then rebuild the per-user counters the ORM hooks would have kept"""
+    from sqlalchemy import insert
+    from database import db, Post, rebuild_all_user_stats
+    
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(insert(Post), rows[start:start + chunk_size])
+        db.session.commit()
+    rebuild_all_user_stats()
+
+def write_benchmark_image(app, size_kb):
+    """A throwaway upload of size_kb for image posts; returns (disk path, image_path column value)"""
+    filename = f'benchmark-{os.getpid()}.jpg'
+    path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size_kb * 1024))
+    return path, f'/static/uploads/{filename}'
+
+# Phases (each runs in a child process configured through the environment)
+
+def run_publish_phase(args):
+    """Publish every seeded post through PostScheduler and measure the pipeline"""
+    from sqlalchemy import func, select
+    from database import db, Post, PostStatus, MediaStatus
+    from rate_limiter import RateLimiter
+    from scheduler import PostScheduler
+    from worker import create_worker_app
+    
+    app = create_worker_app(args.threads, None, args.dispatch_workers)
+    reset_database(app)
+    image_file, image_path = write_benchmark_image(app, args.image_kb)
+    
+    try:
+        with app.app_context():
+            seeded_at = datetime.utcnow()
+            user_ids = seed_users(args.users, seeded_at)
+            
+            # Posts fall due over --spread seconds from a moment after seeding
+            start_at = datetime.utcnow() + timedelta(seconds=2)
+            image_every = round(1 / args.image_ratio) if args.image_ratio else 0
+            rows = []
+            for i in range(args.posts):
+                with_image = image_every and i % image_every == 0
+                rows.append({
+                    'user_id': user_ids[i % len(user_ids)],
+                    'content': f'Benchmark post {i} ' + 'x' * args.content_length,
+                    'status': PostStatus.SCHEDULED,
+                    'scheduled_time': start_at + timedelta(seconds=args.spread * i / max(1, args.posts)),
+                    'image_path': image_path if with_image else None,
+                    'media_hash': f'{i:064x}' if with_image else None,
+                    'media_status': MediaStatus.READY if with_image else None,
+                    'retry_count': 0,
+                    'rate_limit_count': 0,
+                    'created_at': seeded_at,
+                    'updated_at': seeded_at
+                })
+            seed_posts(rows)
+            due_times = dict(db.session.execute(select(Post.id, Post.scheduled_time)).all())
+            db.session.remove()
+        
+        RateLimiter(app)
+        queries_before = db_query_counts()
+        polls = 0
+        started = time.perf_counter()
+        
+        post_scheduler = PostScheduler(app)
+        if post_scheduler.mode != 'dispatcher':
+            with app.app_context():
+                for post_id, due in due_times.items():
+                    post_scheduler.schedule_post(post_id, due)
+        
+        # Done once nothing is due and unpublished (retries pushed into the future are left)
+        deadline = started + args.timeout
+        timed_out = False
+        with app.app_context():
+            while True:
+                time.sleep(args.poll)
+                polls += 1
+                remaining = db.session.execute(
+                    select(func.count()).select_from(Post)
+                    .where(Post.status == PostStatus.SCHEDULED, Post.scheduled_time <= datetime.utcnow())
+                ).scalar()
+                db.session.remove()
+                if not remaining and datetime.utcnow() > max(due_times.values()):
+                    break
+                if time.perf_counter() > deadline:
+                    timed_out = True
+                    break
+        
+        elapsed = time.perf_counter() - started
+        post_scheduler.shutdown()
+        queries_after = db_query_counts()
+        # One SELECT per poll of the loop above is not the pipeline's
+        queries_after['select'] -= polls
+        
+        with app.app_context():
+            results = db.session.execute(select(Post.id, Post.status, Post.published_time)).all()
+        lags = [(published - due_times[post_id]).total_seconds()
+                for post_id, status, published in results if status == PostStatus.PUBLISHED]
+        counts = {status.value: 0 for status in PostStatus}
+        for _, status, _ in results:
+            counts[status.value] += 1
+        
+        return {
+            'mode': post_scheduler.mode,
+            'posts': args.posts,
+            'image_posts': sum(1 for row in rows if row['image_path']),
+            'outcomes': {status: count for status, count in counts.items() if count},
+            'timed_out': timed_out,
+            'elapsed_seconds': round(elapsed, 2),
+            'posts_per_second': round(len(lags) / elapsed, 2) if elapsed else None,
+            'schedule_lag_seconds': summarize(lags, digits=3),
+            'peak_rss_mb': peak_rss_mb(),
+            'db_queries': query_delta(queries_before, queries_after, per=args.posts),
+        }
+    finally:
+        if os.path.exists(image_file):
+            os.remove(image_file)
+
+def run_web_phase(args):
+    """Hit the dashboard endpoints from concurrent clients, each a user with a long history"""
+    import app as web
+    from database import db, PostStatus
+    
+    with web.app.app_context():
+        db.drop_all()
+        db.create_all()
+        now = datetime.utcnow()
+        user_ids = seed_users(max(args.users, args.clients), now)
+        
+        # Mostly history, plus drafts and upcoming posts for the other tabs
+        statuses = [PostStatus.PUBLISHED] * 16 + [PostStatus.FAILED, PostStatus.DRAFT,
+                                                 PostStatus.SCHEDULED, PostStatus.CANCELLED]
+        rows = []
+        for user_id in user_ids[:args.clients]:
+            for i in range(args.history):
+                status = statuses[i % len(statuses)]
+                created = now - timedelta(minutes=args.history - i)
+                rows.append({
+                    'user_id': user_id,
+                    'content': f'History post {i} ' + 'x' * args.content_length,
+                    'status': status,
+                    'scheduled_time': now + timedelta(hours=i) if status == PostStatus.SCHEDULED else created,
+                    'published_time': created if status == PostStatus.PUBLISHED else None,
+                    'linkedin_post_id': f'urn:li:share:{user_id}-{i}' if status == PostStatus.PUBLISHED else None,
+                    'retry_count': 0,
+                    'rate_limit_count': 0,
+                    'created_at': created,
+                    'updated_at': created
+                })
+        seed_posts(rows)
+        db.session.remove()
+    
+    clients = []
+    for user_id in user_ids[:args.clients]:
+        client = web.app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+        clients.append(client)
+    
+    results = {}
+    for endpoint in WEB_ENDPOINTS:
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(clients))
+        
+        def hammer(client):
+            timings = []
+            failed = 0
+            barrier.wait()
+            for _ in range(args.requests):
+                started = time.perf_counter()
+                response = client.get(endpoint)
+                timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failed += 1
+            with lock:
+                latencies.extend(timings)
+                errors.append(failed)
+        
+        queries_before = db_query_counts()
+        started = time.perf_counter()
+        threads = [threading.Thread(target=hammer, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        
+        results[endpoint] = {
+            'requests': len(latencies),
+            'errors': sum(errors),
+            'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'latency_ms': summarize(latencies, scale=1000),
+            'db_queries': query_delta(queries_before, db_query_counts(), per=len(latencies)),
+        }
+    
+    web.post_scheduler.shutdown()
+    web.media_pipeline.shutdown()
+    return {
+        'clients': len(clients),
+        'history_per_user': args.history,
+        'endpoints': results,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+# Orchestration
+
+def phase_environment(args, phase, database_url, fake):
+    """Environment for a phase's process: the scratch database, the fake API and quiet background jobs"""
+    env = dict(os.environ)
+    env.update({
+        'FLASK_ENV': 'production',
+        'DATABASE_URL': database_url,
+        'LINKEDIN_CLIENT_ID': 'benchmark',
+        'LINKEDIN_CLIENT_SECRET': 'benchmark',
+        'RUN_SCHEDULER': 'true' if phase == 'publish' else 'false',
+        'SCHEDULER_MODE': args.mode,
+        'DISPATCH_ASYNC': 'true' if args.use_async else 'false',
+        'RATE_LIMIT_ENABLED': 'true' if args.rate_limit else 'false',
+        'TOKEN_REFRESH_ENABLED': 'false',
+        'ENGAGEMENT_SYNC_ENABLED': 'false',
+        **fake.app_config()
+    })
+    # Counters are read from this process's registry
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    return env
+
+def run_phase_process(args, phase, database_url, fake, workdir):
+    """Run one phase in a fresh process and return its results"""
+    result_file = os.path.join(workdir, f'{phase}.json')
+    log_file = os.path.join(workdir, f'{phase}.log')
+    command = [sys.executable, os.path.abspath(__file__), '--run-phase', phase, '--result-file', result_file]
+    command += args.child_args
+    
+    with open(log_file, 'w') as log:
+        completed = subprocess.run(
+            command, env=phase_environment(args, phase, database_url, fake),
+            stdout=log, stderr=subprocess.STDOUT, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+    if completed.returncode != 0 or not os.path.exists(result_file):
+        print(f"❌ {phase} phase failed (exit {completed.returncode}), see {log_file}")
+        return {'error': f'exit code {completed.returncode}', 'log': log_file}
+    
+    with open(result_file) as f:
+        return json.load(f)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def print_summary(report):
+    publish = report['phases'].get('publish')
+    if publish and 'error' not in publish:
+        lag = publish['schedule_lag_seconds']
+        print(f"\n📤 Publish ({publish['mode']}): {publish['posts_per_second']} posts/s, "
+              f"lag p50 {lag['p50']}s p95 {lag['p95']}s p99 {lag['p99']}s, "
+              f"{publish['db_queries']['per_item']} queries/post, peak RSS {publish['peak_rss_mb']['process']} MB")
+        print(f"   outcomes: {publish['outcomes']}")
+    web = report['phases'].get('web')
+    if web and 'error' not in web:
+        print(f"\n🌐 Web ({web['clients']} clients, {web['history_per_user']} posts each):")
+        for endpoint, result in web['endpoints'].items():
+            latency = result['latency_ms']
+            print(f"   {endpoint:12s} {result['requests_per_second']:>8} req/s  "
+                  f"p50 {latency['p50']}ms p95 {latency['p95']}ms p99 {latency['p99']}ms  "
+                  f"{result['db_queries']['per_item']} queries/req  errors {result['errors']}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the publish pipeline and the dashboard")
+    parser.add_argument('--phase', action='append', choices=PHASES, help="Phase to run (default: all, repeatable)")
+    parser.add_argument('--output', help="Write the JSON report here (default: stdout)")
+    parser.add_argument('--database-url', help="Scratch database - every table is dropped (default: a temp SQLite file)")
+    
+    seeding = parser.add_argument_group('seeding')
+    seeding.add_argument('--users', type=int, default=20)
+    seeding.add_argument('--posts', type=int, default=1000, help="Posts to publish")
+    seeding.add_argument('--image-ratio', type=float, default=0.2, help="Fraction of posts with an image")
+    seeding.add_argument('--image-kb', type=int, default=200)
+    seeding.add_argument('--content-length', type=int, default=400, help="Characters of filler per post")
+    seeding.add_argument('--spread', type=float, default=0, help="Seconds over which the posts fall due")
+    seeding.add_argument('--history', type=int, default=2000, help="Posts per user for the web phase")
+    
+    publish = parser.add_argument_group('publish phase')
+    publish.add_argument('--mode', choices=('jobs', 'dispatcher'), default='dispatcher')
+    publish.add_argument('--async', dest='use_async', action='store_true', help="Publish batches on asyncio")
+    publish.add_argument('--threads', type=int, help="Scheduler threads (jobs mode)")
+    publish.add_argument('--dispatch-workers', type=int, help="Dispatcher publish threads")
+    publish.add_argument('--rate-limit', action='store_true', help="Keep the client-side rate limiter on")
+    publish.add_argument('--timeout', type=float, default=600, help="Give up after this many seconds")
+    publish.add_argument('--poll', type=float, default=0.5, help="Seconds between completion checks")
+    
+    web = parser.add_argument_group('web phase')
+    web.add_argument('--clients', type=int, default=8, help="Concurrent clients (one user each)")
+    web.add_argument('--requests', type=int, default=50, help="Requests per client per endpoint")
+    
+    fake = parser.add_argument_group('fake LinkedIn API')
+    fake.add_argument('--latency', default='lognormal:80:0.5', help="See fake_linkedin.Latency")
+    fake.add_argument('--upload-latency', default='lognormal:300:0.5')
+    fake.add_argument('--error-rate', type=float, default=0.0)
+    fake.add_argument('--throttle-rate', type=float, default=0.0)
+    fake.add_argument('--seed', type=int, default=1)
+    
+    parser.add_argument('--run-phase', choices=PHASES, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    return parser
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    
+    if args.run_phase:
+        # Child process: run one phase and hand the results back through a file
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        runner = run_publish_phase if args.run_phase == 'publish' else run_web_phase
+        result = runner(args)
+        with open(args.result_file, 'w') as f:
+            json.dump(result, f)
+        return
+    
+    from fake_linkedin import FakeLinkedInServer, FakeLinkedInConfig
+    
+    # Children parse the same options
+    args.child_args = sys.argv[1:]
+    phases = args.phase or list(PHASES)
+    
+    fake_config = FakeLinkedInConfig(
+        latency=args.latency,
+        endpoint_latency={'upload': args.upload_latency},
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=5,
+        seed=args.seed
+    )
+    
+    report = {
+        'benchmark': 'linkedin-scheduler',
+        'commit': git_commit(),
+        'started_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'parameters': {key: value for key, value in vars(args).items()
+                       if key not in ('phase', 'output', 'database_url', 'run_phase', 'result_file', 'child_args')},
+        'phases': {},
+    }
+    
+    with tempfile.TemporaryDirectory(prefix='linkedin-bench-') as workdir, FakeLinkedInServer(fake_config) as fake:
+        database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+        report['database'] = database_url.split(':', 1)[0]
+        
+        for phase in phases:
+            print(f"⏱️  Running {phase} phase...")
+            fake.state.reset()
+            result = run_phase_process(args, phase, database_url, fake, workdir)
+            if 'error' in result:
+                # Keep the log; the temp directory is about to go
+                with open(result['log']) as f:
+                    result['log_tail'] = f.read()[-4000:]
+                result.pop('log')
+            result['fake_api'] = fake.state.stats()
+            report['phases'][phase] = result
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"📄 Results written to {args.output}")
+    else:
+        print(output)
+    print_summary(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Bulk post import.
+
+Streams a CSV or JSONL content calendar, validates each row and inserts the
+posts in batches with one executemany per batch, so memory stays bounded
+however large the file is:
+    
+    python bulk_import.py --user 42 calendar.csv
+    python bulk_import.py --user <linkedin_id> calendar.jsonl --dry-run
+
+Each row has content (required), scheduled_time (ISO 8601, UTC unless it
+carries an offset) and status (draft or scheduled; defaults to scheduled
+when a time is given, else draft). POST /api/posts/import takes the same
+files and streams the same progress events as NDJSON.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from sqlalchemy.exc import SQLAlchemyError
+from database import db, User, PostStatus, insert_posts
+
+FORMATS = ('csv', 'jsonl')
+MAX_CONTENT_LENGTH = 3000
+IMPORT_STATUSES = {'draft': PostStatus.DRAFT, 'scheduled': PostStatus.SCHEDULED}
+
+def detect_format(filename, fmt=None):
+    """Pick the file format from an explicit value or the file extension"""
+    if not fmt:
+        ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+        fmt = {'ndjson': 'jsonl', 'json': 'jsonl'}.get(ext, ext)
+    fmt = fmt.lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported import format '{fmt}' (expected csv or jsonl)")
+    return fmt
+
+def text_stream(binary):
+    """Decode an uploaded file lazily, dropping a UTF-8 byte order mark"""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+def iter_rows(stream, fmt):
+    """Yield (line number, raw row) one at a time; JSONL rows are left unparsed for validate_row"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # line_num is the last physical line, which matters for multi-line content
+            yield reader.line_num, row
+        return
+    
+    for line_no, line in enumerate(stream, 1):
+        if line.strip():
+            yield line_no, line
+
+def _text_field(row, field):
+    """A field as stripped text ('' when missing); anything but a string is invalid"""
+    value = row.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string, not {type(value).__name__}")
+    return value.strip()
+
+def validate_row(row, user_id, now):
+    """Turn one raw row into insert values, raising ValueError with a message for the report"""
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(row, dict):
+            raise ValueError('Each line must be a JSON object')
+    
+    content = _text_field(row, 'content')
+    if not content:
+        raise ValueError('Post content is required')
+    if len(content) > MAX_CONTENT_LENGTH:
+        raise ValueError(f"Post content is longer than {MAX_CONTENT_LENGTH} characters")
+    
+    scheduled_time = None
+    scheduled_time_str = _text_field(row, 'scheduled_time')
+    if scheduled_time_str:
+        try:
+            scheduled_time = datetime.fromisoformat(scheduled_time_str.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError('Invalid scheduled time format')
+        if scheduled_time.tzinfo:
+            scheduled_time = scheduled_time.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    status_name = (_text_field(row, 'status') or ('scheduled' if scheduled_time else 'draft')).lower()
+    if status_name not in IMPORT_STATUSES:
+        raise ValueError(f"Invalid status '{status_name}' (expected draft or scheduled)")
+    status = IMPORT_STATUSES[status_name]
+    
+    if status == PostStatus.SCHEDULED:
+        if not scheduled_time:
+            raise ValueError('Scheduled posts need a scheduled_time')
+        if scheduled_time <= now:
+            raise ValueError('Scheduled time must be in the future')
+    
+    return {
+        'user_id': user_id,
+        'content': content,
+        'status': status,
+        'scheduled_time': scheduled_time
+    }
+
+def import_posts(user_id, rows, post_scheduler=None, batch_size=500, max_rows=None, dry_run=False):
+    """Validate and insert rows in batches, yielding progress, error and done events.
+    
+    Each batch is committed on its own and its scheduled posts are handed
+    to post_scheduler in one call, so a failure part way through keeps the
+    batches before it. Events are plain dicts, ready to print or to send as
+    NDJSON.
+    """
+    summary = {'processed': 0, 'imported': 0, 'scheduled': 0, 'drafts': 0, 'failed': 0, 'batches': 0}
+    batch = []
+    batch_lines = []
+    now = datetime.utcnow()
+    
+    def flush():
+        values, lines = list(batch), list(batch_lines)
+        batch.clear()
+        batch_lines.clear()
+        if dry_run:
+            summary['imported'] += len(values)
+            summary['scheduled'] += sum(1 for v in values if v['status'] == PostStatus.SCHEDULED)
+            summary['drafts'] += sum(1 for v in values if v['status'] == PostStatus.DRAFT)
+            summary['batches'] += 1
+            return None
+        
+        try:
+            inserted = insert_posts(values)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            summary['failed'] += len(values)
+            return {'event': 'error', 'lines': [lines[0], lines[-1]], 'error': f"Batch insert failed: {e.__class__.__name__}"}
+        
+        due = [(post_id, scheduled_time) for post_id, status, scheduled_time in inserted
+               if status == PostStatus.SCHEDULED]
+        if due and post_scheduler:
+            post_scheduler.schedule_posts(due)
+        summary['imported'] += len(inserted)
+        summary['scheduled'] += len(due)
+        summary['drafts'] += len(inserted) - len(due)
+        summary['batches'] += 1
+        return None
+    
+    try:
+        for line_no, row in rows:
+            if max_rows and summary['processed'] >= max_rows:
+                yield {'event': 'error', 'line': line_no, 'error': f"Row limit of {max_rows} reached; the rest of the file was not imported"}
+                break
+            
+            summary['processed'] += 1
+            try:
+                batch.append(validate_row(row, user_id, now))
+                batch_lines.append(line_no)
+            except ValueError as e:
+                summary['failed'] += 1
+                yield {'event': 'error', 'line': line_no, 'error': str(e)}
+            
+            if len(batch) >= batch_size:
+                error = flush()
+                if error:
+                    yield error
+                yield {'event': 'progress', **summary}
+    except UnicodeDecodeError:
+        # Keep the rows read so far, as with the row limit
+        yield {'event': 'error', 'error': f"File is not valid UTF-8 after {summary['processed']} rows; the rest of the file was not imported"}
+    except csv.Error as e:
+        # Oversized fields, NUL bytes and the like stop the CSV reader for good
+        yield {'event': 'error', 'error': f"CSV could not be read after {summary['processed']} rows ({e}); the rest of the file was not imported"}
+    
+    if batch:
+        error = flush()
+        if error:
+            yield error
+    yield {'event': 'done', 'dry_run': dry_run, **summary}
+
+def find_user(identifier):
+    """Look a user up by id or LinkedIn id"""
+    user = db.session.get(User, int(identifier)) if identifier.isdigit() else None
+    return user or User.query.filter_by(linkedin_id=identifier).first()
+
+def main():
+    from flask import Flask
+    from config import load_config
+    from scheduler import PostScheduler
+    
+    parser = argparse.ArgumentParser(description='Import posts from a CSV or JSONL file')
+    parser.add_argument('file', help='CSV or JSONL file, or - for stdin')
+    parser.add_argument('--user', required=True, help='User id or LinkedIn id that owns the posts')
+    parser.add_argument('--format', choices=FORMATS, help='File format (default: from the extension)')
+    parser.add_argument('--batch-size', type=int, help='Rows per insert batch')
+    parser.add_argument('--dry-run', action='store_true', help='Validate only, insert nothing')
+    args = parser.parse_args()
+    
+    app = Flask(__name__)
+    app.config.from_object(load_config())
+    # Only register due times here; publishing stays with the web app or worker
+    app.config['RUN_SCHEDULER'] = False
+    db.init_app(app)
+    
+    try:
+        fmt = detect_format(args.file, args.format)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    
+    with app.app_context():
+        user = find_user(args.user)
+        if not user:
+            print(f"❌ No user matches '{args.user}'")
+            sys.exit(2)
+        
+        post_scheduler = None
+        if not args.dry_run and app.config.get('SCHEDULER_MODE') != 'dispatcher':
+            post_scheduler = PostScheduler(app)
+        
+        batch_size = args.batch_size or app.config.get('BULK_IMPORT_BATCH_SIZE', 500)
+        stream = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8-sig', newline='')
+        with stream:
+            for event in import_posts(user.id, iter_rows(stream, fmt), post_scheduler,
+                                      batch_size=batch_size, dry_run=args.dry_run):
+                if event['event'] == 'error':
+                    if 'line' in event:
+                        print(f"⚠️  Line {event['line']}: {event['error']}")
+                    elif 'lines' in event:
+                        print(f"⚠️  Lines {event['lines'][0]}-{event['lines'][1]}: {event['error']}")
+                    else:
+                        print(f"⚠️  {event['error']}")
+                elif event['event'] == 'progress':
+                    print(f"📥 {event['processed']} rows read, {event['imported']} imported, {event['failed']} failed")
+                else:
+                    verb = 'Would import' if args.dry_run else 'Imported'
+                    print(f"✅ {verb} {event['imported']} posts for {user.name} "
+                          f"({event['scheduled']} scheduled, {event['drafts']} drafts); {event['failed']} rows failed")
+        
+        if post_scheduler:
+            post_scheduler.shutdown()
+
+if __name__ == '__main__':
+    main()
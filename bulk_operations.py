@@ -0,0 +1,169 @@
+"""
+Bulk post operations.
+
+Deletes, cancels, reschedules or shifts every post matching an id list
+and/or a filter with set-based SQL: one UPDATE or DELETE per source status
+and one change to the scheduler's due index, instead of a lookup, a job
+change and a commit per post. Posts a dispatcher worker holds a lease on
+are left alone.
+
+    {"action": "shift", "filter": {"status": "scheduled",
+     "scheduled_after": "2026-10-19T00:00:00Z", "scheduled_before": "2026-10-26T00:00:00Z"},
+     "shift_minutes": 120}
+    {"action": "cancel", "filter": {"status": "failed"}}
+    {"action": "delete", "filter": {"status": "draft", "older_than_days": 90}}
+"""
+
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+from database import db, Post, PostStatus, update_posts, delete_posts, shifted_time
+from media import remove_after_commit
+
+ACTIONS = ('delete', 'cancel', 'reschedule', 'shift')
+# Statuses each action may change; everything else matching the filter is skipped
+SOURCE_STATUSES = {
+    'delete': tuple(PostStatus),
+    'cancel': (PostStatus.SCHEDULED, PostStatus.FAILED, PostStatus.DRAFT),
+    'reschedule': (PostStatus.DRAFT, PostStatus.SCHEDULED, PostStatus.FAILED, PostStatus.CANCELLED),
+    'shift': (PostStatus.SCHEDULED,),
+}
+FILTER_KEYS = (
+    'status', 'scheduled_after', 'scheduled_before', 'created_after', 'created_before', 'older_than_days'
+)
+# Largest shift accepted, either way (about ten years)
+MAX_SHIFT_MINUTES = 10 * 366 * 24 * 60
+
+def parse_time(value, field):
+    """ISO 8601 string to a naive UTC datetime"""
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid {field} format")
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_shift_minutes(value):
+    """shift_minutes as a non-zero whole number of minutes (a JSON integer or a string of digits)"""
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            pass
+    if isinstance(value, bool) or not isinstance(value, int) or value == 0:
+        raise ValueError('shift_minutes must be a non-zero whole number')
+    if abs(value) > MAX_SHIFT_MINUTES:
+        raise ValueError(f"shift_minutes must be between -{MAX_SHIFT_MINUTES} and {MAX_SHIFT_MINUTES}")
+    return value
+
+def build_criteria(user_id, ids=None, filters=None, now=None):
+    """Turn an id list and a filter into WHERE clauses for one user's posts"""
+    now = now or datetime.utcnow()
+    filters = filters or {}
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filter: {', '.join(sorted(unknown))}")
+    if not ids and not filters:
+        raise ValueError('Post ids or a filter are required')
+    
+    criteria = [
+        Post.user_id == user_id,
+        db.or_(Post.lease_expires_at.is_(None), Post.lease_expires_at < now)
+    ]
+    if ids:
+        try:
+            criteria.append(Post.id.in_([int(post_id) for post_id in ids]))
+        except (TypeError, ValueError):
+            raise ValueError('Post ids must be integers')
+    
+    if 'status' in filters:
+        names = filters['status'] if isinstance(filters['status'], list) else [filters['status']]
+        try:
+            criteria.append(Post.status.in_([PostStatus(str(name).lower()) for name in names]))
+        except ValueError:
+            raise ValueError(f"Invalid status in filter: {filters['status']}")
+    if 'scheduled_after' in filters:
+        criteria.append(Post.scheduled_time >= parse_time(filters['scheduled_after'], 'scheduled_after'))
+    if 'scheduled_before' in filters:
+        criteria.append(Post.scheduled_time < parse_time(filters['scheduled_before'], 'scheduled_before'))
+    if 'created_after' in filters:
+        criteria.append(Post.created_at >= parse_time(filters['created_after'], 'created_after'))
+    if 'created_before' in filters:
+        criteria.append(Post.created_at < parse_time(filters['created_before'], 'created_before'))
+    if 'older_than_days' in filters:
+        try:
+            days = float(filters['older_than_days'])
+        except (TypeError, ValueError):
+            raise ValueError('older_than_days must be a number')
+        criteria.append(Post.created_at < now - timedelta(days=days))
+    return criteria
+
+def _shift_criteria(criteria, shift_seconds, now):
+    # Only posts that stay in the future after the shift
+    return [*criteria, Post.scheduled_time > now - timedelta(seconds=shift_seconds)]
+
+def count_matching(action, criteria, shift_seconds=0, now=None):
+    """How many posts an action would change, by status (for dry runs)"""
+    now = now or datetime.utcnow()
+    if action == 'shift':
+        criteria = _shift_criteria(criteria, shift_seconds, now)
+    rows = db.session.execute(
+        select(Post.status, func.count(Post.id))
+        .where(*criteria, Post.status.in_(SOURCE_STATUSES[action]))
+        .group_by(Post.status)
+    )
+    return {status.value: count for status, count in rows}
+
+def _delete(criteria, media_pipeline):
+    deleted = delete_posts(criteria)
+    # Shared images lose one reference per deleted post
+    for media_hash, count in Counter(media_hash for _, _, media_hash, _ in deleted if media_hash).items():
+        media_pipeline.release(media_hash, count)
+    for _, _, media_hash, image_path in deleted:
+        if image_path and not media_hash:
+            remove_after_commit(os.path.join('static', image_path.lstrip('/static/')))
+    return [(post_id, status) for post_id, status, _, _ in deleted]
+
+def run_bulk_action(action, criteria, post_scheduler, media_pipeline=None, scheduled_time=None,
+                    shift_seconds=0, now=None):
+    """Apply one action to every matching post, commit, then update the scheduler's due index.
+    
+    Returns the number of posts changed by their previous status.
+    """
+    now = now or datetime.utcnow()
+    try:
+        if action == 'delete':
+            changed = _delete(criteria, media_pipeline)
+        elif action == 'cancel':
+            changed = update_posts(criteria, {'status': PostStatus.CANCELLED}, SOURCE_STATUSES['cancel'])
+        elif action == 'reschedule':
+            changed = update_posts(
+                criteria,
+                {'status': PostStatus.SCHEDULED, 'scheduled_time': scheduled_time},
+                SOURCE_STATUSES['reschedule']
+            )
+        elif action == 'shift':
+            changed = update_posts(
+                _shift_criteria(criteria, shift_seconds, now),
+                {'scheduled_time': shifted_time(Post.scheduled_time, shift_seconds)},
+                SOURCE_STATUSES['shift'],
+                returning=(Post.scheduled_time,)
+            )
+        else:
+            raise ValueError(f"Unknown action '{action}'")
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    # Jobs change only once the rows are committed, as with the single-post endpoints
+    if action in ('delete', 'cancel'):
+        post_scheduler.cancel_posts([row[0] for row in changed if row[1] == PostStatus.SCHEDULED])
+    elif action == 'reschedule':
+        post_scheduler.schedule_posts([(row[0], scheduled_time) for row in changed])
+    else:
+        post_scheduler.schedule_posts([(row[0], row[2]) for row in changed])
+    
+    return dict(Counter(row[1].value for row in changed))
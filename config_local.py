@@ -19,13 +19,127 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
     
+    # Media pipeline: worker processes for image processing, and how long
+    # the scheduler waits before re-checking a post whose image is pending
+    MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', 2))
+    MEDIA_PENDING_RECHECK_SECONDS = int(os.environ.get('MEDIA_PENDING_RECHECK_SECONDS', 30))
+    # How long a process holds a pending image before another may take it over
+    MEDIA_LEASE_SECONDS = int(os.environ.get('MEDIA_LEASE_SECONDS', 600))
+    
+    # Images above MEDIA_MAX_PIXELS are rejected before decoding; renditions
+    # fit inside MEDIA_MAX_DIMENSIONS
+    MEDIA_MAX_PIXELS = int(os.environ.get('MEDIA_MAX_PIXELS', 40_000_000))
+    MEDIA_MAX_DIMENSIONS = (1200, 1200)
+    
+    # Pagination configuration
+    POSTS_PAGE_SIZE = 20
+    POSTS_PAGE_SIZE_MAX = 100
+    
+    # Scheduler: 'jobs' keeps one APScheduler job per post, 'dispatcher' polls
+    # the posts table and leases due posts so several processes can publish
+    SCHEDULER_MODE = os.environ.get('SCHEDULER_MODE', 'jobs')
+    DISPATCH_POLL_SECONDS = int(os.environ.get('DISPATCH_POLL_SECONDS', 5))
+    DISPATCH_BATCH_SIZE = int(os.environ.get('DISPATCH_BATCH_SIZE', 50))
+    DISPATCH_LEASE_SECONDS = int(os.environ.get('DISPATCH_LEASE_SECONDS', 300))
+    DISPATCH_WORKERS = int(os.environ.get('DISPATCH_WORKERS', 20))
+    DISPATCH_ASYNC = os.environ.get('DISPATCH_ASYNC', 'false').lower() == 'true'
+    
+    # Background work. Set RUN_SCHEDULER=false on web processes when a
+    # separate `python worker.py` process publishes posts and processes images
+    RUN_SCHEDULER = os.environ.get('RUN_SCHEDULER', 'true').lower() == 'true'
+    SCHEDULER_THREADS = int(os.environ.get('SCHEDULER_THREADS', 20))
+    WORKER_POLL_SECONDS = int(os.environ.get('WORKER_POLL_SECONDS', 5))
+    
+    # LinkedIn API rate limits: token buckets shared by all processes, one per
+    # member and one for the whole app. Calls wait up to
+    # RATE_LIMIT_MAX_WAIT_SECONDS for a token; posts that would wait longer
+    # (or get a 429) are rescheduled instead of failed
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_MEMBER_BURST = int(os.environ.get('RATE_LIMIT_MEMBER_BURST', 10))
+    RATE_LIMIT_MEMBER_PER_HOUR = int(os.environ.get('RATE_LIMIT_MEMBER_PER_HOUR', 100))
+    RATE_LIMIT_APP_BURST = int(os.environ.get('RATE_LIMIT_APP_BURST', 100))
+    RATE_LIMIT_APP_PER_HOUR = int(os.environ.get('RATE_LIMIT_APP_PER_HOUR', 10000))
+    RATE_LIMIT_MAX_WAIT_SECONDS = int(os.environ.get('RATE_LIMIT_MAX_WAIT_SECONDS', 5))
+    
+    # Retry policy for failed publishes. Transient failures back off
+    # exponentially from RETRY_BASE_DELAY_SECONDS with jitter; each failure
+    # class (transient, rate limit, permanent) has its own attempt cap
+    RETRY_BASE_DELAY_SECONDS = int(os.environ.get('RETRY_BASE_DELAY_SECONDS', 120))
+    RETRY_MAX_DELAY_SECONDS = int(os.environ.get('RETRY_MAX_DELAY_SECONDS', 3600))
+    RETRY_BACKOFF_MULTIPLIER = float(os.environ.get('RETRY_BACKOFF_MULTIPLIER', 2))
+    RETRY_MAX_ATTEMPTS_TRANSIENT = int(os.environ.get('RETRY_MAX_ATTEMPTS_TRANSIENT', 3))
+    RETRY_MAX_ATTEMPTS_RATE_LIMIT = int(os.environ.get('RETRY_MAX_ATTEMPTS_RATE_LIMIT', 10))
+    RETRY_MAX_ATTEMPTS_PERMANENT = int(os.environ.get('RETRY_MAX_ATTEMPTS_PERMANENT', 1))
+    
+    # Token maintenance: refresh access tokens expiring within
+    # TOKEN_REFRESH_WINDOW_HOURS, TOKEN_REFRESH_BATCH_SIZE users at a time
+    TOKEN_REFRESH_ENABLED = os.environ.get('TOKEN_REFRESH_ENABLED', 'true').lower() == 'true'
+    TOKEN_REFRESH_INTERVAL_MINUTES = int(os.environ.get('TOKEN_REFRESH_INTERVAL_MINUTES', 30))
+    TOKEN_REFRESH_WINDOW_HOURS = int(os.environ.get('TOKEN_REFRESH_WINDOW_HOURS', 72))
+    TOKEN_REFRESH_RETRY_MINUTES = int(os.environ.get('TOKEN_REFRESH_RETRY_MINUTES', 60))
+    TOKEN_REFRESH_BATCH_SIZE = int(os.environ.get('TOKEN_REFRESH_BATCH_SIZE', 50))
+    TOKEN_REFRESH_MAX_PER_RUN = int(os.environ.get('TOKEN_REFRESH_MAX_PER_RUN', 500))
+    
+    # Prometheus metrics: /metrics for the web app (bearer METRICS_TOKEN if set);
+    # worker.py serves its own on WORKER_METRICS_PORT unless it is 0
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    WORKER_METRICS_PORT = int(os.environ.get('WORKER_METRICS_PORT', 9200))
+    
+    # Logged-in user cache (per process; 0 turns it off)
+    USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+    USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', 10000))
+    
+    # Conditional GETs - stats, dashboard and posts responses carry an ETag from
+    # the user's post version and are answered with 304 while it is unchanged;
+    # off by default here, where templates change without the version moving.
+    # ETAG_SALT changes every tag on deploy (Render's commit id by default)
+    CONDITIONAL_GET_ENABLED = os.environ.get('CONDITIONAL_GET_ENABLED', 'false').lower() == 'true'
+    ETAG_SALT = os.environ.get('ETAG_SALT', os.environ.get('RENDER_GIT_COMMIT', ''))
+    DASHBOARD_POLL_SECONDS = int(os.environ.get('DASHBOARD_POLL_SECONDS', 30))
+    
+    # Rendered post card cache - per process LRU, plus a shared Redis cache
+    # when FRAGMENT_CACHE_URL is set (needs the redis package)
+    FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', 'true').lower() == 'true'
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 2000))
+    FRAGMENT_CACHE_URL = os.environ.get('FRAGMENT_CACHE_URL')
+    FRAGMENT_CACHE_TTL_SECONDS = int(os.environ.get('FRAGMENT_CACHE_TTL_SECONDS', 86400))
+    
+    # Engagement sync - polls published posts for likes and comments. The
+    # schedule maps post age to poll interval; polls have their own hourly
+    # budget and stop while the app rate limit bucket is below the reserve
+    ENGAGEMENT_SYNC_ENABLED = os.environ.get('ENGAGEMENT_SYNC_ENABLED', 'true').lower() == 'true'
+    ENGAGEMENT_SYNC_INTERVAL_MINUTES = int(os.environ.get('ENGAGEMENT_SYNC_INTERVAL_MINUTES', 5))
+    ENGAGEMENT_SYNC_SCHEDULE = os.environ.get('ENGAGEMENT_SYNC_SCHEDULE', '6h:15m,2d:1h,7d:6h,30d:1d')
+    ENGAGEMENT_SYNC_BATCH_SIZE = int(os.environ.get('ENGAGEMENT_SYNC_BATCH_SIZE', 50))
+    ENGAGEMENT_SYNC_MAX_PER_RUN = int(os.environ.get('ENGAGEMENT_SYNC_MAX_PER_RUN', 200))
+    ENGAGEMENT_SYNC_PER_HOUR = int(os.environ.get('ENGAGEMENT_SYNC_PER_HOUR', 600))
+    ENGAGEMENT_SYNC_BURST = int(os.environ.get('ENGAGEMENT_SYNC_BURST', 20))
+    ENGAGEMENT_SYNC_APP_RESERVE = float(os.environ.get('ENGAGEMENT_SYNC_APP_RESERVE', 0.5))
+    
+    # Bulk import - rows per insert batch, and the most rows one import may hold
+    BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 500))
+    BULK_IMPORT_MAX_ROWS = int(os.environ.get('BULK_IMPORT_MAX_ROWS', 100000))
+    
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
-    # LinkedIn API URLs
-    LINKEDIN_AUTH_URL = 'https://www.linkedin.com/oauth/v2/authorization'
-    LINKEDIN_TOKEN_URL = 'https://www.linkedin.com/oauth/v2/accessToken'
-    LINKEDIN_API_BASE_URL = 'https://api.linkedin.com/v2'
+    # LinkedIn API URLs (point them at fake_linkedin.py for load tests)
+    LINKEDIN_AUTH_URL = os.environ.get('LINKEDIN_AUTH_URL', 'https://www.linkedin.com/oauth/v2/authorization')
+    LINKEDIN_TOKEN_URL = os.environ.get('LINKEDIN_TOKEN_URL', 'https://www.linkedin.com/oauth/v2/accessToken')
+    LINKEDIN_API_BASE_URL = os.environ.get('LINKEDIN_API_BASE_URL', 'https://api.linkedin.com/v2')
+    
+    # LinkedIn HTTP client: connection pool size per host and timeouts in seconds
+    LINKEDIN_HTTP_POOL_SIZE = int(os.environ.get('LINKEDIN_HTTP_POOL_SIZE', 20))
+    LINKEDIN_HTTP_CONNECT_TIMEOUT = float(os.environ.get('LINKEDIN_HTTP_CONNECT_TIMEOUT', 5))
+    LINKEDIN_HTTP_READ_TIMEOUT = float(os.environ.get('LINKEDIN_HTTP_READ_TIMEOUT', 30))
+    LINKEDIN_HTTP_UPLOAD_TIMEOUT = float(os.environ.get('LINKEDIN_HTTP_UPLOAD_TIMEOUT', 120))
+    
+    # How long an uploaded LinkedIn image asset is reused for retries and reposts
+    LINKEDIN_ASSET_CACHE_TTL_HOURS = int(os.environ.get('LINKEDIN_ASSET_CACHE_TTL_HOURS', 24))
+    
+    # Max publishes in flight on the asyncio batch publishing path
+    PUBLISH_ASYNC_CONCURRENCY = int(os.environ.get('PUBLISH_ASYNC_CONCURRENCY', 100))
     
     # Required LinkedIn scopes
     LINKEDIN_SCOPES = ['r_liteprofile', 'w_member_social']
@@ -1,6 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from datetime import datetime
+from sqlalchemy import event, func, select, insert, update, delete
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session as OrmSession
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+import base64
 import enum
 
 db = SQLAlchemy()
@@ -12,6 +19,11 @@ class PostStatus(enum.Enum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
+class MediaStatus(enum.Enum):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     
@@ -22,7 +34,11 @@ class User(UserMixin, db.Model):
     profile_picture = db.Column(db.String(200), nullable=True)
     access_token = db.Column(db.Text, nullable=False)
     refresh_token = db.Column(db.Text, nullable=True)
-    token_expires_at = db.Column(db.DateTime, nullable=True)
+    # Indexed for the token maintenance job's scan of tokens close to expiry
+    token_expires_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Token maintenance: when a refresh was last tried, and why it can't succeed (None if it can)
+    token_refresh_attempted_at = db.Column(db.DateTime, nullable=True)
+    token_refresh_error = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -31,20 +47,51 @@ class User(UserMixin, db.Model):
     
     def __repr__(self):
         return f'<User {self.name}>'
+    
+    def set_tokens(self, token_data):
+        """Store the tokens from a LinkedIn token response (authorization or refresh)"""
+        self.access_token = token_data['access_token']
+        # A refresh response may omit the refresh token; keep the one we have
+        self.refresh_token = token_data.get('refresh_token') or self.refresh_token
+        self.token_expires_at = datetime.utcnow() + timedelta(seconds=token_data.get('expires_in', 3600))
+        self.token_refresh_error = None
 
 class Post(db.Model):
     __tablename__ = 'posts'
+    __table_args__ = (
+        # Dashboard tabs and the scheduled timeline
+        db.Index('ix_posts_user_status_scheduled', 'user_id', 'status', 'scheduled_time'),
+        # Keyset pagination over a user's history
+        db.Index('ix_posts_user_created', 'user_id', 'created_at'),
+        # Due-post scan across all users
+        db.Index('ix_posts_status_scheduled', 'status', 'scheduled_time'),
+        # Engagement sync's scan for published posts due a poll
+        db.Index('ix_posts_status_engagement_next', 'status', 'engagement_next_sync_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     image_path = db.Column(db.String(200), nullable=True)
+    media_hash = db.Column(db.String(64), nullable=True, index=True)
+    media_status = db.Column(db.Enum(MediaStatus, native_enum=False, length=20), nullable=True)
     status = db.Column(db.Enum(PostStatus), default=PostStatus.DRAFT, nullable=False)
     scheduled_time = db.Column(db.DateTime, nullable=True)
     published_time = db.Column(db.DateTime, nullable=True)
     linkedin_post_id = db.Column(db.String(100), nullable=True)
     error_message = db.Column(db.Text, nullable=True)
     retry_count = db.Column(db.Integer, default=0)
+    # Retry policy: class of the last failure, and rate-limit deferrals (capped separately)
+    failure_class = db.Column(db.String(20), nullable=True)
+    rate_limit_count = db.Column(db.Integer, default=0)
+    # Dispatcher lease: which worker is publishing the post and until when
+    claimed_by = db.Column(db.String(64), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    # Engagement sync: latest counts, when they were read and when to poll next
+    like_count = db.Column(db.Integer, nullable=True)
+    comment_count = db.Column(db.Integer, nullable=True)
+    engagement_synced_at = db.Column(db.DateTime, nullable=True)
+    engagement_next_sync_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -56,15 +103,428 @@ class Post(db.Model):
             'id': self.id,
             'content': self.content,
             'image_path': self.image_path,
+            'media_status': self.media_status.value if self.media_status else None,
             'status': self.status.value,
             'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
             'published_time': self.published_time.isoformat() if self.published_time else None,
+            'error_message': self.error_message,
+            'retry_count': self.retry_count or 0,
+            'failure_class': self.failure_class,
+            'like_count': self.like_count,
+            'comment_count': self.comment_count,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
 
+class MediaFile(db.Model):
+    """An uploaded image stored once per content hash and shared by every post using it"""
+    __tablename__ = 'media_files'
+    
+    content_hash = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.Enum(MediaStatus, native_enum=False, length=20), default=MediaStatus.PENDING, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=True)
+    # Process processing a PENDING file, so only one process works on it
+    claimed_by = db.Column(db.String(64), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<MediaFile {self.content_hash[:12]} refs={self.ref_count}>'
+
+class LinkedInAsset(db.Model):
+    """Cached LinkedIn asset URN for an image a member has already uploaded"""
+    __tablename__ = 'linkedin_assets'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    content_hash = db.Column(db.String(64), primary_key=True)
+    asset_urn = db.Column(db.String(200), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<LinkedInAsset {self.user_id}:{self.content_hash[:12]}>'
+
+class RateLimitBucket(db.Model):
+    """Shared token bucket for LinkedIn API calls (see rate_limiter.py).
+    
+    Times are epoch seconds so the refill can be computed in SQL on any backend.
+    """
+    __tablename__ = 'rate_limit_buckets'
+    
+    key = db.Column(db.String(128), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    capacity = db.Column(db.Float, nullable=False)
+    refill_per_second = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)
+    blocked_until = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<RateLimitBucket {self.key} {self.tokens:.1f}/{self.capacity:.0f}>'
+
+class TokenRefreshLog(db.Model):
+    """Outcome of one background access-token refresh"""
+    __tablename__ = 'token_refresh_log'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    attempted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    success = db.Column(db.Boolean, nullable=False)
+    error_message = db.Column(db.Text, nullable=True)
+    previous_expires_at = db.Column(db.DateTime, nullable=True)
+    new_expires_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<TokenRefreshLog {self.user_id} {"ok" if self.success else "failed"}>'
+
+class PostEngagementSnapshot(db.Model):
+    """Likes and comments on a published post at one point in time (see engagement_sync.py)"""
+    __tablename__ = 'post_engagement_snapshots'
+    __table_args__ = (
+        db.Index('ix_post_engagement_snapshots_post_captured', 'post_id', 'captured_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), nullable=False)
+    captured_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    like_count = db.Column(db.Integer, nullable=False, default=0)
+    comment_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<PostEngagementSnapshot {self.post_id} {self.like_count}/{self.comment_count}>'
+
+class UserPostCounter(db.Model):
+    """Per-user post counts by status, kept in step with the posts table.
+    
+    version goes up with every write to the user's posts, so responses
+    built from them can be tagged and revalidated without re-reading them.
+    """
+    __tablename__ = 'user_post_counters'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    draft = db.Column(db.Integer, default=0, nullable=False)
+    scheduled = db.Column(db.Integer, default=0, nullable=False)
+    published = db.Column(db.Integer, default=0, nullable=False)
+    failed = db.Column(db.Integer, default=0, nullable=False)
+    cancelled = db.Column(db.Integer, default=0, nullable=False)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserPostCounter {self.user_id}>'
+
+class UserDailyStats(db.Model):
+    """Per-user activity for one UTC day, kept up to date as posts change (see analytics.py).
+    
+    published / failed / scheduled count the posts that reached that status
+    on the day; likes / comments are the engagement of posts published on it.
+    """
+    __tablename__ = 'user_daily_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    published = db.Column(db.Integer, default=0, nullable=False)
+    failed = db.Column(db.Integer, default=0, nullable=False)
+    scheduled = db.Column(db.Integer, default=0, nullable=False)
+    likes = db.Column(db.Integer, default=0, nullable=False)
+    comments = db.Column(db.Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<UserDailyStats {self.user_id} {self.day}>'
+
+class UserHourlyStats(db.Model):
+    """The same counts as UserDailyStats by UTC hour of the week (at most 168 rows a user)"""
+    __tablename__ = 'user_hourly_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    weekday = db.Column(db.Integer, primary_key=True)  # 0 = Monday
+    hour = db.Column(db.Integer, primary_key=True)
+    published = db.Column(db.Integer, default=0, nullable=False)
+    failed = db.Column(db.Integer, default=0, nullable=False)
+    scheduled = db.Column(db.Integer, default=0, nullable=False)
+    likes = db.Column(db.Integer, default=0, nullable=False)
+    comments = db.Column(db.Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<UserHourlyStats {self.user_id} {self.weekday}:{self.hour:02d}>'
+
+# Status changes that count as an event in the rollups
+ROLLUP_STATUSES = {
+    PostStatus.PUBLISHED: 'published',
+    PostStatus.FAILED: 'failed',
+    PostStatus.SCHEDULED: 'scheduled',
+}
+
+@event.listens_for(Post.status, 'set', active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    """Make sure the old status is loaded on assignment so counters see both sides"""
+    return value
+
+@event.listens_for(Post.like_count, 'set', active_history=True)
+@event.listens_for(Post.comment_count, 'set', active_history=True)
+def _load_previous_engagement(target, value, oldvalue, initiator):
+    """Make sure old engagement counts are loaded so the rollups get the difference"""
+    return value
+
+def _collect_status_deltas(session):
+    """Work out per-user status count changes from the session's pending Post changes.
+    
+    Every user with a written post gets an entry, even with no count
+    change, so their post version is bumped.
+    """
+    deltas = defaultdict(Counter)
+    
+    for obj in session.new:
+        if isinstance(obj, Post):
+            deltas[obj.user_id][obj.status or PostStatus.DRAFT] += 1
+    
+    for obj in session.deleted:
+        if isinstance(obj, Post):
+            history = sa_inspect(obj).attrs.status.history
+            old_status = history.deleted[0] if history.deleted else obj.status
+            deltas[obj.user_id][old_status] -= 1
+    
+    for obj in session.dirty:
+        if isinstance(obj, Post) and obj not in session.deleted and session.is_modified(obj):
+            history = sa_inspect(obj).attrs.status.history
+            changes = deltas[obj.user_id]
+            for old_status in history.deleted:
+                changes[old_status] -= 1
+            for new_status in history.added:
+                changes[new_status] += 1
+    
+    return deltas
+
+def _rebuild_counter_row(connection, user_id):
+    """Recount a user's posts with one GROUP BY and replace their counter row, bumping its version"""
+    counts = {status.value: 0 for status in PostStatus}
+    rows = connection.execute(
+        select(Post.status, func.count(Post.id))
+        .where(Post.user_id == user_id)
+        .group_by(Post.status)
+    )
+    for status, count in rows:
+        counts[status.value] = count
+    
+    table = UserPostCounter.__table__
+    version = connection.execute(select(table.c.version).where(table.c.user_id == user_id)).scalar() or 0
+    connection.execute(delete(table).where(table.c.user_id == user_id))
+    connection.execute(insert(table).values(
+        user_id=user_id, version=version + 1, updated_at=datetime.utcnow(), **counts
+    ))
+    return counts
+
+def _status_event_time(post, status, now):
+    return (post.published_time or now) if status == PostStatus.PUBLISHED else now
+
+def _engagement_events(user_id, published_time, likes, comments):
+    """Rollup events for the engagement a post already has when it is inserted"""
+    return [(user_id, published_time, field, amount)
+            for field, amount in (('likes', likes), ('comments', comments)) if amount]
+
+def _collect_rollup_events(session, now):
+    """(user_id, when, field, amount) for every rollup change in the session's pending Posts"""
+    events = []
+    
+    for obj in session.new:
+        if not isinstance(obj, Post):
+            continue
+        if obj.status in ROLLUP_STATUSES:
+            events.append((obj.user_id, _status_event_time(obj, obj.status, now), ROLLUP_STATUSES[obj.status], 1))
+        if obj.published_time:
+            events += _engagement_events(obj.user_id, obj.published_time, obj.like_count, obj.comment_count)
+    
+    for obj in session.dirty:
+        if not isinstance(obj, Post) or obj in session.deleted:
+            continue
+        state = sa_inspect(obj)
+        for new_status in state.attrs.status.history.added:
+            if new_status in ROLLUP_STATUSES and new_status not in state.attrs.status.history.deleted:
+                events.append((obj.user_id, _status_event_time(obj, new_status, now), ROLLUP_STATUSES[new_status], 1))
+        
+        # Engagement counts toward the hour and day the post went out
+        if obj.published_time:
+            for attr, field in (('like_count', 'likes'), ('comment_count', 'comments')):
+                history = state.attrs[attr].history
+                if history.added:
+                    delta = (history.added[0] or 0) - ((history.deleted[0] if history.deleted else None) or 0)
+                    if delta:
+                        events.append((obj.user_id, obj.published_time, field, delta))
+    
+    return events
+
+def _apply_rollup_events(connection, events, skip_users=()):
+    """Add rollup events to user_daily_stats and user_hourly_stats"""
+    daily = defaultdict(Counter)
+    hourly = defaultdict(Counter)
+    for user_id, when, field, amount in events:
+        if user_id in skip_users:
+            continue
+        daily[(user_id, when.date())][field] += amount
+        hourly[(user_id, when.weekday(), when.hour)][field] += amount
+    
+    _upsert_counts(connection, UserDailyStats.__table__, ('user_id', 'day'), daily)
+    _upsert_counts(connection, UserHourlyStats.__table__, ('user_id', 'weekday', 'hour'), hourly)
+
+def _upsert_counts(connection, table, key_columns, rows):
+    """Add counts to rows of a rollup table, creating rows that don't exist yet"""
+    dialect_insert = {'postgresql': pg_insert, 'sqlite': sqlite_insert}.get(connection.dialect.name)
+    
+    for key, changes in rows.items():
+        values = {field: amount for field, amount in changes.items() if amount}
+        if not values:
+            continue
+        keys = dict(zip(key_columns, key))
+        
+        if dialect_insert:
+            stmt = dialect_insert(table).values(**keys, **values)
+            connection.execute(stmt.on_conflict_do_update(
+                index_elements=list(key_columns),
+                set_={field: table.c[field] + stmt.excluded[field] for field in values}
+            ))
+            continue
+        
+        result = connection.execute(
+            update(table)
+            .where(*[table.c[column] == value for column, value in keys.items()])
+            .values({field: table.c[field] + amount for field, amount in values.items()})
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(**keys, **values))
+
+@event.listens_for(OrmSession, 'after_flush')
+def _update_post_counters(session, flush_context):
+    """Apply Post status changes to user_post_counters and the rollups inside the same transaction"""
+    deltas = _collect_status_deltas(session)
+    events = _collect_rollup_events(session, datetime.utcnow())
+    if not deltas and not events:
+        return
+    
+    deleted_users = {obj.id for obj in session.deleted if isinstance(obj, User)}
+    connection = session.connection()
+    _apply_counter_deltas(connection, deltas, skip_users=deleted_users)
+    _apply_rollup_events(connection, events, skip_users=deleted_users)
+
+def _apply_counter_deltas(connection, deltas, skip_users=()):
+    """Add per-user status count changes to user_post_counters and bump each user's post version"""
+    table = UserPostCounter.__table__
+    
+    for user_id, changes in deltas.items():
+        if user_id in skip_users:
+            continue
+        values = {
+            status.value: table.c[status.value] + delta
+            for status, delta in changes.items() if delta
+        }
+        result = connection.execute(
+            update(table)
+            .where(table.c.user_id == user_id)
+            .values(version=table.c.version + 1, updated_at=datetime.utcnow(), **values)
+        )
+        if result.rowcount == 0:
+            # No counter row yet - the recount already includes this flush
+            _rebuild_counter_row(connection, user_id)
+
+def insert_posts(rows):
+    """Insert many posts with one executemany (caller commits).
+    
+    Bypasses the unit of work, so the user counters are updated here in
+    the same transaction. Returns (id, status, scheduled_time) per row, in
+    row order.
+    """
+    inserted = db.session.execute(
+        insert(Post).returning(Post.id, Post.status, Post.scheduled_time, sort_by_parameter_order=True),
+        rows
+    ).all()
+    
+    now = datetime.utcnow()
+    deltas = defaultdict(Counter)
+    events = []
+    for row in rows:
+        status = row.get('status') or PostStatus.DRAFT
+        deltas[row['user_id']][status] += 1
+        if status in ROLLUP_STATUSES:
+            events.append((row['user_id'], row.get('published_time') or now, ROLLUP_STATUSES[status], 1))
+        if row.get('published_time'):
+            events += _engagement_events(row['user_id'], row['published_time'],
+                                         row.get('like_count'), row.get('comment_count'))
+    _apply_counter_deltas(db.session.connection(), deltas)
+    _apply_rollup_events(db.session.connection(), events)
+    return inserted
+
+def update_posts(criteria, values, from_statuses, returning=()):
+    """Set-based UPDATE of the posts matching criteria (caller commits).
+    
+    Runs one statement per source status, so the user counters and
+    rollups can be adjusted exactly without reading the rows first.
+    Returns (id, old status, *returning) per updated post.
+    """
+    new_status = values.get('status')
+    now = datetime.utcnow()
+    deltas = defaultdict(Counter)
+    events = []
+    updated = []
+    # Rows already in the new status go first, or they would match again after moving into it
+    for status in sorted(from_statuses, key=lambda status: status != new_status):
+        rows = db.session.execute(
+            update(Post)
+            .where(*criteria, Post.status == status)
+            .values(**values)
+            .returning(Post.id, Post.user_id, *returning),
+            execution_options={'synchronize_session': False}
+        ).all()
+        for post_id, user_id, *extra in rows:
+            updated.append((post_id, status, *extra))
+            changes = deltas[user_id]
+            if new_status and new_status != status:
+                changes[status] -= 1
+                changes[new_status] += 1
+                if new_status in ROLLUP_STATUSES:
+                    events.append((user_id, now, ROLLUP_STATUSES[new_status], 1))
+    _apply_counter_deltas(db.session.connection(), deltas)
+    _apply_rollup_events(db.session.connection(), events)
+    return updated
+
+def delete_posts(criteria):
+    """Set-based DELETE of the posts matching criteria, updating the counters (caller commits).
+    
+    Returns (id, status, media_hash, image_path) per deleted post.
+    """
+    rows = db.session.execute(
+        delete(Post)
+        .where(*criteria)
+        .returning(Post.id, Post.user_id, Post.status, Post.media_hash, Post.image_path),
+        execution_options={'synchronize_session': False}
+    ).all()
+    deltas = defaultdict(Counter)
+    for post_id, user_id, status, media_hash, image_path in rows:
+        deltas[user_id][status] -= 1
+    _apply_counter_deltas(db.session.connection(), deltas)
+    return [(post_id, status, media_hash, image_path) for post_id, user_id, status, media_hash, image_path in rows]
+
+def touch_posts(user_ids):
+    """Bump the post version of users whose posts were changed by a Core UPDATE (caller commits)"""
+    _apply_counter_deltas(db.session.connection(), {user_id: Counter() for user_id in set(user_ids)})
+
+def get_post_version(user_id):
+    """A user's post version; it changes whenever any of their posts is written"""
+    table = UserPostCounter.__table__
+    return db.session.execute(select(table.c.version).where(table.c.user_id == user_id)).scalar() or 0
+
+def shifted_time(column, seconds):
+    """SQL expression for a DateTime column moved by a whole number of seconds"""
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite stores 'YYYY-MM-DD HH:MM:SS.ffffff' text; shift the seconds and keep the fraction
+        return func.strftime('%Y-%m-%d %H:%M:%S', column, f"{int(seconds):+d} seconds", type_=db.String).concat(
+            func.substr(column, 20)
+        )
+    return column + timedelta(seconds=int(seconds))
+
 def init_db(app):
     """Initialize the database"""
+    from migrations import run_migrations
+    
     db.init_app(app)
     
     with app.app_context():
@@ -75,18 +535,241 @@ def init_db(app):
         except Exception as e:
             print(f"Database initialization note: {e}")
             print("Database tables may already exist - continuing...")
+        
+        # Bring existing tables up to date (indexes, new columns, backfills)
+        run_migrations(db.engine)
+
+def rebuild_user_stats(user_id):
+    """Rebuild a user's counter row from the posts table"""
+    _rebuild_counter_row(db.session.connection(), user_id)
+    db.session.commit()
+
+def rebuild_all_user_stats():
+    """Rebuild the counter rows of every user"""
+    connection = db.session.connection()
+    for (user_id,) in connection.execute(select(User.id)):
+        _rebuild_counter_row(connection, user_id)
+    db.session.commit()
+
+def _rebuild_rollup_rows(connection, user_id):
+    """Recompute a user's rollup rows from the posts table.
+    
+    Only an approximation of the live rollups: failures are dated by the
+    post's last update and scheduling by its creation.
+    """
+    events = []
+    rows = connection.execute(
+        select(Post.status, Post.scheduled_time, Post.published_time, Post.created_at, Post.updated_at,
+               Post.like_count, Post.comment_count)
+        .where(Post.user_id == user_id)
+    )
+    for status, scheduled_time, published_time, created_at, updated_at, likes, comments in rows:
+        if scheduled_time and created_at:
+            events.append((user_id, created_at, 'scheduled', 1))
+        if status == PostStatus.PUBLISHED and published_time:
+            events.append((user_id, published_time, 'published', 1))
+            events.append((user_id, published_time, 'likes', likes or 0))
+            events.append((user_id, published_time, 'comments', comments or 0))
+        elif status == PostStatus.FAILED and (updated_at or created_at):
+            events.append((user_id, updated_at or created_at, 'failed', 1))
+    
+    for table in (UserDailyStats.__table__, UserHourlyStats.__table__):
+        connection.execute(delete(table).where(table.c.user_id == user_id))
+    _apply_rollup_events(connection, events)
+
+def rebuild_all_user_rollups():
+    """Rebuild the rollup rows of every user"""
+    connection = db.session.connection()
+    for (user_id,) in connection.execute(select(User.id)).all():
+        _rebuild_rollup_rows(connection, user_id)
+    db.session.commit()
 
 def get_user_stats(user_id):
     """Get statistics for a user's posts"""
-    total_posts = Post.query.filter_by(user_id=user_id).count()
-    published_posts = Post.query.filter_by(user_id=user_id, status=PostStatus.PUBLISHED).count()
-    scheduled_posts = Post.query.filter_by(user_id=user_id, status=PostStatus.SCHEDULED).count()
-    failed_posts = Post.query.filter_by(user_id=user_id, status=PostStatus.FAILED).count()
+    table = UserPostCounter.__table__
+    row = db.session.execute(select(table).where(table.c.user_id == user_id)).mappings().first()
+    
+    if row is None:
+        # Counter row missing (older data) - rebuild it once from the posts table
+        counts = _rebuild_counter_row(db.session.connection(), user_id)
+        db.session.commit()
+    else:
+        counts = {status.value: row[status.value] for status in PostStatus}
+    
+    total_posts = sum(counts.values())
+    published_posts = counts['published']
     
     return {
         'total': total_posts,
+        'draft': counts['draft'],
         'published': published_posts,
-        'scheduled': scheduled_posts,
-        'failed': failed_posts,
+        'scheduled': counts['scheduled'],
+        'failed': counts['failed'],
+        'cancelled': counts['cancelled'],
         'success_rate': round((published_posts / total_posts * 100) if total_posts > 0 else 0, 2)
     }
+
+def get_retry_stats(user_id):
+    """Count a user's posts that have failed at least once, by failure class and current status"""
+    rows = db.session.execute(
+        select(Post.failure_class, Post.status, func.count())
+        .where(Post.user_id == user_id, Post.failure_class.isnot(None))
+        .group_by(Post.failure_class, Post.status)
+    ).all()
+    
+    stats = {}
+    for failure_class, status, count in rows:
+        counts = stats.setdefault(failure_class, {'retrying': 0, 'failed': 0, 'other': 0})
+        if status == PostStatus.SCHEDULED:
+            counts['retrying'] += count
+        elif status == PostStatus.FAILED:
+            counts['failed'] += count
+        else:
+            counts['other'] += count
+    return stats
+
+# List views read at most this much of a post's text. The previews select one
+# character more, so a template cutting at or below the limit can still tell
+# whether the cut needs an ellipsis.
+PREVIEW_LENGTH = 200
+ERROR_PREVIEW_LENGTH = 300
+
+# What post cards and list pages show: no full content or error_message
+POST_CARD_COLUMNS = (
+    Post.id, Post.status, Post.image_path, Post.media_status, Post.scheduled_time, Post.published_time,
+    Post.retry_count, Post.failure_class, Post.like_count, Post.comment_count, Post.engagement_synced_at,
+    Post.created_at, Post.updated_at,
+    func.substr(Post.content, 1, PREVIEW_LENGTH + 1).label('content_preview'),
+    func.substr(Post.error_message, 1, ERROR_PREVIEW_LENGTH + 1).label('error_preview'),
+)
+
+def post_card_dict(card):
+    """JSON for a POST_CARD_COLUMNS row, with previews cut to their limits"""
+    content = card.content_preview or ''
+    error = card.error_preview
+    return {
+        'id': card.id,
+        'content_preview': content[:PREVIEW_LENGTH],
+        'content_truncated': len(content) > PREVIEW_LENGTH,
+        'image_path': card.image_path,
+        'media_status': card.media_status.value if card.media_status else None,
+        'status': card.status.value,
+        'scheduled_time': card.scheduled_time.isoformat() if card.scheduled_time else None,
+        'published_time': card.published_time.isoformat() if card.published_time else None,
+        'error_preview': error[:ERROR_PREVIEW_LENGTH] if error else None,
+        'error_truncated': bool(error) and len(error) > ERROR_PREVIEW_LENGTH,
+        'retry_count': card.retry_count or 0,
+        'failure_class': card.failure_class,
+        'like_count': card.like_count,
+        'comment_count': card.comment_count,
+        'created_at': card.created_at.isoformat(),
+        'updated_at': card.updated_at.isoformat()
+    }
+
+def encode_cursor(sort_value, post_id):
+    """Encode a keyset position as an opaque URL-safe cursor"""
+    raw = f"{sort_value.isoformat()}|{post_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, post_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(sort_value), int(post_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def build_posts_page_query(user_id, statuses=None, cursor=None, order='created', columns=None):
+    """Build the keyset query behind get_posts_page (without the LIMIT)"""
+    query = (db.session.query(*columns) if columns else Post.query).filter(Post.user_id == user_id)
+    if statuses:
+        query = query.filter(Post.status.in_(statuses))
+    
+    if order == 'scheduled':
+        sort_column = Post.scheduled_time
+        query = query.filter(Post.scheduled_time.isnot(None))
+        if cursor:
+            sort_value, post_id = decode_cursor(cursor)
+            query = query.filter(db.or_(
+                sort_column > sort_value,
+                db.and_(sort_column == sort_value, Post.id > post_id)
+            ))
+        return query.order_by(sort_column.asc(), Post.id.asc())
+    
+    sort_column = Post.created_at
+    if cursor:
+        sort_value, post_id = decode_cursor(cursor)
+        query = query.filter(db.or_(
+            sort_column < sort_value,
+            db.and_(sort_column == sort_value, Post.id < post_id)
+        ))
+    return query.order_by(sort_column.desc(), Post.id.desc())
+
+def get_posts_page(user_id, statuses=None, cursor=None, limit=20, order='created', columns=None):
+    """Get one page of a user's posts using keyset pagination.
+    
+    order='created' walks (created_at, id) newest first, order='scheduled'
+    walks (scheduled_time, id) soonest first. Returns (posts, next_cursor);
+    next_cursor is None on the last page. With columns (e.g.
+    POST_CARD_COLUMNS, which must include id and the sort column) the
+    posts are rows of just those columns instead of Post objects.
+    """
+    query = build_posts_page_query(user_id, statuses, cursor, order, columns)
+    
+    # Fetch one extra row to know whether another page exists
+    posts = query.limit(limit + 1).all()
+    if len(posts) <= limit:
+        return posts, None
+    
+    posts = posts[:limit]
+    last = posts[-1]
+    last_value = last.scheduled_time if order == 'scheduled' else last.created_at
+    return posts, encode_cursor(last_value, last.id)
+
+def build_due_posts_query(now, limit=None):
+    """Scheduled posts that are due and not leased to a worker, oldest first"""
+    query = (
+        select(Post.id)
+        .where(
+            Post.status == PostStatus.SCHEDULED,
+            Post.scheduled_time <= now,
+            db.or_(Post.lease_expires_at.is_(None), Post.lease_expires_at < now)
+        )
+        .order_by(Post.scheduled_time.asc())
+    )
+    if limit:
+        query = query.limit(limit)
+    return query
+
+def build_engagement_due_query(now, oldest, limit=None):
+    """Published posts newer than `oldest` whose engagement poll is due, newest first"""
+    query = (
+        select(Post.id)
+        .where(
+            Post.status == PostStatus.PUBLISHED,
+            Post.linkedin_post_id.isnot(None),
+            Post.published_time >= oldest,
+            db.or_(Post.engagement_next_sync_at.is_(None), Post.engagement_next_sync_at <= now)
+        )
+        .order_by(Post.published_time.desc())
+    )
+    if limit:
+        query = query.limit(limit)
+    return query
+
+def build_expiring_tokens_query(horizon, retry_before, limit=None):
+    """Users whose refreshable token expires before `horizon` and wasn't tried since `retry_before`"""
+    query = (
+        select(User.id)
+        .where(
+            User.token_expires_at < horizon,
+            User.refresh_token.isnot(None),
+            User.token_refresh_error.is_(None),
+            db.or_(User.token_refresh_attempted_at.is_(None), User.token_refresh_attempted_at < retry_before)
+        )
+        .order_by(User.token_expires_at.asc())
+    )
+    if limit:
+        query = query.limit(limit)
+    return query
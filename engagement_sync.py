@@ -0,0 +1,258 @@
+"""
+Post engagement sync.
+
+Reads likes and comments for published posts from LinkedIn's socialActions
+endpoint and stores each reading as a PostEngagementSnapshot, so analytics
+can show engagement over time. Recent posts are polled often and older ones
+less so (ENGAGEMENT_SYNC_SCHEDULE); posts older than its last tier are no
+longer polled. The scheduler runs sync_engagement() periodically; it can
+also be run by hand:
+    
+    python engagement_sync.py
+    python engagement_sync.py --status
+
+Every poll takes a token from the 'engagement' rate limit bucket
+(ENGAGEMENT_SYNC_PER_HOUR) on top of the member and app buckets. Polls are
+only made while the app and member buckets are above
+ENGAGEMENT_SYNC_APP_RESERVE of their capacity, so publishing always has API
+budget left.
+"""
+
+from datetime import datetime, timedelta
+import re
+import sys
+from sqlalchemy import select, update, func
+from database import db, Post, PostStatus, PostEngagementSnapshot, build_engagement_due_query
+from metrics import ENGAGEMENT_SYNCS
+from rate_limiter import RateLimited, get_rate_limiter, member_bucket, APP_BUCKET, ENGAGEMENT_BUCKET
+
+# Post age -> poll interval: every 15 minutes for 6 hours, hourly to 2 days,
+# every 6 hours to a week, then daily until the post is 30 days old
+DEFAULT_SCHEDULE = '6h:15m,2d:1h,7d:6h,30d:1d'
+
+# A claimed post is handed back this long after the claim if its process dies
+CLAIM_MINUTES = 10
+
+_DURATION_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+
+def parse_duration(value):
+    """'15m', '6h', '2d' -> timedelta"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhd])\s*', value)
+    if not match:
+        raise ValueError(f"Invalid duration '{value}' (expected e.g. 15m, 6h, 2d)")
+    return timedelta(**{_DURATION_UNITS[match.group(2)]: float(match.group(1))})
+
+def parse_schedule(spec):
+    """'6h:15m,2d:1h' -> [(max post age, poll interval), ...] ordered by age"""
+    tiers = []
+    for part in (spec or DEFAULT_SCHEDULE).split(','):
+        age, _, interval = part.partition(':')
+        tiers.append((parse_duration(age), parse_duration(interval)))
+    return sorted(tiers)
+
+def poll_interval(published_time, now, schedule):
+    """How long until a post of this age is polled again; None once it is past the last tier"""
+    age = now - published_time
+    for max_age, interval in schedule:
+        if age < max_age:
+            return interval
+    return None
+
+def claim_due_posts(limit, now, oldest, skip_ids=()):
+    """Stamp up to `limit` due posts' next sync with a short claim and return their ids.
+    
+    As with token maintenance, the stamp is the claim: the UPDATE re-checks
+    that the post is still due, so two processes never poll the same post.
+    Posts in skip_ids (already handed back this run) are left alone.
+    """
+    claim_until = now + timedelta(minutes=CLAIM_MINUTES)
+    due = build_engagement_due_query(now, oldest, limit)
+    if skip_ids:
+        due = due.where(Post.id.not_in(skip_ids))
+    db.session.execute(
+        update(Post)
+        .where(
+            Post.id.in_(due.scalar_subquery()),
+            db.or_(Post.engagement_next_sync_at.is_(None), Post.engagement_next_sync_at <= now)
+        )
+        .values(engagement_next_sync_at=claim_until),
+        execution_options={'synchronize_session': False}
+    )
+    claimed = select(Post.id).where(Post.engagement_next_sync_at == claim_until)
+    if skip_ids:
+        claimed = claimed.where(Post.id.not_in(skip_ids))
+    post_ids = db.session.execute(claimed).scalars().all()
+    db.session.commit()
+    return post_ids
+
+def parse_social_actions(data):
+    """(likes, comments) from a socialActions response"""
+    likes = (data.get('likesSummary') or {}).get('totalLikes', 0)
+    comments = data.get('commentsSummary') or {}
+    return likes, comments.get('aggregatedTotalComments', comments.get('totalFirstLevelComments', 0))
+
+def sync_post(linkedin_api, post, now, schedule):
+    """Poll one post and store a snapshot (caller commits).
+    
+    Returns True if a snapshot was stored. The next poll is set from the
+    post's age either way; RateLimited is raised without changing anything.
+    """
+    user = post.user
+    data = None
+    if not user.token_expires_at or user.token_expires_at > now:
+        data = linkedin_api.get_post_stats(user.access_token, post.linkedin_post_id, user.linkedin_id)
+    
+    # Only change the row after the call, so no write is held open while waiting on LinkedIn
+    interval = poll_interval(post.published_time, now, schedule)
+    post.engagement_next_sync_at = now + interval if interval else None
+    if data is None:
+        return False
+    
+    post.like_count, post.comment_count = parse_social_actions(data)
+    post.engagement_synced_at = now
+    db.session.add(PostEngagementSnapshot(
+        post_id=post.id,
+        captured_at=now,
+        like_count=post.like_count,
+        comment_count=post.comment_count
+    ))
+    return True
+
+def _budget_wait(limiter, reserve, member_key):
+    """(seconds until the sync may call for this member, bucket key) - (0, None) if it may now"""
+    if not limiter or not limiter.enabled:
+        return 0, None
+    for level in limiter.levels([APP_BUCKET, member_key]):
+        if level['fill_ratio'] < reserve:
+            # Leave the rest of the budget to publishing
+            return max(level['blocked_for_seconds'], 60), level['key']
+    return limiter.try_acquire(ENGAGEMENT_BUCKET), ENGAGEMENT_BUCKET
+
+def _release(post_ids, when):
+    # Hand unpolled posts back, due again at `when`
+    db.session.execute(
+        update(Post)
+        .where(Post.id.in_(post_ids))
+        .values(engagement_next_sync_at=when),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+
+def sync_engagement(config, linkedin_api, now=None):
+    """Poll, in batches, every published post due an engagement reading.
+    
+    Stops early, handing the rest back for the next run, when the
+    engagement budget runs out or the app bucket falls below the reserve.
+    Returns a summary of synced / failed / deferred counts.
+    """
+    now = now or datetime.utcnow()
+    schedule = parse_schedule(config.get('ENGAGEMENT_SYNC_SCHEDULE'))
+    oldest = now - schedule[-1][0]
+    batch_size = config.get('ENGAGEMENT_SYNC_BATCH_SIZE', 50)
+    max_per_run = config.get('ENGAGEMENT_SYNC_MAX_PER_RUN', 200)
+    reserve = config.get('ENGAGEMENT_SYNC_APP_RESERVE', 0.5)
+    limiter = get_rate_limiter()
+    
+    summary = {'synced': 0, 'failed': 0, 'deferred': 0}
+    processed = 0
+    # Posts of members short of budget, handed back and not claimed again this run
+    throttled_ids = set()
+    
+    while processed < max_per_run:
+        post_ids = claim_due_posts(min(batch_size, max_per_run - processed), now, oldest, throttled_ids)
+        if not post_ids:
+            break
+        
+        for index, post_id in enumerate(post_ids):
+            post = db.session.get(Post, post_id)
+            member_key = member_bucket(post.user.linkedin_id)
+            try:
+                wait, key = _budget_wait(limiter, reserve, member_key)
+                if wait:
+                    raise RateLimited(key, wait)
+                
+                synced = sync_post(linkedin_api, post, now, schedule)
+                db.session.commit()
+            except RateLimited as e:
+                db.session.rollback()
+                if e.key == member_key:
+                    # Only this member is short of budget; other members' posts carry on,
+                    # and this post waits until the member's budget is back
+                    _release([post_id], now + timedelta(seconds=e.retry_after))
+                    throttled_ids.add(post_id)
+                    summary['deferred'] += 1
+                    ENGAGEMENT_SYNCS.labels('deferred').inc()
+                    continue
+                
+                remaining = post_ids[index:]
+                _release(remaining, now)
+                summary['deferred'] += len(remaining)
+                ENGAGEMENT_SYNCS.labels('deferred').inc(len(remaining))
+                print(f"Engagement sync paused by rate limiting on '{e.key}' ({e.retry_after:.0f}s)")
+                print(f"Engagement sync: {summary}")
+                return summary
+            
+            outcome = 'synced' if synced else 'failed'
+            summary[outcome] += 1
+            ENGAGEMENT_SYNCS.labels(outcome).inc()
+        
+        processed += len(post_ids)
+        if len(post_ids) < batch_size:
+            break
+    
+    if processed:
+        print(f"Engagement sync: {summary}")
+    return summary
+
+def get_engagement_series(post_id, since=None):
+    """A post's snapshots, oldest first, as (captured_at, likes, comments)"""
+    query = (
+        select(PostEngagementSnapshot.captured_at, PostEngagementSnapshot.like_count,
+               PostEngagementSnapshot.comment_count)
+        .where(PostEngagementSnapshot.post_id == post_id)
+        .order_by(PostEngagementSnapshot.captured_at.asc())
+    )
+    if since:
+        query = query.where(PostEngagementSnapshot.captured_at >= since)
+    return db.session.execute(query).all()
+
+def get_engagement_status(now=None):
+    """Counts of published posts by sync state, and snapshots taken in the last day"""
+    now = now or datetime.utcnow()
+    counts = db.session.execute(
+        select(
+            func.count().filter(Post.engagement_synced_at.isnot(None)).label('synced'),
+            func.count().filter(
+                Post.engagement_next_sync_at.isnot(None), Post.engagement_next_sync_at <= now
+            ).label('overdue'),
+            func.count().label('published')
+        )
+        .where(Post.status == PostStatus.PUBLISHED)
+    ).mappings().one()
+    status = dict(counts)
+    status['snapshots_last_day'] = db.session.execute(
+        select(func.count()).where(PostEngagementSnapshot.captured_at >= now - timedelta(days=1))
+    ).scalar()
+    return status
+
+def main():
+    from flask import Flask
+    from config import load_config
+    from linkedin_api import LinkedInAPI
+    from rate_limiter import RateLimiter
+    
+    app = Flask(__name__)
+    app.config.from_object(load_config())
+    db.init_app(app)
+    
+    with app.app_context():
+        if '--status' in sys.argv:
+            for key, value in get_engagement_status().items():
+                print(f"{key:20s} {value}")
+            return
+        
+        RateLimiter(app)
+        sync_engagement(app.config, LinkedInAPI.from_config(app.config))
+
+if __name__ == '__main__':
+    main()
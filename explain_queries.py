@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+LinkedIn Scheduler - Query Plan Check
+
+Prints the database's plan for each hot query so index changes can be
+checked on SQLite (EXPLAIN QUERY PLAN) and PostgreSQL (EXPLAIN).
+
+    python explain_queries.py              # plans for the configured DATABASE_URL
+    python explain_queries.py --analyze    # PostgreSQL only: EXPLAIN ANALYZE
+    python explain_queries.py --user-id 42
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import select, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from config import load_config
+from database import (db, Post, PostStatus, UserPostCounter, POST_CARD_COLUMNS, build_posts_page_query,
+                      build_due_posts_query, build_expiring_tokens_query)
+
+class Explain(Executable, ClauseElement):
+    """Wrap a statement in EXPLAIN for the current dialect"""
+    inherit_cache = False
+    
+    def __init__(self, statement, analyze=False):
+        self.statement = statement
+        self.analyze = analyze
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    if compiler.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif element.analyze:
+        prefix = 'EXPLAIN ANALYZE '
+    else:
+        prefix = 'EXPLAIN '
+    return prefix + compiler.process(element.statement, **kw)
+
+def hot_queries(user_id, page_size):
+    """The statements behind the dashboard, stats and scheduler"""
+    now = datetime.utcnow()
+    return [
+        ('Dashboard: all posts page',
+         build_posts_page_query(user_id, columns=POST_CARD_COLUMNS).limit(page_size + 1).statement),
+        ('Dashboard: drafts tab',
+         build_posts_page_query(user_id, [PostStatus.DRAFT], columns=POST_CARD_COLUMNS)
+         .limit(page_size + 1).statement),
+        ('Dashboard: history tab',
+         build_posts_page_query(user_id, [PostStatus.PUBLISHED, PostStatus.FAILED], columns=POST_CARD_COLUMNS)
+         .limit(page_size + 1).statement),
+        ('Dashboard: scheduled timeline',
+         build_posts_page_query(user_id, [PostStatus.SCHEDULED], order='scheduled', columns=POST_CARD_COLUMNS)
+         .limit(page_size + 1).statement),
+        ('Scheduler: due posts scan',
+         build_due_posts_query(now, limit=50)),
+        ('Token maintenance: tokens close to expiry',
+         build_expiring_tokens_query(now + timedelta(hours=72), now - timedelta(hours=1), limit=50)),
+        ('Stats: counter row lookup',
+         select(UserPostCounter).where(UserPostCounter.user_id == user_id)),
+        ('Stats: rebuild GROUP BY status',
+         select(Post.status, func.count(Post.id)).where(Post.user_id == user_id).group_by(Post.status)),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description='Show query plans for the hot queries')
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--analyze', action='store_true', help='run EXPLAIN ANALYZE (PostgreSQL)')
+    args = parser.parse_args()
+    
+    app = Flask(__name__)
+    app.config.from_object(load_config())
+    db.init_app(app)
+    
+    with app.app_context():
+        print(f"Database: {db.engine.dialect.name}")
+        for title, statement in hot_queries(args.user_id, app.config['POSTS_PAGE_SIZE']):
+            print(f"\n== {title}")
+            for row in db.session.execute(Explain(statement, analyze=args.analyze)):
+                # SQLite rows are (id, parent, notused, detail); PostgreSQL rows are one text column
+                print(f"   {row[-1]}")
+
+if __name__ == '__main__':
+    main()
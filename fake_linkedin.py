@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the LinkedIn API, for load tests and benchmarks.
+
+Implements the calls LinkedInAPI makes (OAuth authorization and token
+exchange, userinfo, registerUpload, the image upload PUT, ugcPosts and
+socialActions) with configurable latency, error rates, 429 throttling,
+hung requests and slow uploads. Point the app at it with:
+    
+    python fake_linkedin.py --port 8765 --latency lognormal:120:0.6 --error-rate 0.02
+    LINKEDIN_API_BASE_URL=http://127.0.0.1:8765/v2 \\
+    LINKEDIN_TOKEN_URL=http://127.0.0.1:8765/oauth/v2/accessToken \\
+    LINKEDIN_AUTH_URL=http://127.0.0.1:8765/oauth/v2/authorization python app.py
+
+GET /_fake/stats returns request counts by endpoint and status;
+POST /_fake/reset clears them and the rate limit windows.
+"""
+
+import argparse
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from urllib.parse import urlparse, parse_qs, urlencode, unquote
+
+ENDPOINTS = ('authorization', 'access_token', 'userinfo', 'register_upload', 'upload', 'ugc_posts', 'social_actions')
+
+class Latency:
+    """A latency distribution parsed from "kind:arg[:arg]", in milliseconds.
+    
+    const:50          always 50ms
+    uniform:20:200    between 20 and 200ms
+    normal:100:30     mean 100, standard deviation 30 (never below 0)
+    lognormal:80:0.5  median 80, sigma 0.5 - a long tail like real APIs
+    exp:100           exponential with mean 100
+    """
+    
+    KINDS = {'const': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exp': 1}
+    
+    def __init__(self, spec='const:0'):
+        kind, *args = spec.split(':')
+        if kind not in self.KINDS or len(args) != self.KINDS[kind]:
+            raise ValueError(f"Invalid latency '{spec}' (see fake_linkedin.Latency)")
+        self.spec = spec
+        self.kind = kind
+        self.args = [float(arg) for arg in args]
+    
+    def sample(self, rng):
+        """One delay in seconds"""
+        if self.kind == 'const':
+            ms = self.args[0]
+        elif self.kind == 'uniform':
+            ms = rng.uniform(*self.args)
+        elif self.kind == 'normal':
+            ms = rng.gauss(*self.args)
+        elif self.kind == 'lognormal':
+            ms = rng.lognormvariate(math.log(max(self.args[0], 0.001)), self.args[1])
+        else:
+            ms = rng.expovariate(1 / self.args[0]) if self.args[0] else 0
+        return max(0.0, ms) / 1000
+
+class FakeLinkedInConfig:
+    """Behaviour of the fake server; every field can be changed while it runs"""
+    
+    def __init__(self, latency='const:0', endpoint_latency=None, error_rate=0.0, error_status=500,
+                 throttle_rate=0.0, retry_after=60, member_limit=0, app_limit=0, limit_window=60,
+                 hang_rate=0.0, hang_seconds=60, upload_kbps=0, seed=None):
+        self.latency = Latency(latency)
+        self.endpoint_latency = {name: Latency(spec) for name, spec in (endpoint_latency or {}).items()}
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.member_limit = member_limit
+        self.app_limit = app_limit
+        self.limit_window = limit_window
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.upload_kbps = upload_kbps
+        self.seed = seed
+    
+    def latency_for(self, endpoint):
+        return self.endpoint_latency.get(endpoint, self.latency)
+
+class FakeLinkedInState:
+    """Request counts, rate limit windows and created posts, shared by all handler threads"""
+    
+    def __init__(self, config):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.counts = Counter()
+            self.windows = {}
+            self.posts = {}
+            self.next_id = 1
+    
+    def random(self):
+        with self._lock:
+            return self.rng.random()
+    
+    def latency(self, endpoint):
+        with self._lock:
+            return self.config.latency_for(endpoint).sample(self.rng)
+    
+    def count(self, endpoint, status):
+        with self._lock:
+            self.counts[(endpoint, status)] += 1
+    
+    def next_number(self):
+        with self._lock:
+            number = self.next_id
+            self.next_id += 1
+            return number
+    
+    def take(self, key, limit):
+        """Count a call against a fixed window; returns 0 if allowed, else seconds until the window resets"""
+        if not limit:
+            return 0
+        now = time.time()
+        with self._lock:
+            started, used = self.windows.get(key, (now, 0))
+            if now - started >= self.config.limit_window:
+                started, used = now, 0
+            if used >= limit:
+                return max(1, math.ceil(started + self.config.limit_window - now))
+            self.windows[key] = (started, used + 1)
+            return 0
+    
+    def add_post(self, post_id, author):
+        with self._lock:
+            self.posts[post_id] = {'author': author, 'created': time.time()}
+    
+    def post(self, post_id):
+        with self._lock:
+            return self.posts.get(post_id)
+    
+    def stats(self):
+        with self._lock:
+            by_endpoint = {}
+            for (endpoint, status), count in sorted(self.counts.items()):
+                by_endpoint.setdefault(endpoint, {})[str(status)] = count
+            return {'requests': by_endpoint, 'posts': len(self.posts)}
+
+def member_for_token(access_token):
+    """Stable fake member id for an access token"""
+    return 'fake' + hashlib.sha1(access_token.encode()).hexdigest()[:12]
+
+class FakeLinkedInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeLinkedIn/1.0'
+    
+    ROUTES = [
+        ('GET', re.compile(r'^/oauth/v2/authorization$'), 'authorization'),
+        ('POST', re.compile(r'^/oauth/v2/accessToken$'), 'access_token'),
+        ('GET', re.compile(r'^/v2/userinfo$'), 'userinfo'),
+        ('POST', re.compile(r'^/v2/assets$'), 'register_upload'),
+        ('PUT', re.compile(r'^/upload/(?P<asset>[\w-]+)$'), 'upload'),
+        ('POST', re.compile(r'^/v2/ugcPosts$'), 'ugc_posts'),
+        ('GET', re.compile(r'^/v2/socialActions/(?P<post_id>.+)$'), 'social_actions'),
+    ]
+    
+    @property
+    def state(self):
+        return self.server.state
+    
+    def log_message(self, format, *args):
+        # One line per request would swamp a load test
+        pass
+    
+    def do_GET(self):
+        self._dispatch('GET')
+    
+    def do_POST(self):
+        self._dispatch('POST')
+    
+    def do_PUT(self):
+        self._dispatch('PUT')
+    
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        
+        if url.path == '/_fake/stats' and method == 'GET':
+            self._read_body()
+            return self._json(200, self.state.stats())
+        if url.path == '/_fake/reset' and method == 'POST':
+            self._read_body()
+            self.state.reset()
+            return self._json(200, {'reset': True})
+        
+        for route_method, pattern, endpoint in self.ROUTES:
+            match = pattern.match(url.path)
+            if match and route_method == method:
+                break
+        else:
+            self._read_body()
+            return self._json(404, {'message': f'No fake for {method} {url.path}'})
+        
+        status = self._handle(endpoint, url, match.groupdict())
+        self.state.count(endpoint, status)
+    
+    def _handle(self, endpoint, url, params):
+        config = self.state.config
+        
+        # Uploads are read at the configured bandwidth; everything else up front
+        body = self._read_body(config.upload_kbps if endpoint == 'upload' else 0)
+        time.sleep(self.state.latency(endpoint))
+        
+        if config.hang_rate and self.state.random() < config.hang_rate:
+            # Hold the request open past the client's read timeout
+            time.sleep(config.hang_seconds)
+            return self._json(504, {'message': 'Gateway timeout'})
+        
+        access_token = self._bearer_token()
+        if endpoint not in ('authorization', 'access_token', 'upload') and not access_token:
+            return self._json(401, {'message': 'Empty oauth2 access token'})
+        
+        # Throttling: random 429s, then per-member and app-wide windows
+        if endpoint not in ('authorization', 'upload'):
+            retry_after = 0
+            if config.throttle_rate and self.state.random() < config.throttle_rate:
+                retry_after = config.retry_after
+            retry_after = retry_after or self.state.take('app', config.app_limit)
+            if access_token:
+                retry_after = retry_after or self.state.take(access_token, config.member_limit)
+            if retry_after:
+                return self._json(429, {'message': 'Too many requests'}, {'Retry-After': str(retry_after)})
+        
+        if config.error_rate and self.state.random() < config.error_rate:
+            return self._json(config.error_status, {'message': 'Injected failure'})
+        
+        return getattr(self, f'_handle_{endpoint}')(url, params, body, access_token)
+    
+    def _handle_authorization(self, url, params, body, access_token):
+        query = parse_qs(url.query)
+        redirect_uri = query.get('redirect_uri', [''])[0]
+        if not redirect_uri:
+            return self._json(400, {'message': 'redirect_uri is required'})
+        location = f"{redirect_uri}?{urlencode({'code': uuid.uuid4().hex, 'state': query.get('state', [''])[0]})}"
+        return self._send(302, b'', headers={'Location': location})
+    
+    def _handle_access_token(self, url, params, body, access_token):
+        form = parse_qs(body.decode())
+        grant_type = form.get('grant_type', [''])[0]
+        if grant_type == 'refresh_token' and form.get('refresh_token', [''])[0].startswith('revoked'):
+            return self._json(400, {'error': 'invalid_grant', 'error_description': 'The token is revoked'})
+        if grant_type not in ('authorization_code', 'refresh_token'):
+            return self._json(400, {'error': 'unsupported_grant_type'})
+        return self._json(200, {
+            'access_token': 'fake-' + uuid.uuid4().hex,
+            'expires_in': 60 * 24 * 3600,
+            'refresh_token': 'fake-refresh-' + uuid.uuid4().hex,
+            'refresh_token_expires_in': 365 * 24 * 3600,
+            'scope': 'openid,profile,email,w_member_social'
+        })
+    
+    def _handle_userinfo(self, url, params, body, access_token):
+        member_id = member_for_token(access_token)
+        return self._json(200, {
+            'sub': member_id,
+            'given_name': 'Fake',
+            'family_name': member_id[-4:],
+            'email': f'{member_id}@example.com',
+            'picture': None
+        })
+    
+    def _handle_register_upload(self, url, params, body, access_token):
+        if parse_qs(url.query).get('action') != ['registerUpload']:
+            return self._json(400, {'message': 'Unsupported action'})
+        asset = f'C{self.state.next_number()}'
+        return self._json(200, {'value': {
+            'asset': f'urn:li:digitalmediaAsset:{asset}',
+            'uploadMechanism': {'com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest': {
+                'uploadUrl': f"http://{self.headers.get('Host')}/upload/{asset}",
+                'headers': {}
+            }}
+        }})
+    
+    def _handle_upload(self, url, params, body, access_token):
+        if not body:
+            return self._json(400, {'message': 'Empty upload'})
+        return self._send(201, b'')
+    
+    def _handle_ugc_posts(self, url, params, body, access_token):
+        try:
+            payload = json.loads(body)
+            author = payload['author']
+            text = payload['specificContent']['com.linkedin.ugc.ShareContent']['shareCommentary']['text']
+        except (ValueError, KeyError, TypeError):
+            return self._json(422, {'message': 'Malformed ugcPost'})
+        if len(text) > 3000:
+            return self._json(422, {'message': 'Commentary is too long'})
+        post_id = f'urn:li:share:{self.state.next_number()}'
+        self.state.add_post(post_id, author)
+        return self._json(201, {'id': post_id}, {'X-RestLi-Id': post_id})
+    
+    def _handle_social_actions(self, url, params, body, access_token):
+        post = self.state.post(unquote(params['post_id']))
+        if not post:
+            return self._json(404, {'message': 'Not found'})
+        # Engagement grows with the post's age, at a rate fixed per post
+        minutes = (time.time() - post['created']) / 60
+        rate = int(hashlib.sha1(unquote(params['post_id']).encode()).hexdigest()[:4], 16) / 65536
+        return self._json(200, {
+            'likesSummary': {'totalLikes': int(minutes * rate * 2)},
+            'commentsSummary': {'aggregatedTotalComments': int(minutes * rate / 3)}
+        })
+    
+    def _bearer_token(self):
+        auth = self.headers.get('Authorization', '')
+        return auth[7:] if auth.startswith('Bearer ') else None
+    
+    def _read_body(self, kbps=0):
+        """Read the request body, at most kbps kilobytes per second when kbps is set"""
+        remaining = int(self.headers.get('Content-Length') or 0)
+        chunks = []
+        chunk_size = int(kbps * 1024 / 10) if kbps else remaining
+        while remaining > 0:
+            chunk = self.rfile.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+            if kbps:
+                time.sleep(len(chunk) / (kbps * 1024))
+        return b''.join(chunks)
+    
+    def _json(self, status, payload, headers=None):
+        return self._send(status, json.dumps(payload).encode(), 'application/json', headers)
+    
+    def _send(self, status, body, content_type='text/plain', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+class FakeLinkedInServer:
+    """Run the fake API on a background thread, e.g. inside a benchmark:
+        
+        with FakeLinkedInServer(FakeLinkedInConfig(latency='const:50')) as fake:
+            app.config.update(fake.app_config())
+    """
+    
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.config = config or FakeLinkedInConfig()
+        self.httpd = ThreadingHTTPServer((host, port), FakeLinkedInHandler)
+        self.httpd.daemon_threads = True
+        # Plenty of room for a load test's connection bursts
+        self.httpd.request_queue_size = 1024
+        self.httpd.state = FakeLinkedInState(self.config)
+        self.thread = None
+    
+    @property
+    def state(self):
+        return self.httpd.state
+    
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}"
+    
+    def app_config(self):
+        """Config values that point LinkedInAPI and AsyncLinkedInAPI at this server"""
+        return {
+            'LINKEDIN_API_BASE_URL': f'{self.url}/v2',
+            'LINKEDIN_TOKEN_URL': f'{self.url}/oauth/v2/accessToken',
+            'LINKEDIN_AUTH_URL': f'{self.url}/oauth/v2/authorization',
+        }
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='fake-linkedin', daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def parse_endpoint_latency(values):
+    """{endpoint: spec} from repeated NAME=SPEC arguments"""
+    latencies = {}
+    for value in values or []:
+        name, _, spec = value.partition('=')
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}' (one of {', '.join(ENDPOINTS)})")
+        latencies[name] = spec
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the LinkedIn API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='const:0', help="Latency of every call, e.g. lognormal:80:0.5 (ms)")
+    parser.add_argument('--endpoint-latency', action='append', metavar='NAME=SPEC',
+                        help="Latency for one endpoint, e.g. ugc_posts=uniform:200:800 (repeatable)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of calls that fail")
+    parser.add_argument('--error-status', type=int, default=500, help="Status of injected failures")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of calls answered with 429")
+    parser.add_argument('--retry-after', type=int, default=60, help="Retry-After of random 429s (seconds)")
+    parser.add_argument('--member-limit', type=int, default=0, help="Calls per access token per window (0: no limit)")
+    parser.add_argument('--app-limit', type=int, default=0, help="Calls per window across all tokens (0: no limit)")
+    parser.add_argument('--limit-window', type=int, default=60, help="Rate limit window (seconds)")
+    parser.add_argument('--hang-rate', type=float, default=0.0, help="Fraction of calls held open for --hang-seconds")
+    parser.add_argument('--hang-seconds', type=float, default=60)
+    parser.add_argument('--upload-kbps', type=float, default=0, help="Upload bandwidth in KB/s (0: unlimited)")
+    parser.add_argument('--seed', type=int, help="Seed for repeatable latency and fault sequences")
+    args = parser.parse_args()
+    
+    try:
+        config = FakeLinkedInConfig(
+            latency=args.latency,
+            endpoint_latency=parse_endpoint_latency(args.endpoint_latency),
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            throttle_rate=args.throttle_rate,
+            retry_after=args.retry_after,
+            member_limit=args.member_limit,
+            app_limit=args.app_limit,
+            limit_window=args.limit_window,
+            hang_rate=args.hang_rate,
+            hang_seconds=args.hang_seconds,
+            upload_kbps=args.upload_kbps,
+            seed=args.seed
+        )
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+    
+    server = FakeLinkedInServer(config, args.host, args.port)
+    print(f"🧪 Fake LinkedIn API on {server.url}")
+    for name, value in server.app_config().items():
+        print(f"   {name}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping fake LinkedIn API")
+        print(json.dumps(server.state.stats(), indent=2))
+    finally:
+        server.httpd.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Rendered template fragment cache.
+
+Templates wrap repeated markup in a cache block keyed on what it renders
+from:
+    
+    {% cache post.id, post.updated_at %} ... {% endcache %}
+
+The full key also has the template name, the block's line and a digest of
+the template source, so editing a template or a post simply misses and old
+entries age out of the LRU. Every process keeps FRAGMENT_CACHE_SIZE
+fragments; with FRAGMENT_CACHE_URL set (redis://..., needs the redis
+package) misses are also looked up in, and written to, a cache shared by
+all processes.
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+from jinja2 import nodes
+from jinja2.exceptions import TemplateNotFound
+from jinja2.ext import Extension
+from markupsafe import Markup
+from metrics import FRAGMENT_CACHE_LOOKUPS
+
+class RedisFragmentStore:
+    """Fragments shared between processes, expiring after ttl_seconds"""
+    
+    def __init__(self, url, ttl_seconds=86400):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.ttl_seconds = ttl_seconds
+    
+    def get(self, key):
+        value = self.client.get(key)
+        return value.decode('utf-8') if value is not None else None
+    
+    def set(self, key, html):
+        self.client.set(key, html.encode('utf-8'), ex=self.ttl_seconds)
+
+class FragmentCache:
+    """Per-process LRU of rendered fragments, in front of an optional shared store.
+    
+    Keys never go stale (they change when the content does), so a
+    fragment found in either tier can be served as is. A failing shared
+    store counts as a miss.
+    """
+    
+    def __init__(self, max_size=2000, shared=None):
+        self.max_size = max_size
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        """A cache per the FRAGMENT_CACHE_* settings, or None when it is turned off"""
+        if not config.get('FRAGMENT_CACHE_ENABLED', True):
+            return None
+        
+        shared = None
+        url = config.get('FRAGMENT_CACHE_URL')
+        if url:
+            try:
+                shared = RedisFragmentStore(url, config.get('FRAGMENT_CACHE_TTL_SECONDS', 86400))
+            except ImportError:
+                print("⚠️  FRAGMENT_CACHE_URL is set but the redis package is not installed; "
+                      "caching fragments per process only")
+        return cls(max_size=config.get('FRAGMENT_CACHE_SIZE', 2000), shared=shared)
+    
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                FRAGMENT_CACHE_LOOKUPS.labels('hit').inc()
+                return html
+        
+        if self.shared:
+            try:
+                html = self.shared.get(key)
+            except Exception:
+                FRAGMENT_CACHE_LOOKUPS.labels('error').inc()
+                html = None
+            if html is not None:
+                FRAGMENT_CACHE_LOOKUPS.labels('shared_hit').inc()
+                self._remember(key, html)
+                return html
+        
+        FRAGMENT_CACHE_LOOKUPS.labels('miss').inc()
+        return None
+    
+    def set(self, key, html):
+        self._remember(key, html)
+        if self.shared:
+            try:
+                self.shared.set(key, html)
+            except Exception:
+                FRAGMENT_CACHE_LOOKUPS.labels('error').inc()
+    
+    def _remember(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class FragmentCacheExtension(Extension):
+    """The {% cache key, ... %} ... {% endcache %} tag"""
+    tags = {'cache'}
+    
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+    
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        
+        prefix = f"fragment:{parser.name}:{lineno}:{self._template_version(parser.name)}"
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.Const(prefix), nodes.List(parts)]), [], [], body
+        ).set_lineno(lineno)
+    
+    def _template_version(self, name):
+        """Digest of the template source, so edited templates get new keys"""
+        if not name or not self.environment.loader:
+            return ''
+        try:
+            source = self.environment.loader.get_source(self.environment, name)[0]
+        except TemplateNotFound:
+            return ''
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+    
+    def _render(self, prefix, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        
+        key = ':'.join([prefix, *(str(part) for part in parts)])
+        html = cache.get(key)
+        if html is None:
+            html = str(caller())
+            cache.set(key, html)
+        # Only ever holds output the template already escaped
+        return Markup(html)
+
+def init_fragment_cache(app):
+    """Add the cache tag to the app's templates; returns the cache (None when turned off)"""
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = FragmentCache.from_config(app.config)
+    return app.jinja_env.fragment_cache
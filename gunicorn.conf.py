@@ -0,0 +1,23 @@
+"""
+Gunicorn settings read automatically by `gunicorn app:app`.
+
+Web workers share one directory for Prometheus metrics so /metrics reports
+the whole server rather than whichever worker answered the scrape.
+"""
+
+import os
+import shutil
+
+# Must be set before the workers import prometheus_client
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/linkedin_scheduler_metrics')
+
+def on_starting(server):
+    """Start each run with an empty metrics directory"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that has exited"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
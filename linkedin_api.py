@@ -1,18 +1,168 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import threading
 from datetime import datetime, timedelta
-from urllib.parse import urlencode
+from urllib.parse import urlencode, quote
 import base64
 import os
+import time
+from metrics import observe_api_call
+from rate_limiter import RateLimited, get_rate_limiter, member_bucket, parse_retry_after, APP_BUCKET
+
+# Default (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_UPLOAD_TIMEOUT = (5, 120)
+DEFAULT_POOL_SIZE = 20
+
+DEFAULT_BASE_URL = 'https://api.linkedin.com/v2'
+DEFAULT_AUTH_URL = 'https://www.linkedin.com/oauth/v2/authorization'
+DEFAULT_TOKEN_URL = 'https://www.linkedin.com/oauth/v2/accessToken'
+
+# One pooled session per process, shared by the web app and the scheduler
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+class LinkedInAPIError(Exception):
+    """A publishing call failed; status_code is None when no response arrived"""
+    
+    def __init__(self, message, status_code=None):
+        self.status_code = status_code
+        super().__init__(message)
+
+def post_id_from_response(body, status_code):
+    """The id from a decoded create-post response; LinkedInAPIError (with the status) if it has none"""
+    post_id = body.get('id') if isinstance(body, dict) else None
+    if not post_id:
+        raise LinkedInAPIError(f"LinkedIn returned HTTP {status_code} without a post id", status_code)
+    return post_id
+
+def create_http_session(pool_size=DEFAULT_POOL_SIZE):
+    """Create a requests session with a keep-alive connection pool of pool_size per host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_http_session(pool_size=DEFAULT_POOL_SIZE):
+    """Get the process-wide pooled session, creating it on first use"""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = create_http_session(pool_size)
+    return _shared_session
+
+def build_register_upload_request(user_id):
+    """Body of the assets?action=registerUpload call for a feed image"""
+    return {
+        "registerUploadRequest": {
+            "recipes": ["urn:li:digitalmediaRecipe:feedshare-image"],
+            "owner": f"urn:li:person:{user_id}",
+            "serviceRelationships": [{
+                "relationshipType": "OWNER",
+                "identifier": "urn:li:userGeneratedContent"
+            }]
+        }
+    }
+
+def parse_register_upload_response(register_result):
+    """Return (upload_url, asset_id) from a registerUpload response"""
+    upload_url = register_result['value']['uploadMechanism']['com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest']['uploadUrl']
+    asset_id = register_result['value']['asset']
+    return upload_url, asset_id
+
+def build_post_payload(user_id, content, image_asset_id=None):
+    """Body of a ugcPosts call, with the image attached if given"""
+    post_data = {
+        "author": f"urn:li:person:{user_id}",
+        "lifecycleState": "PUBLISHED",
+        "specificContent": {
+            "com.linkedin.ugc.ShareContent": {
+                "shareCommentary": {
+                    "text": content
+                },
+                "shareMediaCategory": "NONE"
+            }
+        },
+        "visibility": {
+            "com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"
+        }
+    }
+    
+    # Add image if provided
+    if image_asset_id:
+        post_data["specificContent"]["com.linkedin.ugc.ShareContent"]["shareMediaCategory"] = "IMAGE"
+        post_data["specificContent"]["com.linkedin.ugc.ShareContent"]["media"] = [{
+            "status": "READY",
+            "description": {
+                "text": "Image"
+            },
+            "media": image_asset_id,
+            "title": {
+                "text": "Image"
+            }
+        }]
+    
+    return post_data
 
 class LinkedInAPI:
-    def __init__(self, client_id, client_secret, redirect_uri):
+    def __init__(self, client_id, client_secret, redirect_uri, session=None,
+                 timeout=DEFAULT_TIMEOUT, upload_timeout=DEFAULT_UPLOAD_TIMEOUT, rate_limiter=None,
+                 base_url=DEFAULT_BASE_URL, auth_url=DEFAULT_AUTH_URL, token_url=DEFAULT_TOKEN_URL):
         self.client_id = client_id
         self.client_secret = client_secret
         self.redirect_uri = redirect_uri
-        self.base_url = 'https://api.linkedin.com/v2'
-        self.auth_url = 'https://www.linkedin.com/oauth/v2/authorization'
-        self.token_url = 'https://www.linkedin.com/oauth/v2/accessToken'
+        self.session = session or get_http_session()
+        self.timeout = timeout
+        self.upload_timeout = upload_timeout
+        self.rate_limiter = rate_limiter
+        self.base_url = base_url
+        self.auth_url = auth_url
+        self.token_url = token_url
+    
+    @classmethod
+    def from_config(cls, config, rate_limiter=None):
+        """Build a client from Flask config, sharing the process-wide connection pool and rate limiter"""
+        connect_timeout = config.get('LINKEDIN_HTTP_CONNECT_TIMEOUT', DEFAULT_TIMEOUT[0])
+        return cls(
+            config['LINKEDIN_CLIENT_ID'],
+            config['LINKEDIN_CLIENT_SECRET'],
+            config['LINKEDIN_REDIRECT_URI'],
+            session=get_http_session(config.get('LINKEDIN_HTTP_POOL_SIZE', DEFAULT_POOL_SIZE)),
+            timeout=(connect_timeout, config.get('LINKEDIN_HTTP_READ_TIMEOUT', DEFAULT_TIMEOUT[1])),
+            upload_timeout=(connect_timeout, config.get('LINKEDIN_HTTP_UPLOAD_TIMEOUT', DEFAULT_UPLOAD_TIMEOUT[1])),
+            rate_limiter=rate_limiter or get_rate_limiter(),
+            base_url=config.get('LINKEDIN_API_BASE_URL', DEFAULT_BASE_URL),
+            auth_url=config.get('LINKEDIN_AUTH_URL', DEFAULT_AUTH_URL),
+            token_url=config.get('LINKEDIN_TOKEN_URL', DEFAULT_TOKEN_URL)
+        )
+    
+    def _request(self, method, url, endpoint='other', timeout=None, **kwargs):
+        """Send a request through the pooled session, always with a timeout, and time it under `endpoint`"""
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            observe_api_call(endpoint, method, type(e).__name__, time.perf_counter() - started)
+            raise
+        observe_api_call(endpoint, method, response.status_code, time.perf_counter() - started)
+        return response
+    
+    def _throttle(self, member_id=None):
+        """Wait for a rate limit token before an API call (raises RateLimited if the wait is too long)"""
+        if self.rate_limiter:
+            self.rate_limiter.acquire(member_id)
+    
+    def _check_rate_limited(self, response, member_id=None):
+        """On a 429, hold the member's calls for Retry-After and raise RateLimited"""
+        if response.status_code != 429:
+            return
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if self.rate_limiter:
+            self.rate_limiter.block(member_id, retry_after)
+        raise RateLimited(member_bucket(member_id) if member_id else APP_BUCKET, retry_after, from_linkedin=True)
     
     def get_authorization_url(self, state=None):
         """Generate LinkedIn OAuth authorization URL"""
@@ -40,13 +190,41 @@ class LinkedInAPI:
         }
         
         try:
-            response = requests.post(self.token_url, data=data, headers=headers)
+            response = self._request('POST', self.token_url, 'access_token', data=data, headers=headers)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Error getting access token: {e}")
             return None
     
+    def refresh_access_token(self, refresh_token):
+        """Exchange a refresh token for a new access token.
+        
+        Returns the token response; raises LinkedInAPIError on failure (a 4xx
+        status means the refresh token is no longer usable) and RateLimited
+        when throttled.
+        """
+        data = {
+            'grant_type': 'refresh_token',
+            'refresh_token': refresh_token,
+            'client_id': self.client_id,
+            'client_secret': self.client_secret
+        }
+        
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+        
+        self._throttle()
+        try:
+            response = self._request('POST', self.token_url, 'refresh_token', data=data, headers=headers)
+            self._check_rate_limited(response)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"Error refreshing access token: {e}")
+            raise LinkedInAPIError(f"Failed to refresh access token: {e}", _status_code(e))
+    
     def get_user_profile(self, access_token):
         """Get user profile information using OpenID Connect"""
         headers = {
@@ -56,8 +234,10 @@ class LinkedInAPI:
         
         try:
             # Get user profile using OpenID Connect endpoint
-            profile_response = requests.get(
+            profile_response = self._request(
+                'GET',
                 f"{self.base_url}/userinfo",
+                'userinfo',
                 headers=headers
             )
             profile_response.raise_for_status()
@@ -77,7 +257,10 @@ class LinkedInAPI:
             return None
     
     def upload_image(self, access_token, image_path, user_id):
-        """Upload image to LinkedIn"""
+        """Upload image to LinkedIn; returns the asset URN.
+        
+        Raises LinkedInAPIError on failure and RateLimited when throttled.
+        """
         headers = {
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
@@ -85,107 +268,96 @@ class LinkedInAPI:
         
         try:
             # Step 1: Register upload
-            register_data = {
-                "registerUploadRequest": {
-                    "recipes": ["urn:li:digitalmediaRecipe:feedshare-image"],
-                    "owner": f"urn:li:person:{user_id}",
-                    "serviceRelationships": [{
-                        "relationshipType": "OWNER",
-                        "identifier": "urn:li:userGeneratedContent"
-                    }]
-                }
-            }
+            register_data = build_register_upload_request(user_id)
             
-            register_response = requests.post(
+            self._throttle(user_id)
+            register_response = self._request(
+                'POST',
                 f"{self.base_url}/assets?action=registerUpload",
+                'register_upload',
                 headers=headers,
                 data=json.dumps(register_data)
             )
+            self._check_rate_limited(register_response, user_id)
             register_response.raise_for_status()
             register_result = register_response.json()
             
             # Step 2: Upload the image
-            upload_url = register_result['value']['uploadMechanism']['com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest']['uploadUrl']
-            asset_id = register_result['value']['asset']
+            upload_url, asset_id = parse_register_upload_response(register_result)
             
             with open(image_path, 'rb') as image_file:
-                upload_response = requests.put(upload_url, data=image_file)
+                upload_response = self._request(
+                    'PUT', upload_url, 'upload', data=image_file, timeout=self.upload_timeout
+                )
+                self._check_rate_limited(upload_response, user_id)
                 upload_response.raise_for_status()
             
             return asset_id
         except requests.exceptions.RequestException as e:
             print(f"Error uploading image: {e}")
-            return None
-        except Exception as e:
-            print(f"Error processing image upload: {e}")
-            return None
+            raise LinkedInAPIError(f"Failed to upload image to LinkedIn: {e}", _status_code(e))
     
     def create_post(self, access_token, user_id, content, image_asset_id=None):
-        """Create a LinkedIn post"""
+        """Create a LinkedIn post; returns its id.
+        
+        Raises LinkedInAPIError on failure, including a success response
+        without a readable id, and RateLimited when throttled.
+        """
         headers = {
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
         }
         
         # For OpenID Connect, user_id is already the LinkedIn ID
-        post_data = {
-            "author": f"urn:li:person:{user_id}",
-            "lifecycleState": "PUBLISHED",
-            "specificContent": {
-                "com.linkedin.ugc.ShareContent": {
-                    "shareCommentary": {
-                        "text": content
-                    },
-                    "shareMediaCategory": "NONE"
-                }
-            },
-            "visibility": {
-                "com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"
-            }
-        }
-        
-        # Add image if provided
-        if image_asset_id:
-            post_data["specificContent"]["com.linkedin.ugc.ShareContent"]["shareMediaCategory"] = "IMAGE"
-            post_data["specificContent"]["com.linkedin.ugc.ShareContent"]["media"] = [{
-                "status": "READY",
-                "description": {
-                    "text": "Image"
-                },
-                "media": image_asset_id,
-                "title": {
-                    "text": "Image"
-                }
-            }]
+        post_data = build_post_payload(user_id, content, image_asset_id)
         
+        self._throttle(user_id)
         try:
-            response = requests.post(
+            response = self._request(
+                'POST',
                 f"{self.base_url}/ugcPosts",
+                'ugc_posts',
                 headers=headers,
                 data=json.dumps(post_data)
             )
+            self._check_rate_limited(response, user_id)
             response.raise_for_status()
-            result = response.json()
-            return result.get('id')
         except requests.exceptions.RequestException as e:
             print(f"Error creating post: {e}")
-            print(f"Response: {e.response.text if hasattr(e, 'response') else 'No response'}")
-            return None
+            print(f"Response: {e.response.text if e.response is not None else 'No response'}")
+            raise LinkedInAPIError(f"Failed to create post on LinkedIn: {e}", _status_code(e))
+        
+        # The post was most likely created, so a bad body keeps its status
+        # and is not retried like a network error
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return post_id_from_response(body, response.status_code)
     
-    def get_post_stats(self, access_token, post_id):
-        """Get statistics for a specific post"""
+    def get_post_stats(self, access_token, post_id, member_id=None):
+        """Get statistics for a specific post (raises RateLimited instead of failing when throttled)"""
         headers = {
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
         }
         
+        self._throttle(member_id)
         try:
-            response = requests.get(
-                f"{self.base_url}/socialActions/{post_id}",
+            response = self._request(
+                'GET',
+                f"{self.base_url}/socialActions/{quote(post_id, safe='')}",
+                'social_actions',
                 headers=headers
             )
+            self._check_rate_limited(response, member_id)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Error getting post stats: {e}")
             return None
+
+def _status_code(error):
+    """HTTP status of a failed requests call, or None if no response arrived"""
+    response = getattr(error, 'response', None)
+    return response.status_code if response is not None else None
@@ -0,0 +1,447 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import hashlib
+import math
+import os
+import resource
+import socket
+import threading
+import time
+import uuid
+from PIL import Image, ImageOps
+from PIL.JpegImagePlugin import JpegImageFile
+from sqlalchemy import event, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession
+from database import db, Post, MediaStatus, MediaFile, LinkedInAsset, touch_posts
+from metrics import MEDIA_IN_FLIGHT
+
+# Global pipeline instance
+_pipeline_instance = None
+
+def get_media_pipeline():
+    """Get the global media pipeline instance"""
+    return _pipeline_instance
+
+# Refuse images above this many pixels before decoding them (decompression bombs)
+DEFAULT_MAX_PIXELS = 40_000_000
+
+class InvalidImageError(ValueError):
+    """Raised when an upload is not a usable image or exceeds the pixel limit"""
+
+def check_image_header(path, max_pixels=DEFAULT_MAX_PIXELS):
+    """Read only the image header and enforce the pixel limit; returns (width, height)"""
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+    except Exception as e:
+        raise InvalidImageError(f"Not a valid image: {e}")
+    
+    if width * height > max_pixels:
+        raise InvalidImageError(
+            f"Image is {width}x{height} ({width * height:,} pixels); the limit is {max_pixels:,}"
+        )
+    return width, height
+
+# Session.info key for the files to delete when the transaction commits
+_REMOVE_AFTER_COMMIT = 'media_remove_after_commit'
+
+def remove_after_commit(path):
+    """Delete a file once the current transaction commits; it is kept if the transaction rolls back"""
+    db.session.info.setdefault(_REMOVE_AFTER_COMMIT, []).append(path)
+
+@event.listens_for(OrmSession, 'after_commit')
+def _remove_committed_files(session):
+    for path in session.info.pop(_REMOVE_AFTER_COMMIT, []):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            print(f"Error removing {path}: {e}")
+
+@event.listens_for(OrmSession, 'after_transaction_end')
+def _forget_uncommitted_files(session, transaction):
+    # Rolled back or closed without a commit: the rows, and so the files, are still in use
+    if transaction.parent is None:
+        session.info.pop(_REMOVE_AFTER_COMMIT, None)
+
+def target_size(size, max_size):
+    """Size an image of `size` gets when fitted inside max_size (never enlarged)"""
+    scale = min(max_size[0] / size[0], max_size[1] / size[1], 1)
+    return max(1, math.ceil(size[0] * scale)), max(1, math.ceil(size[1] * scale))
+
+def process_image(raw_path, output_path, max_size=(1200, 1200), max_pixels=DEFAULT_MAX_PIXELS):
+    """Turn a raw upload into the publish-ready rendition (runs in a worker process).
+    
+    The pixel limit is checked from the header before anything is decoded.
+    JPEGs (and MPOs, the multi-picture JPEGs many phones write) are decoded
+    in draft mode, letting libjpeg scale by 1/2, 1/4 or 1/8 while decoding,
+    so a phone photo is never held at full resolution.
+    EXIF orientation is applied and metadata other than the ICC profile is
+    dropped. Returns a report with sizes, decode time and peak memory.
+    """
+    started = time.perf_counter()
+    source_size = check_image_header(raw_path, max_pixels)
+    
+    with Image.open(raw_path) as img:
+        source_format = img.format
+        target = target_size(source_size, max_size)
+        
+        # Decode near the target size instead of at native resolution
+        # (MpoImageFile is a JpegImageFile, so MPOs qualify too)
+        is_jpeg = isinstance(img, JpegImageFile)
+        if is_jpeg:
+            img.draft('RGB', target)
+        
+        decode_started = time.perf_counter()
+        img.load()
+        decode_seconds = time.perf_counter() - decode_started
+        decoded_size = img.size
+        decoded_bytes = img.size[0] * img.size[1] * len(img.getbands())
+        
+        # Finish with a high quality resample from the reduced decode
+        img.thumbnail(max_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        
+        # Bake in the orientation, then strip EXIF, comments and other metadata
+        rendition = ImageOps.exif_transpose(img)
+        icc_profile = img.info.get('icc_profile')
+        rendition.info = {}
+        
+        save_options = {'optimize': True, 'quality': 85}
+        if icc_profile:
+            save_options['icc_profile'] = icc_profile
+        # An MPO's first picture is written out as a plain JPEG
+        rendition.save(output_path, format='JPEG' if is_jpeg else source_format, **save_options)
+    
+    return {
+        'source_format': source_format,
+        'source_size': source_size,
+        'decoded_size': decoded_size,
+        'output_size': rendition.size,
+        'decoded_bytes': decoded_bytes,
+        'decode_seconds': round(decode_seconds, 4),
+        'total_seconds': round(time.perf_counter() - started, 4),
+        # ru_maxrss is the worker process's peak resident set, in kilobytes on Linux
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+def get_cached_asset(user_id, content_hash):
+    """Return the LinkedIn asset URN a member already uploaded for this image, if still valid"""
+    asset = db.session.get(LinkedInAsset, (user_id, content_hash))
+    if asset and asset.expires_at > datetime.utcnow():
+        return asset.asset_urn
+    return None
+
+def remember_asset(user_id, content_hash, asset_urn, ttl_hours=24):
+    """Cache an uploaded asset URN so retries and reposts skip the upload (caller commits)"""
+    db.session.merge(LinkedInAsset(
+        user_id=user_id,
+        content_hash=content_hash,
+        asset_urn=asset_urn,
+        expires_at=datetime.utcnow() + timedelta(hours=ttl_hours),
+        created_at=datetime.utcnow()
+    ))
+
+class MediaPipeline:
+    """Content-addressed image store with background processing.
+    
+    Uploads are stored once per SHA-256 of their bytes (media_files) and
+    reference counted by the posts using them. New content is resized in
+    worker processes, off the request thread. A hash whose rendition is
+    still being produced has status PENDING and its raw upload under
+    UPLOAD_FOLDER/raw; anything left PENDING when a process stops is picked
+    up again by recover_pending().
+    
+    A PENDING file is leased to the process processing it (claimed_by,
+    lease_expires_at), so with several processes running each file is
+    processed by one of them; another takes it over only once the lease
+    has expired.
+    
+    With RUN_SCHEDULER false (web processes next to a worker.py process)
+    uploads are only stored; the worker finds them with recover_pending().
+    """
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self.max_workers = 2
+        self.max_pixels = DEFAULT_MAX_PIXELS
+        self.max_size = (1200, 1200)
+        self.active = True
+        self.lease_seconds = 600
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        if app:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Initialize the pipeline with the Flask app"""
+        global _pipeline_instance
+        
+        self.app = app
+        self.max_workers = app.config.get('MEDIA_WORKERS', 2)
+        self.max_pixels = app.config.get('MEDIA_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+        self.max_size = app.config.get('MEDIA_MAX_DIMENSIONS', (1200, 1200))
+        self.active = app.config.get('RUN_SCHEDULER', True)
+        self.lease_seconds = app.config.get('MEDIA_LEASE_SECONDS', 600)
+        self.upload_folder = app.config['UPLOAD_FOLDER']
+        self.raw_folder = os.path.join(self.upload_folder, 'raw')
+        os.makedirs(self.raw_folder, exist_ok=True)
+        
+        _pipeline_instance = self
+    
+    def _get_executor(self):
+        # Worker processes are started on first use, after gunicorn has forked
+        with self._lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self.executor
+    
+    def raw_path(self, filename):
+        return os.path.join(self.raw_folder, filename)
+    
+    def output_path(self, filename):
+        return os.path.join(self.upload_folder, filename)
+    
+    def store_upload(self, file, ext):
+        """Save an uploaded file by content hash and take a reference to it.
+        
+        Returns (media_file, created). Content that is already stored is not
+        written again; for new content the caller commits and then passes it
+        to enqueue(). Content whose earlier processing failed is processed
+        again from this upload and counts as new.
+        """
+        # Stream to a temporary raw file while hashing
+        temp_path = self.raw_path(f"upload_{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        size = 0
+        with open(temp_path, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(64 * 1024), b''):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        content_hash = digest.hexdigest()
+        
+        # Reject bombs and non-images from the header alone, before any decoding
+        try:
+            check_image_header(temp_path, self.max_pixels)
+        except InvalidImageError:
+            os.remove(temp_path)
+            raise
+        
+        media = self._add_reference(content_hash)
+        if media and media.status == MediaStatus.FAILED and self._retry_failed(media, temp_path):
+            return media, True
+        if media:
+            os.remove(temp_path)
+            return media, False
+        
+        # First copy of this content
+        filename = f"{content_hash}{ext.lower()}"
+        os.replace(temp_path, self.raw_path(filename))
+        media = MediaFile(
+            content_hash=content_hash,
+            filename=filename,
+            status=MediaStatus.PENDING,
+            ref_count=1,
+            size_bytes=size,
+            **self._new_lease()
+        )
+        try:
+            db.session.add(media)
+            db.session.flush()
+        except IntegrityError:
+            # Another request stored the same content first
+            db.session.rollback()
+            os.remove(self.raw_path(filename))
+            return self._add_reference(content_hash), False
+        return media, True
+    
+    def _new_lease(self):
+        """Lease columns for media this process will process; left unclaimed for the worker otherwise"""
+        if not self.active:
+            return {'claimed_by': None, 'lease_expires_at': None}
+        return {
+            'claimed_by': self.worker_id,
+            'lease_expires_at': datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+        }
+    
+    def _retry_failed(self, media, temp_path):
+        """Put FAILED media back to PENDING with a fresh raw file; False if another upload already did"""
+        result = db.session.execute(
+            update(MediaFile)
+            .where(MediaFile.content_hash == media.content_hash, MediaFile.status == MediaStatus.FAILED)
+            .values(status=MediaStatus.PENDING, **self._new_lease())
+        )
+        if result.rowcount == 0:
+            return False
+        # The raw file was removed when processing failed
+        os.replace(temp_path, self.raw_path(media.filename))
+        db.session.refresh(media)
+        return True
+    
+    def _add_reference(self, content_hash):
+        result = db.session.execute(
+            update(MediaFile)
+            .where(MediaFile.content_hash == content_hash)
+            .values(ref_count=MediaFile.ref_count + 1)
+        )
+        if result.rowcount == 0:
+            return None
+        media = db.session.get(MediaFile, content_hash)
+        db.session.refresh(media)
+        return media
+    
+    def release(self, content_hash, count=1):
+        """Drop `count` references; the files are deleted once nothing uses them and the caller commits"""
+        db.session.execute(
+            update(MediaFile)
+            .where(MediaFile.content_hash == content_hash)
+            .values(ref_count=MediaFile.ref_count - count)
+        )
+        media = db.session.get(MediaFile, content_hash)
+        if media is None:
+            return
+        db.session.refresh(media)
+        if media.ref_count > 0:
+            return
+        
+        filename = media.filename
+        db.session.execute(
+            delete(MediaFile)
+            .where(MediaFile.content_hash == content_hash, MediaFile.ref_count <= 0)
+        )
+        db.session.execute(delete(LinkedInAsset).where(LinkedInAsset.content_hash == content_hash))
+        db.session.expunge(media)
+        remove_after_commit(self.output_path(filename))
+        remove_after_commit(self.raw_path(filename))
+    
+    def enqueue(self, content_hash, filename):
+        """Queue the raw upload of a media file for processing"""
+        if not self.active:
+            # Left PENDING for the worker process
+            return True
+        with self._lock:
+            if content_hash in self._in_flight:
+                return True
+            self._in_flight.add(content_hash)
+        MEDIA_IN_FLIGHT.inc()
+        
+        try:
+            future = self._get_executor().submit(
+                process_image, self.raw_path(filename), self.output_path(filename),
+                self.max_size, self.max_pixels
+            )
+            future.add_done_callback(lambda f: self._finish(content_hash, filename, f))
+            return True
+        except Exception as e:
+            print(f"Error queueing media {content_hash[:12]}: {e}")
+            with self._lock:
+                self._in_flight.discard(content_hash)
+            MEDIA_IN_FLIGHT.dec()
+            return False
+    
+    def _finish(self, content_hash, filename, future):
+        """Record the outcome of a processing job on the media file and its posts"""
+        error = future.exception()
+        
+        with self.app.app_context():
+            try:
+                media = db.session.get(MediaFile, content_hash)
+                if not media:
+                    # Every post using it was deleted while processing
+                    output_path = self.output_path(filename)
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+                    return
+                
+                if error:
+                    print(f"Error processing image {content_hash[:12]}: {error}")
+                self.set_status(content_hash, MediaStatus.FAILED if error else MediaStatus.READY)
+                db.session.commit()
+                if not error:
+                    report = future.result()
+                    print(
+                        f"Image {content_hash[:12]} ready: {report['source_size']} decoded at "
+                        f"{report['decoded_size']} in {report['decode_seconds']}s, "
+                        f"output {report['output_size']}, worker peak RSS {report['peak_rss_kb'] // 1024} MB"
+                    )
+            except Exception as e:
+                print(f"Error updating media status for {content_hash[:12]}: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+                # The raw upload is no longer needed either way; it is removed only
+                # after the status change so other processes never see PENDING
+                # media without its raw file
+                raw_path = self.raw_path(filename)
+                if os.path.exists(raw_path):
+                    os.remove(raw_path)
+                with self._lock:
+                    self._in_flight.discard(content_hash)
+                MEDIA_IN_FLIGHT.dec()
+    
+    def set_status(self, content_hash, status):
+        """Set the status of a media file and of every post waiting on it (caller commits)"""
+        db.session.execute(
+            update(MediaFile)
+            .where(MediaFile.content_hash == content_hash)
+            .values(status=status, claimed_by=None, lease_expires_at=None)
+        )
+        values = {'media_status': status}
+        if status == MediaStatus.FAILED:
+            values['error_message'] = 'Failed to process image'
+        user_ids = db.session.execute(
+            update(Post)
+            .where(Post.media_hash == content_hash, Post.media_status == MediaStatus.PENDING)
+            .values(**values)
+            .returning(Post.user_id)
+        ).scalars().all()
+        touch_posts(user_ids)
+    
+    def recover_pending(self):
+        """Claim and queue media that is PENDING and not leased to a process.
+        
+        Picks up work left by a process that stopped mid-job and, in a
+        worker, uploads stored by the web processes. Returns how many were
+        queued.
+        """
+        if not self.active:
+            return 0
+        
+        with self.app.app_context():
+            claim_token = self.claim_pending()
+            pending = MediaFile.query.filter_by(claimed_by=claim_token).all()
+            for media in pending:
+                if os.path.exists(self.raw_path(media.filename)):
+                    self.enqueue(media.content_hash, media.filename)
+                else:
+                    self.set_status(media.content_hash, MediaStatus.FAILED)
+            db.session.commit()
+            return len(pending)
+    
+    def claim_pending(self, now=None):
+        """Lease every unleased PENDING media file to this process; returns the claim token"""
+        now = now or datetime.utcnow()
+        claim_token = f"{self.worker_id}:{uuid.uuid4().hex[:8]}"
+        with self._lock:
+            in_flight = list(self._in_flight)
+        
+        # One conditional UPDATE, so two processes never claim the same file
+        db.session.execute(
+            update(MediaFile)
+            .where(
+                MediaFile.status == MediaStatus.PENDING,
+                db.or_(MediaFile.lease_expires_at.is_(None), MediaFile.lease_expires_at < now),
+                MediaFile.content_hash.not_in(in_flight)
+            )
+            .values(claimed_by=claim_token, lease_expires_at=now + timedelta(seconds=self.lease_seconds)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        return claim_token
+    
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,184 @@
+"""
+Prometheus metrics.
+
+Metrics are plain prometheus_client objects defined here and updated by
+the modules that own the work. When PROMETHEUS_MULTIPROC_DIR is set (the
+gunicorn config sets it) every process writes its values to files in that
+directory and /metrics aggregates them, so one scrape covers all web
+workers. worker.py serves its own metrics on WORKER_METRICS_PORT.
+"""
+
+from datetime import datetime
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+    start_http_server
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Engine
+
+API_LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+# LinkedIn API
+LINKEDIN_API_LATENCY = Histogram(
+    'linkedin_api_request_seconds', 'LinkedIn API call latency',
+    ['endpoint', 'method', 'status'], buckets=API_LATENCY_BUCKETS
+)
+
+# Publishing
+PUBLISH_LAG = Histogram(
+    'publish_lag_seconds', 'Time from scheduled_time to the post being published', buckets=LAG_BUCKETS
+)
+PUBLISH_RESULTS = Counter(
+    'publish_results_total', 'Publish attempts by outcome and failure class',
+    ['outcome', 'failure_class']
+)
+
+# Engagement sync
+ENGAGEMENT_SYNCS = Counter(
+    'engagement_sync_total', 'Engagement polls by outcome', ['outcome']
+)
+
+# Web
+HTTP_LATENCY = Histogram(
+    'http_request_seconds', 'Flask request latency', ['route', 'method', 'status']
+)
+USER_CACHE_LOOKUPS = Counter(
+    'user_cache_lookups_total', 'Session user lookups by cache result', ['result']
+)
+FRAGMENT_CACHE_LOOKUPS = Counter(
+    'fragment_cache_lookups_total', 'Rendered template fragment lookups by cache result', ['result']
+)
+
+# Thread pools and in-flight work
+SCHEDULER_THREADS = Gauge(
+    'scheduler_threads', 'Size of the APScheduler thread pool', multiprocess_mode='livesum'
+)
+SCHEDULER_JOBS_RUNNING = Gauge(
+    'scheduler_jobs_running', 'APScheduler jobs currently running', multiprocess_mode='livesum'
+)
+DISPATCH_WORKERS = Gauge(
+    'dispatch_workers', 'Size of the dispatcher publish pool', multiprocess_mode='livesum'
+)
+DISPATCH_IN_FLIGHT = Gauge(
+    'dispatch_in_flight', 'Posts claimed by the dispatcher and being published', multiprocess_mode='livesum'
+)
+MEDIA_IN_FLIGHT = Gauge(
+    'media_jobs_in_flight', 'Images being processed by the media pipeline', multiprocess_mode='livesum'
+)
+
+# Database
+DB_QUERIES = Counter('db_queries_total', 'SQL statements executed', ['statement'])
+DB_QUERY_LATENCY = Histogram(
+    'db_query_seconds', 'SQL statement latency', ['statement'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+
+def observe_api_call(endpoint, method, status, seconds):
+    """Record one LinkedIn API call; status is the HTTP status or an error name"""
+    LINKEDIN_API_LATENCY.labels(endpoint, method, str(status)).observe(seconds)
+
+def record_published(post):
+    """Count a successful publish and its lag behind the schedule"""
+    PUBLISH_RESULTS.labels('published', 'none').inc()
+    if post.scheduled_time:
+        lag = (datetime.utcnow() - post.scheduled_time).total_seconds()
+        PUBLISH_LAG.observe(max(0, lag))
+
+def record_publish_failure(failure_class, retrying):
+    """Count a failed publish attempt, by whether it will be retried"""
+    PUBLISH_RESULTS.labels('retry_scheduled' if retrying else 'failed', failure_class).inc()
+
+# SQL statement counts and timings, for every engine in the process
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['metrics_query_start'].pop()
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else 'other'
+    if verb not in ('select', 'insert', 'update', 'delete'):
+        verb = 'other'
+    DB_QUERIES.labels(verb).inc()
+    DB_QUERY_LATENCY.labels(verb).observe(time.perf_counter() - started)
+
+class QueueCollector:
+    """Scrape-time gauges read from the database: the due backlog and the app rate limit bucket"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    def collect(self):
+        from database import db, Post, build_due_posts_query
+        from rate_limiter import get_rate_limiter, APP_BUCKET
+        
+        with self.app.app_context():
+            now = datetime.utcnow()
+            due = build_due_posts_query(now).order_by(None).subquery()
+            count, oldest = db.session.execute(
+                select(func.count(), func.min(Post.scheduled_time)).join(due, Post.id == due.c.id)
+            ).one()
+            db.session.remove()
+            
+            backlog = GaugeMetricFamily('publish_due_posts', 'Scheduled posts that are due and not yet claimed')
+            backlog.add_metric([], count)
+            yield backlog
+            
+            oldest_age = GaugeMetricFamily('publish_oldest_due_seconds', 'Age of the oldest due, unclaimed post')
+            oldest_age.add_metric([], (now - oldest).total_seconds() if oldest else 0)
+            yield oldest_age
+            
+            limiter = get_rate_limiter()
+            if limiter:
+                tokens = GaugeMetricFamily(
+                    'linkedin_rate_limit_fill_ratio', 'Fill level of the app-wide LinkedIn rate limit bucket'
+                )
+                for level in limiter.levels([APP_BUCKET]):
+                    tokens.add_metric([], level['fill_ratio'])
+                yield tokens
+
+def init_app(app):
+    """Time every Flask request by route"""
+    
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_request_start = time.perf_counter()
+    
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('metrics_request_start', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_LATENCY.labels(route, request.method, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+        return response
+
+def metrics_response(app):
+    """Render every metric in the Prometheus text format, aggregated across processes when configured"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    
+    # Database-derived gauges are read once per scrape, whichever process serves it
+    queue_registry = CollectorRegistry()
+    queue_registry.register(QueueCollector(app))
+    
+    output = generate_latest(registry) + generate_latest(queue_registry)
+    return Response(output, content_type=CONTENT_TYPE_LATEST)
+
+def start_worker_server(port):
+    """Serve this process's metrics over HTTP (for worker.py, which has no Flask server)"""
+    registry = REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
@@ -0,0 +1,171 @@
+"""
+LinkedIn Scheduler - Schema Migrations
+
+db.create_all() only creates tables that are missing; it never changes a
+table that already exists. Changes to existing tables (new indexes, new
+columns, backfills) are listed here as numbered migrations. Each one runs
+once per database, inside a transaction, and is recorded in the
+schema_migrations table.
+
+init_db() runs pending migrations on startup. They can also be run by hand:
+
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # list applied and pending migrations
+"""
+
+import sys
+from datetime import datetime
+from sqlalchemy import inspect, select, insert, text
+from sqlalchemy.exc import IntegrityError
+from database import db, User, UserDailyStats, UserHourlyStats, _rebuild_counter_row, _rebuild_rollup_rows
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SchemaMigration {self.version}>'
+
+# Registered migrations: (version, description, upgrade function)
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register an upgrade function as a numbered migration"""
+    def decorator(upgrade):
+        MIGRATIONS.append((version, description, upgrade))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return upgrade
+    return decorator
+
+# Helpers that are safe to run against tables create_all() just built
+
+def create_index(connection, name, table, columns):
+    """Create an index unless it already exists (SQLite and PostgreSQL)"""
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+def add_column(connection, table, column, ddl):
+    """Add a column unless it already exists"""
+    existing = {c['name'] for c in inspect(connection).get_columns(table)}
+    if column not in existing:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+# Migrations
+
+@migration(1, 'Composite indexes for the posts hot queries')
+def add_post_indexes(connection):
+    create_index(connection, 'ix_posts_user_status_scheduled', 'posts', ['user_id', 'status', 'scheduled_time'])
+    create_index(connection, 'ix_posts_user_created', 'posts', ['user_id', 'created_at'])
+    create_index(connection, 'ix_posts_status_scheduled', 'posts', ['status', 'scheduled_time'])
+
+@migration(2, 'Backfill user_post_counters from the posts table')
+def backfill_post_counters(connection):
+    for user_id in connection.execute(select(User.id)).scalars().all():
+        _rebuild_counter_row(connection, user_id)
+
+@migration(3, 'Add posts.media_status for the background media pipeline')
+def add_post_media_status(connection):
+    add_column(connection, 'posts', 'media_status', 'VARCHAR(20)')
+
+@migration(4, 'Add posts.media_hash for the content-addressed media store')
+def add_post_media_hash(connection):
+    add_column(connection, 'posts', 'media_hash', 'VARCHAR(64)')
+    create_index(connection, 'ix_posts_media_hash', 'posts', ['media_hash'])
+
+@migration(5, 'Add posts.claimed_by and posts.lease_expires_at for the dispatcher')
+def add_post_dispatch_lease(connection):
+    add_column(connection, 'posts', 'claimed_by', 'VARCHAR(64)')
+    add_column(connection, 'posts', 'lease_expires_at', 'TIMESTAMP')
+
+@migration(6, 'Add posts.failure_class and posts.rate_limit_count for the retry policy')
+def add_post_retry_columns(connection):
+    add_column(connection, 'posts', 'failure_class', 'VARCHAR(20)')
+    add_column(connection, 'posts', 'rate_limit_count', 'INTEGER DEFAULT 0')
+
+@migration(7, 'Add users token maintenance columns and ix_users_token_expires_at')
+def add_user_token_maintenance(connection):
+    add_column(connection, 'users', 'token_refresh_attempted_at', 'TIMESTAMP')
+    add_column(connection, 'users', 'token_refresh_error', 'TEXT')
+    create_index(connection, 'ix_users_token_expires_at', 'users', ['token_expires_at'])
+
+@migration(8, 'Add posts engagement columns and ix_posts_status_engagement_next')
+def add_post_engagement(connection):
+    add_column(connection, 'posts', 'like_count', 'INTEGER')
+    add_column(connection, 'posts', 'comment_count', 'INTEGER')
+    add_column(connection, 'posts', 'engagement_synced_at', 'TIMESTAMP')
+    add_column(connection, 'posts', 'engagement_next_sync_at', 'TIMESTAMP')
+    create_index(connection, 'ix_posts_status_engagement_next', 'posts', ['status', 'engagement_next_sync_at'])
+
+@migration(9, 'Create and backfill user_daily_stats and user_hourly_stats')
+def backfill_user_rollups(connection):
+    UserDailyStats.__table__.create(connection, checkfirst=True)
+    UserHourlyStats.__table__.create(connection, checkfirst=True)
+    for user_id in connection.execute(select(User.id)).scalars().all():
+        _rebuild_rollup_rows(connection, user_id)
+
+@migration(10, 'Add user_post_counters.version for conditional GETs')
+def add_post_counter_version(connection):
+    add_column(connection, 'user_post_counters', 'version', 'INTEGER DEFAULT 0 NOT NULL')
+
+@migration(11, 'Add media_files.claimed_by and media_files.lease_expires_at')
+def add_media_lease(connection):
+    add_column(connection, 'media_files', 'claimed_by', 'VARCHAR(64)')
+    add_column(connection, 'media_files', 'lease_expires_at', 'TIMESTAMP')
+
+def get_applied_versions(engine):
+    """Return the set of migration versions already applied"""
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return set(connection.execute(select(SchemaMigration.version)).scalars())
+
+def run_migrations(engine):
+    """Apply every pending migration in version order"""
+    try:
+        applied = get_applied_versions(engine)
+    except Exception as e:
+        print(f"Could not read schema_migrations: {e}")
+        return
+    
+    for version, description, upgrade in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as connection:
+                upgrade(connection)
+                connection.execute(insert(SchemaMigration.__table__).values(
+                    version=version,
+                    description=description,
+                    applied_at=datetime.utcnow()
+                ))
+            print(f"Applied migration {version}: {description}")
+        except IntegrityError:
+            # Another process recorded this version first
+            print(f"Migration {version} already applied by another process")
+        except Exception as e:
+            print(f"Migration {version} failed: {e}")
+            print("Stopping - later migrations may depend on it")
+            return
+
+def main():
+    from flask import Flask
+    from config import load_config
+    
+    app = Flask(__name__)
+    app.config.from_object(load_config())
+    db.init_app(app)
+    
+    with app.app_context():
+        if '--status' in sys.argv:
+            applied = get_applied_versions(db.engine)
+            for version, description, _ in MIGRATIONS:
+                state = 'applied' if version in applied else 'pending'
+                print(f"{version:4d}  {state:8s}  {description}")
+            return
+        
+        db.create_all()
+        run_migrations(db.engine)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import time
+from sqlalchemy import case, insert, select, update, literal
+from sqlalchemy.exc import IntegrityError
+from database import db, RateLimitBucket
+
+# Global rate limiter instance
+_limiter_instance = None
+
+def get_rate_limiter():
+    """Get the global rate limiter instance"""
+    return _limiter_instance
+
+# Bucket used for every call made with this app's credentials
+APP_BUCKET = 'app'
+
+# Budget for engagement sync calls, taken on top of the member and app buckets
+ENGAGEMENT_BUCKET = 'engagement'
+
+# Wait this long after a 429 that carries no Retry-After header
+DEFAULT_RETRY_AFTER = 60
+
+class RateLimited(Exception):
+    """Raised when a LinkedIn call has to wait longer than the caller allows.
+    
+    from_linkedin is True when LinkedIn answered 429, and False when the
+    local limiter held the call back before any request was made.
+    """
+    
+    def __init__(self, key, retry_after, from_linkedin=False):
+        self.key = key
+        self.retry_after = retry_after
+        self.from_linkedin = from_linkedin
+        super().__init__(f"Rate limited on '{key}', retry in {retry_after:.0f}s")
+
+def member_bucket(member_id):
+    """Bucket key for calls made on behalf of one LinkedIn member"""
+    return f"member:{member_id}"
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER):
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date)"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+class RateLimiter:
+    """Token buckets for LinkedIn API calls, shared by every thread and process.
+    
+    Buckets live in the rate_limit_buckets table. A call takes one token from
+    its member's bucket and one from the app-wide bucket; each bucket refills
+    continuously up to its capacity. Taking a token is a single conditional
+    UPDATE that computes the refill in SQL, so concurrent callers never
+    overdraw a bucket. A 429 from LinkedIn empties the bucket and blocks it
+    until Retry-After has passed.
+    """
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.engine = None
+        self.enabled = True
+        self.max_wait = 5
+        self.limits = {}
+        if app:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Initialize the limiter with the Flask app"""
+        global _limiter_instance
+        
+        self.app = app
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+        self.max_wait = app.config.get('RATE_LIMIT_MAX_WAIT_SECONDS', 5)
+        
+        # (capacity, tokens per second) for each kind of bucket
+        self.limits = {
+            'member': (
+                app.config.get('RATE_LIMIT_MEMBER_BURST', 10),
+                app.config.get('RATE_LIMIT_MEMBER_PER_HOUR', 100) / 3600
+            ),
+            APP_BUCKET: (
+                app.config.get('RATE_LIMIT_APP_BURST', 100),
+                app.config.get('RATE_LIMIT_APP_PER_HOUR', 10000) / 3600
+            ),
+            ENGAGEMENT_BUCKET: (
+                app.config.get('ENGAGEMENT_SYNC_BURST', 20),
+                app.config.get('ENGAGEMENT_SYNC_PER_HOUR', 600) / 3600
+            ),
+        }
+        
+        # Own connections, so acquiring a token never joins the caller's transaction
+        with app.app_context():
+            self.engine = db.engine
+        
+        _limiter_instance = self
+    
+    def _limits_for(self, key):
+        return self.limits[key if key in (APP_BUCKET, ENGAGEMENT_BUCKET) else 'member']
+    
+    def try_acquire(self, key, now=None):
+        """Take a token from one bucket; returns 0 on success, else the seconds to wait"""
+        now = now or time.time()
+        capacity, rate = self._limits_for(key)
+        bucket = RateLimitBucket.__table__.c
+        
+        refilled = bucket.tokens + (literal(now) - bucket.updated_at) * rate
+        level = case((refilled > capacity, literal(capacity)), else_=refilled)
+        
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(RateLimitBucket.__table__)
+                .where(bucket.key == key, level >= 1, bucket.blocked_until <= now)
+                .values(tokens=level - 1, updated_at=now, capacity=capacity, refill_per_second=rate)
+            )
+            if result.rowcount:
+                return 0
+            
+            row = conn.execute(
+                select(level.label('level'), bucket.blocked_until).where(bucket.key == key)
+            ).first()
+        
+        if row is None:
+            # First call for this bucket: start full, minus this token
+            if self._create_bucket(key, tokens=capacity - 1, updated_at=now, blocked_until=0):
+                return 0
+            # Another caller created it first; ask again
+            return 0.01
+        
+        wait = (1 - row.level) / rate if row.level < 1 else 0
+        return max(wait, row.blocked_until - now, 0.01)
+    
+    def _create_bucket(self, key, **values):
+        capacity, rate = self._limits_for(key)
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(RateLimitBucket.__table__).values(
+                    key=key, capacity=capacity, refill_per_second=rate, **values
+                ))
+            return True
+        except IntegrityError:
+            return False
+    
+    def refund(self, key):
+        """Put back a token taken for a call that was never made"""
+        capacity, _ = self._limits_for(key)
+        bucket = RateLimitBucket.__table__.c
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(RateLimitBucket.__table__)
+                .where(bucket.key == key)
+                .values(tokens=case((bucket.tokens + 1 > capacity, capacity), else_=bucket.tokens + 1))
+            )
+    
+    def reserve(self, member_id=None):
+        """Take a token from the member and app buckets.
+        
+        Returns (0, None) when the call may go ahead, else (seconds to wait, bucket key).
+        """
+        if not self.enabled:
+            return 0, None
+        
+        keys = [member_bucket(member_id)] if member_id else []
+        keys.append(APP_BUCKET)
+        taken = []
+        for key in keys:
+            wait = self.try_acquire(key)
+            if wait:
+                for taken_key in taken:
+                    self.refund(taken_key)
+                return wait, key
+            taken.append(key)
+        return 0, None
+    
+    def acquire(self, member_id=None, max_wait=None):
+        """Block until a call may be made, or raise RateLimited if that is more than max_wait away"""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait, key = self.reserve(member_id)
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimited(key, wait)
+            time.sleep(wait)
+    
+    def block(self, member_id=None, retry_after=DEFAULT_RETRY_AFTER):
+        """Record a 429: empty the member's bucket (or the app's) until retry_after has passed"""
+        if not self.enabled:
+            return
+        key = member_bucket(member_id) if member_id else APP_BUCKET
+        now = time.time()
+        blocked_until = now + retry_after
+        bucket = RateLimitBucket.__table__.c
+        
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(RateLimitBucket.__table__)
+                .where(bucket.key == key)
+                .values(
+                    tokens=0,
+                    updated_at=blocked_until,
+                    blocked_until=case((bucket.blocked_until > blocked_until, bucket.blocked_until),
+                                       else_=blocked_until)
+                )
+            )
+        if not result.rowcount:
+            self._create_bucket(key, tokens=0, updated_at=blocked_until, blocked_until=blocked_until)
+        print(f"LinkedIn rate limit hit on '{key}': holding calls for {retry_after:.0f}s")
+    
+    def levels(self, keys=None):
+        """Current fill of each bucket (or only `keys`), refilled to now"""
+        now = time.time()
+        query = select(RateLimitBucket.__table__)
+        if keys is not None:
+            query = query.where(RateLimitBucket.key.in_(keys))
+        
+        with self.engine.connect() as conn:
+            rows = conn.execute(query.order_by(RateLimitBucket.key)).all()
+        
+        levels = []
+        for row in rows:
+            elapsed = max(0, now - row.updated_at)
+            tokens = min(row.capacity, row.tokens + elapsed * row.refill_per_second)
+            levels.append({
+                'key': row.key,
+                'tokens': round(tokens, 2),
+                'capacity': row.capacity,
+                'fill_ratio': round(tokens / row.capacity, 3) if row.capacity else 0,
+                'refill_per_hour': round(row.refill_per_second * 3600, 1),
+                'blocked_for_seconds': round(max(0, row.blocked_until - now), 1)
+            })
+        return levels
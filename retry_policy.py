@@ -0,0 +1,123 @@
+from collections import Counter
+import enum
+import random
+import threading
+from rate_limiter import RateLimited
+
+class FailureClass(enum.Enum):
+    TRANSIENT = "transient"
+    RATE_LIMIT = "rate_limit"
+    PERMANENT = "permanent"
+
+# HTTP statuses worth retrying; any other 4xx means the request itself is wrong
+TRANSIENT_STATUS_CODES = {408, 425, 500, 502, 503, 504}
+
+def classify_failure(error):
+    """Sort a publish error into transient, rate-limit or permanent.
+    
+    Errors carrying an HTTP status (LinkedInAPIError) are classified by it;
+    errors with no response (timeouts, dropped connections) and anything
+    unrecognised are treated as transient so the attempt caps bound them.
+    """
+    if isinstance(error, RateLimited):
+        return FailureClass.RATE_LIMIT
+    
+    status_code = getattr(error, 'status_code', None)
+    if status_code == 429:
+        return FailureClass.RATE_LIMIT
+    if status_code is not None:
+        if status_code in TRANSIENT_STATUS_CODES or status_code >= 500:
+            return FailureClass.TRANSIENT
+        return FailureClass.PERMANENT
+    
+    if isinstance(error, (FileNotFoundError, PermissionError)):
+        return FailureClass.PERMANENT
+    return FailureClass.TRANSIENT
+
+class RetryMetrics:
+    """Per-process counters of publish failures and what the policy did with them"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.failures = Counter()
+        self.retries = Counter()
+        self.gave_up = Counter()
+        self.delay_seconds = Counter()
+    
+    def record(self, failure_class, delay):
+        with self._lock:
+            self.failures[failure_class.value] += 1
+            if delay is None:
+                self.gave_up[failure_class.value] += 1
+            else:
+                self.retries[failure_class.value] += 1
+                self.delay_seconds[failure_class.value] += delay
+    
+    def snapshot(self):
+        with self._lock:
+            return {
+                failure_class.value: {
+                    'failures': self.failures[failure_class.value],
+                    'retries': self.retries[failure_class.value],
+                    'gave_up': self.gave_up[failure_class.value],
+                    'delay_seconds_total': round(self.delay_seconds[failure_class.value], 1)
+                }
+                for failure_class in FailureClass
+            }
+
+# Global metrics for this process
+retry_metrics = RetryMetrics()
+
+class RetryPolicy:
+    """Decides whether and when a failed publish is tried again.
+    
+    Each failure class has its own cap on attempts. Transient failures back
+    off exponentially (base_delay * multiplier ** (attempt - 1), capped at
+    max_delay) with "equal jitter": half the backoff is fixed and half is
+    random, so posts failed by the same outage come back spread out rather
+    than in the same minute. Rate-limited posts wait for Retry-After plus a
+    little jitter. Permanent failures are not retried by default.
+    """
+    
+    def __init__(self, base_delay=120, max_delay=3600, multiplier=2, max_attempts=None,
+                 rate_limit_jitter=0.1, rng=None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.max_attempts = {
+            FailureClass.TRANSIENT: 3,
+            FailureClass.RATE_LIMIT: 10,
+            FailureClass.PERMANENT: 1,
+        }
+        self.max_attempts.update(max_attempts or {})
+        self.rate_limit_jitter = rate_limit_jitter
+        self.rng = rng or random.Random()
+    
+    @classmethod
+    def from_config(cls, config):
+        """Build a policy from Flask config"""
+        return cls(
+            base_delay=config.get('RETRY_BASE_DELAY_SECONDS', 120),
+            max_delay=config.get('RETRY_MAX_DELAY_SECONDS', 3600),
+            multiplier=config.get('RETRY_BACKOFF_MULTIPLIER', 2),
+            max_attempts={
+                FailureClass.TRANSIENT: config.get('RETRY_MAX_ATTEMPTS_TRANSIENT', 3),
+                FailureClass.RATE_LIMIT: config.get('RETRY_MAX_ATTEMPTS_RATE_LIMIT', 10),
+                FailureClass.PERMANENT: config.get('RETRY_MAX_ATTEMPTS_PERMANENT', 1),
+            }
+        )
+    
+    def classify(self, error):
+        return classify_failure(error)
+    
+    def next_delay(self, failure_class, attempt, retry_after=None):
+        """Seconds until attempt + 1, or None once `attempt` attempts of this class are used up"""
+        if attempt >= self.max_attempts[failure_class]:
+            return None
+        
+        if failure_class == FailureClass.RATE_LIMIT:
+            wait = retry_after if retry_after is not None else self.base_delay
+            return wait * (1 + self.rng.uniform(0, self.rate_limit_jitter))
+        
+        backoff = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return backoff / 2 + self.rng.uniform(0, backoff / 2)
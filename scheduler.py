@@ -1,11 +1,29 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.executors.pool import ThreadPoolExecutor
-from datetime import datetime
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
+from concurrent.futures import ThreadPoolExecutor as WorkerPool
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+import asyncio
 import atexit
 import os
-from database import db, Post, PostStatus, User
-from linkedin_api import LinkedInAPI
+import socket
+import threading
+import uuid
+from database import db, Post, PostStatus, MediaStatus, User, build_due_posts_query
+from linkedin_api import LinkedInAPI, LinkedInAPIError
+from rate_limiter import RateLimited
+from async_linkedin_api import publish_batch
+from media import get_cached_asset, remember_asset
+from metrics import (
+    SCHEDULER_THREADS, SCHEDULER_JOBS_RUNNING, DISPATCH_WORKERS, DISPATCH_IN_FLIGHT,
+    record_published, record_publish_failure
+)
+from retry_policy import RetryPolicy, FailureClass, retry_metrics
+from token_maintenance import refresh_user_token, refresh_expiring_tokens
+from engagement_sync import sync_engagement
 from config import Config
 
 # Global scheduler instance
@@ -19,14 +37,72 @@ def publish_post_job(post_id):
     """Standalone function to publish a post (for APScheduler)"""
     scheduler = get_scheduler()
     if scheduler:
-        scheduler.publish_post(post_id)
+        with scheduler.app.app_context():
+            scheduler.publish_post(post_id)
     else:
         print(f"Cannot publish post {post_id}: scheduler not initialized")
 
+def publish_posts_job(post_ids):
+    """Standalone function to publish a batch of posts concurrently (for APScheduler)"""
+    scheduler = get_scheduler()
+    if scheduler:
+        with scheduler.app.app_context():
+            scheduler.publish_posts_async(post_ids)
+    else:
+        print(f"Cannot publish posts {post_ids}: scheduler not initialized")
+
+def dispatch_due_posts_job():
+    """Standalone function for the dispatcher's polling job (for APScheduler)"""
+    scheduler = get_scheduler()
+    if scheduler:
+        with scheduler.app.app_context():
+            scheduler.dispatch_due_posts()
+
+def refresh_tokens_job():
+    """Standalone function for the token maintenance job (for APScheduler)"""
+    scheduler = get_scheduler()
+    if scheduler:
+        with scheduler.app.app_context():
+            scheduler.refresh_tokens()
+
+def sync_engagement_job():
+    """Standalone function for the engagement sync job (for APScheduler)"""
+    scheduler = get_scheduler()
+    if scheduler:
+        with scheduler.app.app_context():
+            scheduler.sync_engagement()
+
+def poll_job_store_job():
+    """Wake the scheduler so it sees jobs other processes added to the shared job store"""
+
 class PostScheduler:
+    """Publishes posts when they fall due.
+    
+    SCHEDULER_MODE 'jobs' (the default) keeps one APScheduler date job per
+    post. SCHEDULER_MODE 'dispatcher' uses the posts table as the queue:
+    every process polls for due posts and leases batches of them
+    atomically (FOR UPDATE SKIP LOCKED on PostgreSQL, a conditional UPDATE
+    of the lease columns on SQLite), so any number of processes can share
+    the publish load and each post is handed to exactly one of them. A
+    lease that outlives its worker expires after DISPATCH_LEASE_SECONDS and
+    the post is claimed again.
+    
+    With RUN_SCHEDULER false (web processes next to a worker.py process)
+    the scheduler is started paused: jobs can still be added to the shared
+    job store, but nothing runs in this process.
+    """
+    
     def __init__(self, app=None):
+        self.app = None
         self.scheduler = None
         self.linkedin_api = None
+        self.retry_policy = RetryPolicy()
+        self.mode = 'jobs'
+        self.active = True
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.dispatch_pool = None
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
         if app:
             self.init_app(app)
     
@@ -34,20 +110,33 @@ class PostScheduler:
         """Initialize the scheduler with the Flask app"""
         global _scheduler_instance
         
+        self.app = app
+        self.mode = app.config.get('SCHEDULER_MODE', 'jobs')
+        self.active = app.config.get('RUN_SCHEDULER', True)
+        
         # Configure job stores and executors
         jobstores = {
-            'default': SQLAlchemyJobStore(url=app.config['SQLALCHEMY_DATABASE_URI'])
+            'default': SQLAlchemyJobStore(url=app.config['SQLALCHEMY_DATABASE_URI']),
+            # Per-process housekeeping jobs that must not be shared between processes
+            'local': MemoryJobStore()
         }
         
+        threads = app.config.get('SCHEDULER_THREADS', 20)
         executors = {
-            'default': ThreadPoolExecutor(20)
+            'default': ThreadPoolExecutor(threads)
         }
         
         job_defaults = {
             'coalesce': False,
-            'max_instances': 3
+            'max_instances': 3,
+            # A worker may only see a job at its next poll or after a restart;
+            # publish late rather than drop the post
+            'misfire_grace_time': 3600
         }
         
+        # Kept for set-based changes to the post jobs (see cancel_posts)
+        self.job_store = jobstores['default']
+        
         # Create scheduler
         self.scheduler = BackgroundScheduler(
             jobstores=jobstores,
@@ -55,26 +144,94 @@ class PostScheduler:
             job_defaults=job_defaults
         )
         
-        # Initialize LinkedIn API
-        self.linkedin_api = LinkedInAPI(
-            app.config['LINKEDIN_CLIENT_ID'],
-            app.config['LINKEDIN_CLIENT_SECRET'],
-            app.config['LINKEDIN_REDIRECT_URI']
-        )
+        # Track how busy the thread pool is
+        if self.active:
+            SCHEDULER_THREADS.set(threads)
+            self.scheduler.add_listener(self._on_job_submitted, EVENT_JOB_SUBMITTED)
+            self.scheduler.add_listener(self._on_job_finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+        
+        # Initialize LinkedIn API (shares the web app's connection pool)
+        self.linkedin_api = LinkedInAPI.from_config(app.config)
+        self.retry_policy = RetryPolicy.from_config(app.config)
         
         # Set global instance
         _scheduler_instance = self
         
-        # Start scheduler
-        self.scheduler.start()
+        # Dispatcher mode: poll the posts table instead of one job per post
+        if self.active and self.mode == 'dispatcher':
+            self.dispatch_workers = app.config.get('DISPATCH_WORKERS', 20)
+            self.dispatch_pool = WorkerPool(max_workers=self.dispatch_workers)
+            DISPATCH_WORKERS.set(self.dispatch_workers)
+            self.scheduler.add_job(
+                func=dispatch_due_posts_job,
+                trigger='interval',
+                seconds=app.config.get('DISPATCH_POLL_SECONDS', 5),
+                id='dispatch_due_posts',
+                jobstore='local',
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+        elif self.active:
+            # APScheduler sleeps until the next job it knows about, so poll for
+            # jobs that web processes add while this one is the only runner
+            self.scheduler.add_job(
+                func=poll_job_store_job,
+                trigger='interval',
+                seconds=app.config.get('WORKER_POLL_SECONDS', 5),
+                id='poll_job_store',
+                jobstore='local',
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+        
+        # Refresh access tokens before they expire; users are claimed in the
+        # database, so every running process can take part
+        if self.active and app.config.get('TOKEN_REFRESH_ENABLED', True):
+            self.scheduler.add_job(
+                func=refresh_tokens_job,
+                trigger='interval',
+                minutes=app.config.get('TOKEN_REFRESH_INTERVAL_MINUTES', 30),
+                id='refresh_tokens',
+                jobstore='local',
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True,
+                next_run_time=datetime.now() + timedelta(seconds=30)
+            )
+        
+        # Poll published posts for likes and comments, within its own API budget
+        if self.active and app.config.get('ENGAGEMENT_SYNC_ENABLED', True):
+            self.scheduler.add_job(
+                func=sync_engagement_job,
+                trigger='interval',
+                minutes=app.config.get('ENGAGEMENT_SYNC_INTERVAL_MINUTES', 5),
+                id='sync_engagement',
+                jobstore='local',
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True,
+                next_run_time=datetime.now() + timedelta(seconds=60)
+            )
+        
+        # Start scheduler (paused when another process does the publishing)
+        self.scheduler.start(paused=not self.active)
         
         # Shutdown scheduler when app exits
-        atexit.register(lambda: self.scheduler.shutdown())
+        atexit.register(self.shutdown)
         
-        print("Post scheduler initialized successfully!")
+        if self.active:
+            print("Post scheduler initialized successfully!")
+        else:
+            print("Post scheduler initialized (paused: RUN_SCHEDULER is off, a worker publishes)")
     
     def schedule_post(self, post_id, scheduled_time):
         """Schedule a post to be published"""
+        if self.mode == 'dispatcher':
+            # The post's own status and scheduled_time are the schedule
+            return True
+        
         try:
             job_id = f"post_{post_id}"
             
@@ -98,8 +255,36 @@ class PostScheduler:
             print(f"Error scheduling post {post_id}: {e}")
             return False
     
+    def schedule_posts(self, posts):
+        """Schedule many new posts in one pass; posts are (post_id, scheduled_time) pairs.
+        
+        Unlike schedule_post there is no lookup for an existing job, since
+        new posts have none. Returns the number scheduled.
+        """
+        if self.mode == 'dispatcher':
+            return len(posts)
+        
+        scheduled = 0
+        for post_id, scheduled_time in posts:
+            try:
+                self.scheduler.add_job(
+                    func=publish_post_job,
+                    trigger='date',
+                    run_date=scheduled_time,
+                    args=[post_id],
+                    id=f"post_{post_id}",
+                    replace_existing=True
+                )
+                scheduled += 1
+            except Exception as e:
+                print(f"Error scheduling post {post_id}: {e}")
+        return scheduled
+    
     def cancel_scheduled_post(self, post_id):
         """Cancel a scheduled post"""
+        if self.mode == 'dispatcher':
+            return True
+        
         try:
             job_id = f"post_{post_id}"
             if self.scheduler.get_job(job_id):
@@ -111,10 +296,155 @@ class PostScheduler:
             print(f"Error cancelling post {post_id}: {e}")
             return False
     
-    def publish_post(self, post_id):
+    def cancel_posts(self, post_ids, chunk_size=500):
+        """Cancel many scheduled posts with one DELETE per chunk on the job store.
+        
+        APScheduler only removes jobs one at a time (a lookup and a delete
+        each); the scheduler reads due jobs from the store on every wakeup,
+        so deleting the rows directly is enough. Returns the jobs removed.
+        """
+        if self.mode == 'dispatcher' or not post_ids:
+            return 0
+        
+        job_ids = [f"post_{post_id}" for post_id in post_ids]
+        jobs_t = self.job_store.jobs_t
+        removed = 0
+        try:
+            with self.job_store.engine.begin() as connection:
+                for start in range(0, len(job_ids), chunk_size):
+                    result = connection.execute(jobs_t.delete().where(jobs_t.c.id.in_(job_ids[start:start + chunk_size])))
+                    removed += result.rowcount
+        except Exception as e:
+            print(f"Error cancelling {len(job_ids)} scheduled posts: {e}")
+        return removed
+    
+    def _on_job_submitted(self, event):
+        SCHEDULER_JOBS_RUNNING.inc()
+    
+    def _on_job_finished(self, event):
+        SCHEDULER_JOBS_RUNNING.dec()
+    
+    def shutdown(self):
+        """Stop the scheduler and the dispatcher's publish threads"""
+        if self.scheduler and self.scheduler.running:
+            self.scheduler.shutdown()
+        if self.dispatch_pool:
+            self.dispatch_pool.shutdown(wait=False)
+    
+    def claim_posts(self, limit, post_ids=None, now=None):
+        """Lease up to `limit` due posts to this worker; returns (claim_token, post_ids)"""
+        now = now or datetime.utcnow()
+        lease_until = now + timedelta(seconds=self.app.config.get('DISPATCH_LEASE_SECONDS', 300))
+        claim_token = f"{self.worker_id}:{uuid.uuid4().hex[:8]}"
+        
+        due = build_due_posts_query(now, limit)
+        if post_ids is not None:
+            due = due.where(Post.id.in_(post_ids))
+        
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                # Lock the rows we take; rows other workers hold are skipped, not waited on
+                claimed = db.session.execute(due.with_for_update(skip_locked=True)).scalars().all()
+                if claimed:
+                    db.session.execute(
+                        update(Post)
+                        .where(Post.id.in_(claimed))
+                        .values(claimed_by=claim_token, lease_expires_at=lease_until),
+                        execution_options={'synchronize_session': False}
+                    )
+            else:
+                # SQLite serialises writers, so one conditional UPDATE is atomic
+                db.session.execute(
+                    update(Post)
+                    .where(Post.id.in_(due.scalar_subquery()))
+                    .values(claimed_by=claim_token, lease_expires_at=lease_until),
+                    execution_options={'synchronize_session': False}
+                )
+                claimed = db.session.execute(
+                    select(Post.id).where(Post.claimed_by == claim_token)
+                ).scalars().all()
+            db.session.commit()
+            return claim_token, claimed
+        except Exception as e:
+            print(f"Error claiming due posts: {e}")
+            db.session.rollback()
+            return claim_token, []
+    
+    def extend_lease(self, post_ids, claim_token):
+        """Renew this worker's lease on posts it still holds; returns the ids it still holds.
+        
+        Called right before a post is created on LinkedIn: the token refresh,
+        rate limiter waits and image upload before it may have outlasted the
+        lease, and a post another worker has claimed since must not be
+        published here as well.
+        """
+        lease_until = datetime.utcnow() + timedelta(seconds=self.app.config.get('DISPATCH_LEASE_SECONDS', 300))
+        held = db.session.execute(
+            update(Post)
+            .where(Post.id.in_(post_ids), Post.claimed_by == claim_token)
+            .values(lease_expires_at=lease_until)
+            .returning(Post.id),
+            execution_options={'synchronize_session': False}
+        ).scalars().all()
+        db.session.commit()
+        return held
+    
+    def dispatch_due_posts(self):
+        """Claim due posts in batches and hand them to the publish workers"""
+        batch_size = self.app.config.get('DISPATCH_BATCH_SIZE', 50)
+        use_async = self.app.config.get('DISPATCH_ASYNC', False)
+        dispatched = 0
+        
+        while True:
+            if use_async:
+                limit = batch_size
+            else:
+                with self._in_flight_lock:
+                    limit = min(batch_size, self.dispatch_workers - self._in_flight)
+                if limit <= 0:
+                    break
+            
+            claim_token, post_ids = self.claim_posts(limit)
+            if not post_ids:
+                break
+            
+            if use_async:
+                self.publish_posts_async(post_ids, claim_token=claim_token)
+            else:
+                with self._in_flight_lock:
+                    self._in_flight += len(post_ids)
+                DISPATCH_IN_FLIGHT.inc(len(post_ids))
+                for post_id in post_ids:
+                    self.dispatch_pool.submit(self._publish_claimed, post_id, claim_token)
+            
+            dispatched += len(post_ids)
+            if len(post_ids) < limit:
+                break
+        
+        if dispatched:
+            print(f"Dispatched {dispatched} due posts")
+        return dispatched
+    
+    def _publish_claimed(self, post_id, claim_token):
+        try:
+            with self.app.app_context():
+                self.publish_post(post_id, claim_token=claim_token)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            DISPATCH_IN_FLIGHT.dec()
+    
+    def publish_post(self, post_id, claim_token=None):
         """Publish a scheduled post"""
         print(f"Attempting to publish post {post_id}")
         
+        # A job from 'jobs' mode firing in dispatcher mode must take the lease first
+        if self.mode == 'dispatcher' and claim_token is None:
+            claim_token, claimed = self.claim_posts(1, post_ids=[post_id])
+            if not claimed:
+                print(f"Post {post_id} is not due or is claimed by another worker")
+                return
+        
         try:
             # Get post from database
             post = Post.query.get(post_id)
@@ -122,41 +452,46 @@ class PostScheduler:
                 print(f"Post {post_id} not found")
                 return
             
+            # Never publish twice
+            if post.status == PostStatus.PUBLISHED:
+                print(f"Post {post_id} is already published")
+                return
+            if claim_token and post.claimed_by != claim_token:
+                print(f"Post {post_id} is no longer leased to this worker")
+                return
+            
             # Get user
             user = User.query.get(post.user_id)
             if not user:
                 print(f"User for post {post_id} not found")
                 return
             
-            # Check if user's token is still valid
-            if user.token_expires_at and user.token_expires_at < datetime.utcnow():
+            # Wait for the media pipeline to finish the image
+            if self._defer_for_media(post):
+                db.session.commit()
+                return
+            
+            # Check if user's token is still valid (refreshing it if it can be)
+            if not self._ensure_token(user):
                 print(f"Access token expired for user {user.id}")
-                post.status = PostStatus.FAILED
-                post.error_message = "Access token expired. Please reconnect your LinkedIn account."
+                self._mark_token_expired(post)
                 db.session.commit()
                 return
             
-            # Upload image if exists
-            image_asset_id = None
-            if post.image_path:
-                image_path = os.path.join('static', post.image_path.lstrip('/static/'))
-                if os.path.exists(image_path):
-                    image_asset_id = self.linkedin_api.upload_image(
-                        user.access_token,
-                        image_path,
-                        user.linkedin_id
-                    )
-                    if not image_asset_id:
-                        print(f"Failed to upload image for post {post_id}")
-                        post.status = PostStatus.FAILED
-                        post.error_message = "Failed to upload image to LinkedIn"
-                        post.retry_count += 1
-                        db.session.commit()
-                        
-                        # Retry if less than 3 attempts
-                        if post.retry_count < 3:
-                            self.schedule_retry(post_id, minutes=30)
-                        return
+            # Upload image if exists (reusing an asset this member already uploaded)
+            image_asset_id = self._cached_asset(post)
+            image_path = self._image_file_path(post)
+            if image_path and not image_asset_id:
+                image_asset_id = self.linkedin_api.upload_image(
+                    user.access_token,
+                    image_path,
+                    user.linkedin_id
+                )
+                self._remember_asset(post, image_asset_id)
+            
+            if claim_token and not self.extend_lease([post_id], claim_token):
+                print(f"Post {post_id} was claimed by another worker while preparing it; not publishing")
+                return
             
             # Create the post
             linkedin_post_id = self.linkedin_api.create_post(
@@ -166,62 +501,225 @@ class PostScheduler:
                 image_asset_id
             )
             
-            if linkedin_post_id:
-                # Update post status
-                post.status = PostStatus.PUBLISHED
-                post.published_time = datetime.utcnow()
-                post.linkedin_post_id = linkedin_post_id
-                post.error_message = None
-                print(f"Successfully published post {post_id} to LinkedIn")
-            else:
-                # Mark as failed
-                post.status = PostStatus.FAILED
-                post.error_message = "Failed to create post on LinkedIn"
-                post.retry_count += 1
-                print(f"Failed to publish post {post_id}")
-                
-                # Retry if less than 3 attempts
-                if post.retry_count < 3:
-                    self.schedule_retry(post_id, minutes=30)
-            
+            self._mark_published(post, linkedin_post_id)
+            print(f"Successfully published post {post_id} to LinkedIn")
             db.session.commit()
-            
+        
         except Exception as e:
             print(f"Error publishing post {post_id}: {e}")
             try:
+                # Keep an asset that was uploaded before the failure
+                if not isinstance(e, (LinkedInAPIError, RateLimited)):
+                    db.session.rollback()
                 post = Post.query.get(post_id)
                 if post:
-                    post.status = PostStatus.FAILED
-                    post.error_message = str(e)
-                    post.retry_count += 1
+                    self.record_failure(post, e)
                     db.session.commit()
-                    
-                    # Retry if less than 3 attempts
-                    if post.retry_count < 3:
-                        self.schedule_retry(post_id, minutes=30)
             except Exception as db_error:
                 print(f"Error updating post status: {db_error}")
     
-    def schedule_retry(self, post_id, minutes=30):
-        """Schedule a retry for a failed post"""
+    def publish_posts_async(self, post_ids, claim_token=None):
+        """Publish a batch of posts concurrently on one event loop"""
+        posts = Post.query.filter(Post.id.in_(post_ids)).all()
+        posts = [
+            post for post in posts
+            if post.status != PostStatus.PUBLISHED
+            and (claim_token is None or post.claimed_by == claim_token)
+        ]
+        user_ids = {post.user_id for post in posts}
+        users = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+        
+        jobs = []
+        for post in posts:
+            user = users.get(post.user_id)
+            if not user:
+                print(f"User for post {post.id} not found")
+                continue
+            if self._defer_for_media(post):
+                continue
+            try:
+                token_valid = self._ensure_token(user)
+            except RateLimited as e:
+                self.record_failure(post, e)
+                continue
+            if not token_valid:
+                print(f"Access token expired for user {user.id}")
+                self._mark_token_expired(post)
+                continue
+            jobs.append({
+                'post_id': post.id,
+                'access_token': user.access_token,
+                'linkedin_id': user.linkedin_id,
+                'content': post.content,
+                'image_path': self._image_file_path(post),
+                'image_asset_id': self._cached_asset(post)
+            })
+        db.session.commit()
+        
+        if not jobs:
+            return
+        
+        print(f"Publishing {len(jobs)} posts concurrently")
+        before_create = None
+        if claim_token:
+            before_create = lambda job: bool(self.extend_lease([job['post_id']], claim_token))
+        results = asyncio.run(publish_batch(self.app.config, jobs, before_create))
+        
+        posts_by_id = {post.id: post for post in posts}
+        for result in results:
+            post = posts_by_id[result['post_id']]
+            if result['image_asset_id']:
+                self._remember_asset(post, result['image_asset_id'])
+            if result['skipped']:
+                print(f"Post {post.id} was claimed by another worker during the batch; not publishing")
+            elif result['exception'] is None:
+                self._mark_published(post, result['linkedin_post_id'])
+                print(f"Successfully published post {post.id} to LinkedIn")
+            else:
+                print(f"Failed to publish post {post.id}: {result['error']}")
+                self.record_failure(post, result['exception'])
+        db.session.commit()
+    
+    def _defer_for_media(self, post):
+        """Hold back a post whose image is not ready; returns True if it was held back"""
+        if post.media_status == MediaStatus.PENDING:
+            print(f"Image for post {post.id} is still processing - checking again shortly")
+            delay = self.app.config.get('MEDIA_PENDING_RECHECK_SECONDS', 30)
+            self._requeue(post, datetime.utcnow() + timedelta(seconds=delay))
+            return True
+        if post.media_status == MediaStatus.FAILED:
+            # Retrying will not help until the user uploads a new image
+            post.status = PostStatus.FAILED
+            post.error_message = "Failed to process image"
+            self._release_claim(post)
+            record_publish_failure('media', retrying=False)
+            return True
+        return False
+    
+    def _token_expired(self, user, margin_seconds=0):
+        expires_before = datetime.utcnow() + timedelta(seconds=margin_seconds)
+        return bool(user.token_expires_at and user.token_expires_at < expires_before)
+    
+    def _ensure_token(self, user):
+        """True if the user's token is usable, refreshing it now if it has (nearly) expired.
+        
+        The maintenance job normally refreshes tokens well ahead of time;
+        this catches tokens that expired between runs.
+        """
+        if not self._token_expired(user, margin_seconds=60):
+            return True
+        if not user.refresh_token or user.token_refresh_error:
+            return not self._token_expired(user)
+        
+        print(f"Refreshing access token for user {user.id} before publishing")
+        refresh_user_token(self.linkedin_api, user)
+        return not self._token_expired(user)
+    
+    def refresh_tokens(self):
+        """Refresh access tokens close to expiry (see token_maintenance.py)"""
         try:
-            retry_time = datetime.utcnow().replace(second=0, microsecond=0)
-            retry_time = retry_time.replace(minute=retry_time.minute + minutes)
-            
-            job_id = f"retry_post_{post_id}"
-            
-            self.scheduler.add_job(
-                func=self.publish_post,
-                trigger='date',
-                run_date=retry_time,
-                args=[post_id],
-                id=job_id,
-                replace_existing=True
-            )
-            
-            print(f"Scheduled retry for post {post_id} at {retry_time}")
+            return refresh_expiring_tokens(self.app.config, self.linkedin_api)
+        except Exception as e:
+            print(f"Error refreshing access tokens: {e}")
+            db.session.rollback()
+    
+    def sync_engagement(self):
+        """Poll published posts for engagement (see engagement_sync.py)"""
+        try:
+            return sync_engagement(self.app.config, self.linkedin_api)
         except Exception as e:
-            print(f"Error scheduling retry for post {post_id}: {e}")
+            print(f"Error syncing post engagement: {e}")
+            db.session.rollback()
+    
+    def _cached_asset(self, post):
+        if not post.media_hash:
+            return None
+        return get_cached_asset(post.user_id, post.media_hash)
+    
+    def _remember_asset(self, post, image_asset_id):
+        if post.media_hash:
+            remember_asset(post.user_id, post.media_hash, image_asset_id,
+                           self.app.config.get('LINKEDIN_ASSET_CACHE_TTL_HOURS', 24))
+    
+    def _image_file_path(self, post):
+        """Local path of the post's image, or None if it has none on disk"""
+        if not post.image_path:
+            return None
+        image_path = os.path.join('static', post.image_path.lstrip('/static/'))
+        return image_path if os.path.exists(image_path) else None
+    
+    def _release_claim(self, post):
+        post.claimed_by = None
+        post.lease_expires_at = None
+    
+    def _requeue(self, post, when):
+        """Put a post back in the queue to be tried again at `when`"""
+        post.status = PostStatus.SCHEDULED
+        post.scheduled_time = when
+        self._release_claim(post)
+        if self.mode != 'dispatcher':
+            self.schedule_post(post.id, when)
+    
+    def _mark_token_expired(self, post):
+        post.status = PostStatus.FAILED
+        post.error_message = "Access token expired. Please reconnect your LinkedIn account."
+        self._release_claim(post)
+        record_publish_failure('token_expired', retrying=False)
+    
+    def _mark_published(self, post, linkedin_post_id):
+        record_published(post)
+        post.status = PostStatus.PUBLISHED
+        post.published_time = datetime.utcnow()
+        post.linkedin_post_id = linkedin_post_id
+        post.error_message = None
+        post.failure_class = None
+        self._release_claim(post)
+    
+    def record_failure(self, post, error):
+        """Apply the retry policy to a failed publish (caller commits).
+        
+        The post goes back in the queue with a backoff while attempts of its
+        failure class remain, and is marked FAILED otherwise. LinkedIn 429s
+        count against their own cap, not retry_count; a call the local rate
+        limiter held back was never made, so it is deferred without using
+        an attempt. Returns True if a retry was scheduled.
+        """
+        failure_class = self.retry_policy.classify(error)
+        if isinstance(error, RateLimited) and not error.from_linkedin:
+            attempt = 0
+        elif failure_class == FailureClass.RATE_LIMIT:
+            post.rate_limit_count = (post.rate_limit_count or 0) + 1
+            attempt = post.rate_limit_count
+        else:
+            post.retry_count = (post.retry_count or 0) + 1
+            attempt = post.retry_count
+        
+        delay = self.retry_policy.next_delay(failure_class, attempt, getattr(error, 'retry_after', None))
+        retry_metrics.record(failure_class, delay)
+        record_publish_failure(failure_class.value, retrying=delay is not None)
+        post.failure_class = failure_class.value
+        post.error_message = str(error)
+        
+        if delay is None:
+            print(f"Giving up on post {post.id} after {attempt} {failure_class.value} failure(s)")
+            post.status = PostStatus.FAILED
+            self._release_claim(post)
+            return False
+        
+        if attempt:
+            print(f"Retrying post {post.id} in {delay:.0f}s ({failure_class.value} failure {attempt})")
+        else:
+            print(f"Deferring post {post.id} for {delay:.0f}s (held back by the local rate limiter)")
+        self._requeue(post, datetime.utcnow() + timedelta(seconds=delay))
+        return True
+    
+    def schedule_retry(self, post_id, minutes=30):
+        """Schedule a retry for a failed post through the normal publish job"""
+        retry_time = datetime.utcnow() + timedelta(minutes=minutes)
+        if self.schedule_post(post_id, retry_time):
+            print(f"Scheduled retry for post {post_id} at {retry_time}")
+            return True
+        return False
     
     def get_scheduled_jobs(self):
         """Get all scheduled jobs"""
@@ -240,6 +738,9 @@ class PostScheduler:
     
     def reschedule_post(self, post_id, new_time):
         """Reschedule an existing post"""
+        if self.mode == 'dispatcher':
+            return True
+        
         try:
             # Cancel existing schedule
             self.cancel_scheduled_post(post_id)
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Scheduler simulator on a virtual clock.
+
+Replays a day (or any span) of scheduled posts through a model of
+scheduler.py - jobs mode (one APScheduler job per post on a thread pool,
+with misfire_grace_time) or dispatcher mode (polling, batch claims and a
+bounded worker pool, optionally publishing batches on asyncio) - with
+simulated LinkedIn latency, failures, 429s and the real RetryPolicy.
+Nothing is published and no time passes: a day runs in seconds.
+
+    python simulator.py --posts 20000 --spike 0.5 --spike-at 09:00
+    python simulator.py --mode dispatcher --dispatch-workers 50 --latency lognormal:400:0.6
+    python simulator.py --from-db --date 2026-10-12 --output monday.json
+    python simulator.py --times times.csv
+
+Settings not given on the command line (threads, batch sizes, retry caps,
+rate limits) come from the app config, so the configured deployment is
+what gets simulated. Reports queue depth over time, misfires and lag.
+"""
+
+import argparse
+from collections import deque
+from datetime import datetime, timedelta
+import heapq
+import json
+import random
+import time
+
+from config import load_config
+from fake_linkedin import Latency
+from linkedin_api import LinkedInAPIError
+from rate_limiter import RateLimited, member_bucket, APP_BUCKET
+from retry_policy import RetryPolicy
+
+# APScheduler job_defaults['misfire_grace_time'] in scheduler.py
+MISFIRE_GRACE_SECONDS = 3600
+
+class SimPost:
+    __slots__ = ('id', 'member', 'image', 'first_due', 'due', 'retry_count', 'rate_limit_count',
+                 'state', 'published_at')
+    
+    def __init__(self, post_id, due, member, image=False):
+        self.id = post_id
+        self.member = member
+        self.image = image
+        self.first_due = due
+        self.due = due
+        self.retry_count = 0
+        self.rate_limit_count = 0
+        self.state = 'scheduled'
+        self.published_at = None
+
+class SimRateLimiter:
+    """In-memory version of rate_limiter.RateLimiter's member and app token buckets"""
+    
+    def __init__(self, config):
+        self.enabled = config.get('RATE_LIMIT_ENABLED', True)
+        self.max_wait = config.get('RATE_LIMIT_MAX_WAIT_SECONDS', 5)
+        self.limits = {
+            'member': (config.get('RATE_LIMIT_MEMBER_BURST', 10), config.get('RATE_LIMIT_MEMBER_PER_HOUR', 100) / 3600),
+            APP_BUCKET: (config.get('RATE_LIMIT_APP_BURST', 100), config.get('RATE_LIMIT_APP_PER_HOUR', 10000) / 3600),
+        }
+        self.buckets = {}
+    
+    def _next_token(self, key, now):
+        """(time the bucket next has a whole token, tokens at that time, refill rate)"""
+        capacity, rate = self.limits[APP_BUCKET if key == APP_BUCKET else 'member']
+        tokens, updated, blocked_until = self.buckets.get(key, (capacity, now, 0))
+        # Concurrent publishes may already have spent tokens up to `updated`
+        at = max(now, updated, blocked_until)
+        level = min(capacity, tokens + (at - updated) * rate)
+        if level < 1:
+            at += (1 - level) / rate
+            level = 1
+        return at, level, rate
+    
+    def acquire(self, member, now):
+        """Seconds the call waits for its tokens; raises RateLimited past max_wait"""
+        if not self.enabled:
+            return 0
+        waited = 0
+        taken = {}
+        for key in (member_bucket(member), APP_BUCKET):
+            at, level, rate = self._next_token(key, now + waited)
+            wait = at - (now + waited)
+            if waited + wait > self.max_wait:
+                # Nothing is taken from either bucket, as with RateLimiter.refund
+                raise RateLimited(key, wait)
+            waited += wait
+            taken[key] = (level - 1, at, 0)
+        self.buckets.update(taken)
+        return waited
+    
+    def block(self, member, retry_after, now):
+        if self.enabled:
+            self.buckets[member_bucket(member)] = (0, now + retry_after, now + retry_after)
+
+class ApiModel:
+    """Latency and failures of the LinkedIn calls a publish makes"""
+    
+    def __init__(self, rng, latency, upload_latency, error_rate, permanent_rate, throttle_rate, retry_after,
+                 db_ms):
+        self.rng = rng
+        self.latency = Latency(latency)
+        self.upload_latency = Latency(upload_latency)
+        self.error_rate = error_rate
+        self.permanent_rate = permanent_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.db_seconds = db_ms / 1000
+    
+    def publish(self, post, start, limiter):
+        """Simulate one publish starting at `start`; returns (duration, error or None)"""
+        elapsed = self.db_seconds
+        calls = [self.latency, self.upload_latency, self.latency] if post.image else [self.latency]
+        for call_latency in calls:
+            try:
+                elapsed += limiter.acquire(post.member, start + elapsed)
+            except RateLimited as e:
+                return elapsed, e
+            elapsed += call_latency.sample(self.rng)
+            
+            roll = self.rng.random()
+            if roll < self.throttle_rate:
+                limiter.block(post.member, self.retry_after, start + elapsed)
+                return elapsed, RateLimited(member_bucket(post.member), self.retry_after, from_linkedin=True)
+            roll -= self.throttle_rate
+            if roll < self.error_rate:
+                return elapsed, LinkedInAPIError("Simulated server error", 503)
+            roll -= self.error_rate
+            if roll < self.permanent_rate:
+                return elapsed, LinkedInAPIError("Simulated bad request", 422)
+        return elapsed + self.db_seconds, None
+
+class SchedulerSimulation:
+    """Discrete-event model of PostScheduler; times are seconds from the start of the span"""
+    
+    def __init__(self, posts, config, api, mode, sample_seconds=10, jobstore_ms=2.0, seed=None):
+        self.posts = posts
+        self.config = config
+        self.api = api
+        self.mode = mode
+        self.sample_seconds = sample_seconds
+        self.jobstore_seconds = jobstore_ms / 1000
+        self.limiter = SimRateLimiter(config)
+        self.retry_policy = RetryPolicy.from_config(config)
+        self.retry_policy.rng = random.Random(seed)
+        
+        self.events = []
+        self._sequence = 0
+        self.now = 0.0
+        # Posts not yet published, failed or misfired
+        self.remaining = len(posts)
+        
+        # Queue depth: posts due and not yet started; in_flight: being published
+        self.queued = 0
+        self.in_flight = 0
+        self.timeline = []
+        self.misfires = 0
+        self.outcomes = {'published': 0, 'failed': 0, 'retries': 0, 'rate_limited': 0}
+        
+        # Jobs mode: the APScheduler loop and its thread pool
+        self.threads = config.get('SCHEDULER_THREADS', 20)
+        self.loop_free_at = 0.0
+        self.pool_queue = deque()
+        
+        # Dispatcher mode: due posts by due time, the worker pool and the poll job
+        self.workers = config.get('DISPATCH_WORKERS', 20)
+        self.batch_size = config.get('DISPATCH_BATCH_SIZE', 50)
+        self.poll_seconds = config.get('DISPATCH_POLL_SECONDS', 5)
+        self.use_async = config.get('DISPATCH_ASYNC', False)
+        self.async_concurrency = config.get('PUBLISH_ASYNC_CONCURRENCY', 100)
+        self.due_heap = []
+        self.dispatch_busy = False
+    
+    def schedule(self, when, kind, payload=None):
+        self._sequence += 1
+        heapq.heappush(self.events, (when, self._sequence, kind, payload))
+    
+    def run(self):
+        for post in self.posts:
+            self._enqueue(post, post.due)
+        if self.mode == 'dispatcher':
+            self.schedule(0.0, 'poll')
+        self.schedule(0.0, 'sample')
+        
+        while self.events:
+            when, _, kind, payload = heapq.heappop(self.events)
+            self.now = when
+            if kind == 'sample':
+                self.timeline.append((round(when, 1), self.queued, self.in_flight))
+                # Keep sampling until every post is done
+                if self.remaining:
+                    self.schedule(when + self.sample_seconds, 'sample')
+            else:
+                getattr(self, f'_on_{kind}')(payload)
+    
+    def _enqueue(self, post, when):
+        """Post becomes due at `when` (first schedule or a retry)"""
+        post.due = when
+        post.state = 'scheduled'
+        self.schedule(when, 'due', post)
+        if self.mode == 'jobs':
+            self.schedule(when, 'job', post)
+        else:
+            heapq.heappush(self.due_heap, (when, post.id, post))
+    
+    def _on_due(self, post):
+        if post.state == 'scheduled':
+            self.queued += 1
+    
+    # Jobs mode
+    
+    def _on_job(self, post):
+        # The scheduler loop handles due jobs one at a time (job store reads and deletes)
+        handled_at = max(self.now, self.loop_free_at)
+        self.loop_free_at = handled_at + self.jobstore_seconds
+        if handled_at - post.due > MISFIRE_GRACE_SECONDS:
+            # APScheduler drops the run; the post stays SCHEDULED with no job
+            self.misfires += 1
+            self.queued -= 1
+            self.remaining -= 1
+            post.state = 'misfired'
+            return
+        self.schedule(handled_at, 'submit', post)
+    
+    def _on_submit(self, post):
+        if self.in_flight < self.threads:
+            self._start(post)
+        else:
+            self.pool_queue.append(post)
+    
+    # Dispatcher mode
+    
+    def _claim(self, limit):
+        claimed = []
+        while self.due_heap and len(claimed) < limit and self.due_heap[0][0] <= self.now:
+            _, _, post = heapq.heappop(self.due_heap)
+            if post.state == 'scheduled':
+                claimed.append(post)
+        return claimed
+    
+    def _on_poll(self, payload):
+        # Interval job with max_instances=1 and coalescing: the next run is the next tick
+        if self.remaining:
+            self.schedule(self.now + self.poll_seconds, 'poll')
+        if self.dispatch_busy:
+            return
+        self._dispatch()
+    
+    def _dispatch(self):
+        while True:
+            limit = self.batch_size if self.use_async else min(self.batch_size, self.workers - self.in_flight)
+            if limit <= 0:
+                return
+            claimed = self._claim(limit)
+            if not claimed:
+                return
+            if self.use_async:
+                self._run_async_batch(claimed, full=len(claimed) == limit)
+                return
+            for post in claimed:
+                self._start(post)
+            if len(claimed) < limit:
+                return
+    
+    def _run_async_batch(self, posts, full):
+        """publish_posts_async: the dispatch job blocks until the whole batch is done"""
+        self.dispatch_busy = True
+        slots = [self.now] * min(self.async_concurrency, len(posts))
+        batch_end = self.now
+        for post in posts:
+            start = heapq.heappop(slots)
+            finish = self._start(post, start)
+            heapq.heappush(slots, finish)
+            batch_end = max(batch_end, finish)
+        self.schedule(batch_end, 'batch_done', full)
+    
+    def _on_batch_done(self, full):
+        self.dispatch_busy = False
+        if full:
+            # dispatch_due_posts keeps claiming while batches come back full
+            self._dispatch()
+    
+    # Publishing
+    
+    def _start(self, post, start=None):
+        start = self.now if start is None else start
+        self.queued -= 1
+        post.state = 'publishing'
+        self.in_flight += 1
+        duration, error = self.api.publish(post, start, self.limiter)
+        self.schedule(start + duration, 'finish', (post, error))
+        return start + duration
+    
+    def _on_finish(self, payload):
+        post, error = payload
+        self.in_flight -= 1
+        
+        if error is None:
+            post.state = 'published'
+            post.published_at = self.now
+            self.outcomes['published'] += 1
+            self.remaining -= 1
+        else:
+            self._record_failure(post, error)
+        
+        # A free pool thread takes the next submitted job
+        if self.mode == 'jobs' and self.pool_queue:
+            self._start(self.pool_queue.popleft())
+    
+    def _record_failure(self, post, error):
+        """PostScheduler.record_failure with the real RetryPolicy"""
+        failure_class = self.retry_policy.classify(error)
+        if isinstance(error, RateLimited):
+            attempt = 0
+            if error.from_linkedin:
+                post.rate_limit_count += 1
+                attempt = post.rate_limit_count
+            self.outcomes['rate_limited'] += 1
+        else:
+            post.retry_count += 1
+            attempt = post.retry_count
+        delay = self.retry_policy.next_delay(failure_class, attempt, getattr(error, 'retry_after', None))
+        if delay is None:
+            post.state = 'failed'
+            self.outcomes['failed'] += 1
+            self.remaining -= 1
+            return
+        self.outcomes['retries'] += 1
+        self._enqueue(post, self.now + delay)
+    
+    def report(self, started_at):
+        lags = sorted(post.published_at - post.first_due for post in self.posts if post.published_at is not None)
+        peak = max(self.timeline, key=lambda sample: sample[1]) if self.timeline else (0, 0, 0)
+        
+        def clock(offset):
+            return (started_at + timedelta(seconds=offset)).strftime('%Y-%m-%d %H:%M:%S')
+        
+        def pct(p):
+            return round(lags[min(len(lags) - 1, max(0, int(round(p / 100 * len(lags))) - 1))], 2) if lags else None
+        
+        worst = max((post for post in self.posts if post.published_at is not None),
+                    key=lambda post: post.published_at - post.first_due, default=None)
+        return {
+            'mode': self.mode + (' (async)' if self.mode == 'dispatcher' and self.use_async else ''),
+            'posts': len(self.posts),
+            'outcomes': dict(self.outcomes, misfired=self.misfires,
+                             unfinished=sum(1 for post in self.posts if post.state in ('scheduled', 'publishing'))),
+            'lag_seconds': {'p50': pct(50), 'p95': pct(95), 'p99': pct(99), 'max': pct(100)},
+            'worst_lag': {
+                'post_due': clock(worst.first_due),
+                'published': clock(worst.published_at),
+                'seconds': round(worst.published_at - worst.first_due, 2)
+            } if worst else None,
+            'late_over_grace': sum(1 for lag in lags if lag > MISFIRE_GRACE_SECONDS),
+            'peak_queue': {'depth': peak[1], 'at': clock(peak[0])},
+            'simulated_seconds': round(self.now, 1),
+            'timeline': [{'at': clock(t), 'queued': queued, 'in_flight': in_flight}
+                         for t, queued, in_flight in self.timeline],
+        }
+
+# Workloads
+
+def synthetic_workload(rng, posts, users, start, hours, spike, spike_at, image_ratio):
+    """`spike` of the posts due in the minute at spike_at, the rest over the span, mostly on round times"""
+    times = []
+    spike_count = int(posts * spike)
+    spike_start = (spike_at - start).total_seconds()
+    for _ in range(spike_count):
+        # People pick 9:00 sharp; the app schedules to the second
+        times.append(spike_start + (0 if rng.random() < 0.8 else rng.uniform(0, 60)))
+    
+    span = hours * 3600
+    for _ in range(posts - spike_count):
+        offset = rng.uniform(0, span)
+        if rng.random() < 0.6:
+            offset -= offset % 900
+        times.append(offset)
+    
+    return [SimPost(i, due, f'member{rng.randrange(users)}', rng.random() < image_ratio)
+            for i, due in enumerate(sorted(times))]
+
+def load_times_file(path, start):
+    """Posts from a CSV of scheduled_time[,member[,has_image]] lines"""
+    posts = []
+    with open(path) as f:
+        for line in f:
+            fields = [field.strip() for field in line.split(',')]
+            if not fields[0] or fields[0].startswith('#'):
+                continue
+            due = datetime.fromisoformat(fields[0])
+            member = fields[1] if len(fields) > 1 and fields[1] else f'member{len(posts)}'
+            image = len(fields) > 2 and fields[2].lower() in ('1', 'true', 'yes')
+            posts.append(SimPost(len(posts), (due - start).total_seconds(), member, image))
+    return posts
+
+def load_from_database(config, day):
+    """Posts scheduled on `day` in the app's database (any status), with their real members and images"""
+    from flask import Flask
+    from sqlalchemy import select
+    from database import db, Post
+    
+    app = Flask(__name__)
+    app.config.from_object(config)
+    db.init_app(app)
+    start = datetime.combine(day, datetime.min.time())
+    with app.app_context():
+        rows = db.session.execute(
+            select(Post.scheduled_time, Post.user_id, Post.image_path)
+            .where(Post.scheduled_time >= start, Post.scheduled_time < start + timedelta(days=1))
+            .order_by(Post.scheduled_time)
+        ).all()
+    posts = [SimPost(i, (due - start).total_seconds(), str(user_id), image_path is not None)
+             for i, (due, user_id, image_path) in enumerate(rows)]
+    return posts, start
+
+def config_dict(config_class):
+    return {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the post scheduler on a virtual clock")
+    workload = parser.add_argument_group('workload (synthetic unless --times or --from-db)')
+    workload.add_argument('--posts', type=int, default=10000)
+    workload.add_argument('--users', type=int, default=1000)
+    workload.add_argument('--hours', type=float, default=24, help="Span the non-spike posts fall in")
+    workload.add_argument('--spike', type=float, default=0.3, help="Fraction of posts due in the spike minute")
+    workload.add_argument('--spike-at', default='09:00', help="Time of the spike (HH:MM)")
+    workload.add_argument('--image-ratio', type=float, default=0.2)
+    workload.add_argument('--times', help="CSV of scheduled_time[,member[,has_image]] to replay")
+    workload.add_argument('--from-db', action='store_true', help="Replay the posts scheduled on --date")
+    workload.add_argument('--date', help="Day to replay or simulate (YYYY-MM-DD, default today)")
+    
+    scheduler = parser.add_argument_group('scheduler (defaults from config)')
+    scheduler.add_argument('--mode', choices=('jobs', 'dispatcher'))
+    scheduler.add_argument('--async', dest='use_async', action='store_true', help="Dispatcher publishes on asyncio")
+    scheduler.add_argument('--threads', type=int, help="SCHEDULER_THREADS")
+    scheduler.add_argument('--dispatch-workers', type=int, help="DISPATCH_WORKERS")
+    scheduler.add_argument('--batch-size', type=int, help="DISPATCH_BATCH_SIZE")
+    scheduler.add_argument('--poll', type=float, help="DISPATCH_POLL_SECONDS")
+    scheduler.add_argument('--no-rate-limit', action='store_true', help="Simulate with RATE_LIMIT_ENABLED off")
+    scheduler.add_argument('--jobstore-ms', type=float, default=2.0, help="Scheduler loop cost per job (jobs mode)")
+    scheduler.add_argument('--db-ms', type=float, default=3.0, help="Database time per publish, before and after")
+    
+    api = parser.add_argument_group('LinkedIn API')
+    api.add_argument('--latency', default='lognormal:250:0.5', help="See fake_linkedin.Latency (ms)")
+    api.add_argument('--upload-latency', default='lognormal:800:0.6')
+    api.add_argument('--error-rate', type=float, default=0.01, help="Share of calls failing with a 5xx")
+    api.add_argument('--permanent-rate', type=float, default=0.001, help="Share of calls failing with a 4xx")
+    api.add_argument('--throttle-rate', type=float, default=0.0, help="Share of calls answered with 429")
+    api.add_argument('--retry-after', type=float, default=60)
+    
+    parser.add_argument('--sample-seconds', type=float, default=10, help="Queue depth sampling interval")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Write the JSON report (with the full timeline) here")
+    args = parser.parse_args()
+    
+    config = config_dict(load_config())
+    overrides = {
+        'SCHEDULER_MODE': args.mode,
+        'SCHEDULER_THREADS': args.threads,
+        'DISPATCH_WORKERS': args.dispatch_workers,
+        'DISPATCH_BATCH_SIZE': args.batch_size,
+        'DISPATCH_POLL_SECONDS': args.poll,
+        'DISPATCH_ASYNC': True if args.use_async else None,
+        'RATE_LIMIT_ENABLED': False if args.no_rate_limit else None,
+    }
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    
+    rng = random.Random(args.seed)
+    day = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else datetime.utcnow().date()
+    start = datetime.combine(day, datetime.min.time())
+    if args.from_db:
+        posts, start = load_from_database(load_config(), day)
+    elif args.times:
+        posts = load_times_file(args.times, start)
+    else:
+        spike_at = datetime.combine(day, datetime.strptime(args.spike_at, '%H:%M').time())
+        posts = synthetic_workload(rng, args.posts, args.users, start, args.hours, args.spike, spike_at,
+                                   args.image_ratio)
+    if not posts:
+        print("No posts to simulate")
+        return
+    
+    api_model = ApiModel(rng, args.latency, args.upload_latency, args.error_rate, args.permanent_rate,
+                         args.throttle_rate, args.retry_after, args.db_ms)
+    simulation = SchedulerSimulation(posts, config, api_model, config['SCHEDULER_MODE'],
+                                     args.sample_seconds, args.jobstore_ms, args.seed)
+    
+    wall_started = time.perf_counter()
+    simulation.run()
+    report = simulation.report(start)
+    report['wall_seconds'] = round(time.perf_counter() - wall_started, 2)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.output}")
+    
+    print(f"\n🕒 Simulated {report['simulated_seconds'] / 3600:.1f}h of {report['mode']} scheduling "
+          f"in {report['wall_seconds']}s")
+    print(f"   Posts: {report['posts']}  {report['outcomes']}")
+    lag = report['lag_seconds']
+    print(f"   Lag: p50 {lag['p50']}s  p95 {lag['p95']}s  p99 {lag['p99']}s  max {lag['max']}s")
+    if report['worst_lag']:
+        print(f"   Worst: due {report['worst_lag']['post_due']}, published {report['worst_lag']['published']}")
+    print(f"   Peak queue: {report['peak_queue']['depth']} at {report['peak_queue']['at']}")
+    print(f"   Misfires: {report['outcomes']['misfired']}, published over "
+          f"{MISFIRE_GRACE_SECONDS}s late: {report['late_over_grace']}")
+
+if __name__ == '__main__':
+    main()
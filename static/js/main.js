@@ -60,6 +60,56 @@ async function apiCall(url, options = {}) {
     }
 }
 
+// Conditional GETs: remember each URL's ETag and last body, and send
+// If-None-Match so unchanged data comes back as an empty 304
+const conditionalCache = new Map();
+
+async function conditionalGet(url) {
+    const cached = conditionalCache.get(url);
+    const response = await fetch(url, {
+        // Bypass the browser cache, which would turn 304s into 200s we can't tell apart
+        cache: 'no-store',
+        headers: cached ? { 'If-None-Match': cached.etag } : {}
+    });
+    
+    if (response.status === 304 && cached) {
+        return { data: cached.data, changed: false };
+    }
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        conditionalCache.set(url, { etag, data });
+    }
+    return { data, changed: true };
+}
+
+// Poll a JSON endpoint, calling onChange only when its data changed; paused while the tab is hidden
+function pollJSON(url, intervalSeconds, onChange) {
+    if (!intervalSeconds) return null;
+    
+    let first = true;
+    const poll = async () => {
+        if (document.hidden) return;
+        try {
+            const { data, changed } = await conditionalGet(url);
+            if (changed) onChange(data, first);
+            first = false;
+        } catch (error) {
+            console.error('Polling failed:', error);
+        }
+    };
+    
+    poll();
+    document.addEventListener('visibilitychange', () => {
+        if (!document.hidden) poll();
+    });
+    return setInterval(poll, intervalSeconds * 1000);
+}
+
 // Auto-hide flash messages on click
 document.addEventListener('DOMContentLoaded', function() {
     // Auto-hide existing flash messages
@@ -414,6 +464,8 @@ window.LinkedInScheduler = {
     hideLoading,
     showFlashMessage,
     apiCall,
+    conditionalGet,
+    pollJSON,
     validateImageFile,
     createImagePreview,
     formatDate,
@@ -0,0 +1,36 @@
+import os
+import sys
+from flask import Flask
+import pytest
+
+# The app modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_limiter
+from database import db
+from fake_linkedin import FakeLinkedInConfig, FakeLinkedInServer
+
+@pytest.fixture
+def app(tmp_path):
+    """A bare Flask app on a fresh SQLite database, with an app context pushed"""
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+        UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+        RUN_SCHEDULER=False
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+    # A test that built a RateLimiter must not leave it to the next one
+    rate_limiter._limiter_instance = None
+
+@pytest.fixture
+def fake_linkedin(app):
+    """The fake LinkedIn API on a local port, with the app's clients pointed at it"""
+    with FakeLinkedInServer(FakeLinkedInConfig()) as server:
+        app.config.update(server.app_config())
+        yield server
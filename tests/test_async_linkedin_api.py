@@ -0,0 +1,94 @@
+import asyncio
+from async_linkedin_api import publish_batch, publish_many
+from linkedin_api import LinkedInAPIError
+
+class StubAsyncAPI:
+    """Records calls and how many were in flight at once; content 'fail' makes create_post fail"""
+    
+    def __init__(self, upload_error=None):
+        self.upload_error = upload_error
+        self.created = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    async def _call(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+    
+    async def upload_image(self, access_token, image_path, user_id):
+        await self._call()
+        if self.upload_error:
+            raise self.upload_error
+        return f'urn:li:digitalmediaAsset:{image_path}'
+    
+    async def create_post(self, access_token, user_id, content, image_asset_id=None):
+        await self._call()
+        if content == 'fail':
+            raise LinkedInAPIError('Failed to create post: 500', 500)
+        self.created.append((content, image_asset_id))
+        return f'urn:li:share:{content}'
+
+def job(post_id, content='hello', image_path=None, image_asset_id=None):
+    return {'post_id': post_id, 'access_token': 'token', 'linkedin_id': 'member', 'content': content,
+            'image_path': image_path, 'image_asset_id': image_asset_id}
+
+def test_publish_many_keeps_at_most_concurrency_calls_in_flight():
+    api = StubAsyncAPI()
+    jobs = [job(i, f'post {i}') for i in range(10)]
+    
+    results = asyncio.run(publish_many(api, jobs, concurrency=3))
+    
+    assert api.max_in_flight == 3
+    assert [result['post_id'] for result in results] == list(range(10))
+    assert [result['linkedin_post_id'] for result in results] == [f'urn:li:share:post {i}' for i in range(10)]
+
+def test_publish_many_returns_a_result_for_every_job():
+    api = StubAsyncAPI()
+    jobs = [job(1), job(2, 'fail'), job(3, image_path='a.jpg'), job(4, image_asset_id='urn:li:digitalmediaAsset:b')]
+    
+    ok, failed, uploaded, reused = asyncio.run(publish_many(api, jobs))
+    
+    assert (ok['linkedin_post_id'], ok['error'], ok['exception']) == ('urn:li:share:hello', None, None)
+    assert failed['linkedin_post_id'] is None
+    assert isinstance(failed['exception'], LinkedInAPIError) and failed['exception'].status_code == 500
+    assert failed['error'] == 'Failed to create post: 500'
+    assert uploaded['image_asset_id'] == 'urn:li:digitalmediaAsset:a.jpg'
+    # An already uploaded asset is reused, not uploaded (or reported) again
+    assert reused['image_asset_id'] is None
+    assert ('hello', 'urn:li:digitalmediaAsset:b') in api.created
+
+def test_failed_image_upload_does_not_create_the_post():
+    api = StubAsyncAPI(upload_error=LinkedInAPIError('Image upload failed: 503', 503))
+    
+    [result] = asyncio.run(publish_many(api, [job(1, image_path='a.jpg')]))
+    
+    assert api.created == []
+    assert result['exception'] is api.upload_error
+    assert (result['image_asset_id'], result['linkedin_post_id']) == (None, None)
+
+def test_publish_many_skips_jobs_before_create_turns_down():
+    api = StubAsyncAPI()
+    jobs = [job(1, 'kept'), job(2, 'dropped', image_path='a.jpg')]
+    
+    kept, dropped = asyncio.run(publish_many(api, jobs, before_create=lambda job: job['post_id'] == 1))
+    
+    assert api.created == [('kept', None)]
+    assert not kept['skipped'] and dropped['skipped']
+    # The upload already happened, so its asset is still reported for reuse
+    assert dropped['image_asset_id'] == 'urn:li:digitalmediaAsset:a.jpg'
+
+def test_publish_batch_against_the_fake_server(app, fake_linkedin, tmp_path):
+    image_path = tmp_path / 'image.jpg'
+    image_path.write_bytes(b'jpeg')
+    app.config['PUBLISH_ASYNC_CONCURRENCY'] = 2
+    jobs = [job(1), job(2, image_path=str(image_path)), job(3, image_path=str(tmp_path / 'missing.jpg'))]
+    
+    ok, with_image, missing_image = asyncio.run(publish_batch(app.config, jobs))
+    
+    assert ok['linkedin_post_id'] and ok['exception'] is None
+    assert with_image['linkedin_post_id'] and with_image['image_asset_id']
+    assert isinstance(missing_image['exception'], FileNotFoundError)
+    assert missing_image['linkedin_post_id'] is None
+    assert fake_linkedin.state.stats()['posts'] == 2
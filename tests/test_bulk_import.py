@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+from datetime import datetime
+import pytest
+from bulk_import import iter_rows, import_posts, text_stream, validate_row
+
+NOW = datetime(2026, 1, 1)
+
+def run_import(data, fmt='jsonl'):
+    rows = iter_rows(text_stream(io.BytesIO(data)), fmt)
+    return list(import_posts(1, rows, dry_run=True))
+
+@pytest.mark.parametrize('row', [
+    {'content': 5},
+    {'content': 'hello', 'scheduled_time': 1234},
+    {'content': 'hello', 'status': ['draft']},
+])
+def test_validate_row_rejects_non_string_fields(row):
+    with pytest.raises(ValueError, match='must be a string'):
+        validate_row(json.dumps(row), 1, NOW)
+
+def test_non_string_row_is_reported_and_import_continues():
+    data = b'{"content": 5}\n{"content": "fine"}\n'
+    events = run_import(data)
+    
+    assert events[0] == {'event': 'error', 'line': 1, 'error': 'content must be a string, not int'}
+    assert events[-1]['event'] == 'done'
+    assert events[-1]['imported'] == 1
+    assert events[-1]['failed'] == 1
+
+def test_invalid_utf8_ends_import_with_an_error_and_a_summary():
+    valid = b''.join(b'{"content": "post %d"}\n' % i for i in range(1000))
+    events = run_import(valid + b'{"content": "\xff\xfe"}\n')
+    
+    assert events[-2]['event'] == 'error'
+    assert 'not valid UTF-8' in events[-2]['error']
+    assert events[-1]['event'] == 'done'
+    assert 0 < events[-1]['imported'] <= 1000
+
+def test_unreadable_csv_ends_import_with_an_error_and_a_summary():
+    valid = b'content\n' + b''.join(b'post %d\n' % i for i in range(3))
+    # The csv module gives up on a field above its size limit
+    bad_row = b'"' + b'x' * (csv.field_size_limit() + 1) + b'"\n'
+    events = run_import(valid + bad_row + b'post after\n', fmt='csv')
+    
+    assert events[-2]['event'] == 'error'
+    assert 'CSV could not be read after 3 rows' in events[-2]['error']
+    assert events[-1]['event'] == 'done'
+    assert events[-1]['imported'] == 3
@@ -0,0 +1,15 @@
+import pytest
+from bulk_operations import MAX_SHIFT_MINUTES, parse_shift_minutes
+
+@pytest.mark.parametrize('value, minutes', [(120, 120), (-30, -30), ('45', 45), (' -5 ', -5)])
+def test_parse_shift_minutes_accepts_whole_numbers(value, minutes):
+    assert parse_shift_minutes(value) == minutes
+
+@pytest.mark.parametrize('value', [1.5, 2.0, 'abc', '1.5', '+-5', '', None, 0, '0', True, [10], {'m': 1}])
+def test_parse_shift_minutes_rejects_anything_else(value):
+    with pytest.raises(ValueError, match='shift_minutes must be a non-zero whole number'):
+        parse_shift_minutes(value)
+
+def test_parse_shift_minutes_rejects_out_of_range_shifts():
+    with pytest.raises(ValueError, match='shift_minutes must be between'):
+        parse_shift_minutes(MAX_SHIFT_MINUTES + 1)
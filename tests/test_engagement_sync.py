@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+import pytest
+from database import db, User, Post, PostStatus
+from engagement_sync import sync_engagement
+from rate_limiter import RateLimiter
+
+class StubLinkedInAPI:
+    def __init__(self):
+        self.polled = []
+    
+    def get_post_stats(self, access_token, post_id, member_id=None):
+        self.polled.append(post_id)
+        return {'likesSummary': {'totalLikes': 3}, 'commentsSummary': {'aggregatedTotalComments': 1}}
+
+@pytest.fixture
+def members(app):
+    now = datetime.utcnow()
+    throttled = User(linkedin_id='throttled', name='Throttled', access_token='t1')
+    other = User(linkedin_id='other', name='Other', access_token='t2')
+    db.session.add_all([throttled, other])
+    db.session.flush()
+    # The throttled member's posts are the newest, so they are claimed first
+    for i in range(5):
+        db.session.add(Post(user_id=throttled.id, content='t', status=PostStatus.PUBLISHED,
+                            linkedin_post_id=f'urn:li:share:t{i}', published_time=now - timedelta(minutes=i + 1)))
+    for i in range(2):
+        db.session.add(Post(user_id=other.id, content='o', status=PostStatus.PUBLISHED,
+                            linkedin_post_id=f'urn:li:share:o{i}', published_time=now - timedelta(hours=1, minutes=i)))
+    db.session.commit()
+    return throttled, other
+
+def test_throttled_member_does_not_starve_other_members(app, members):
+    throttled, other = members
+    limiter = RateLimiter(app)
+    limiter.block(throttled.linkedin_id, retry_after=600)
+    api = StubLinkedInAPI()
+    now = datetime.utcnow()
+    
+    config = {'ENGAGEMENT_SYNC_BATCH_SIZE': 2, 'ENGAGEMENT_SYNC_MAX_PER_RUN': 10}
+    summary = sync_engagement(config, api, now=now)
+    
+    assert summary == {'synced': 2, 'failed': 0, 'deferred': 5}
+    assert sorted(api.polled) == ['urn:li:share:o0', 'urn:li:share:o1']
+    
+    # The throttled member's posts wait until the block has passed
+    for post in Post.query.filter_by(user_id=throttled.id):
+        assert post.engagement_next_sync_at >= now + timedelta(seconds=590)
+        assert post.engagement_synced_at is None
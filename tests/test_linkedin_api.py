@@ -0,0 +1,60 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import pytest
+from async_linkedin_api import AsyncLinkedInAPI
+from linkedin_api import LinkedInAPI, LinkedInAPIError
+from retry_policy import FailureClass, classify_failure
+
+class CreatePostHandler(BaseHTTPRequestHandler):
+    """Answers every POST with the status and body set on the server"""
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        status, body = self.server.reply
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), CreatePostHandler)
+    httpd.reply = (201, b'{"id": "urn:li:share:1"}')
+    threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/v2"
+
+def create_post(server):
+    api = LinkedInAPI('id', 'secret', 'http://localhost/callback', base_url=base_url(server))
+    return api.create_post('token', 'member', 'hello')
+
+def create_post_async(server):
+    async def run():
+        async with AsyncLinkedInAPI(base_url=base_url(server)) as api:
+            return await api.create_post('token', 'member', 'hello')
+    return asyncio.run(run())
+
+@pytest.mark.parametrize('create', [create_post, create_post_async])
+def test_create_post_returns_the_new_id(server, create):
+    assert create(server) == 'urn:li:share:1'
+
+@pytest.mark.parametrize('create', [create_post, create_post_async])
+@pytest.mark.parametrize('body', [b'<html>Created</html>', b'', b'["urn:li:share:1"]', b'{}'])
+def test_success_without_a_readable_id_is_a_permanent_failure(server, create, body):
+    server.reply = (201, body)
+    
+    with pytest.raises(LinkedInAPIError) as raised:
+        create(server)
+    
+    # The post was probably created, so it must not be retried like a network error
+    assert raised.value.status_code == 201
+    assert classify_failure(raised.value) == FailureClass.PERMANENT
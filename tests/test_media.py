@@ -0,0 +1,104 @@
+import hashlib
+import io
+import os
+from PIL import Image
+import pytest
+from werkzeug.datastructures import FileStorage
+from database import db, MediaFile, MediaStatus
+from media import MediaPipeline, process_image
+
+@pytest.fixture
+def mpo_path(tmp_path):
+    """A two-picture MPO, as phone cameras write them"""
+    path = tmp_path / 'photo.jpg'
+    frames = [Image.new('RGB', (4000, 3000), color) for color in ('red', 'blue')]
+    frames[0].save(path, format='MPO', save_all=True, append_images=frames[1:])
+    return path
+
+def test_mpo_is_decoded_in_draft_mode(mpo_path, tmp_path):
+    with Image.open(mpo_path) as img:
+        assert img.format == 'MPO'
+    
+    report = process_image(mpo_path, tmp_path / 'out.jpg', max_size=(1200, 1200))
+    
+    assert report['source_format'] == 'MPO'
+    assert report['source_size'] == (4000, 3000)
+    # libjpeg scaled by 1/2 while decoding instead of decoding all 12 megapixels
+    assert report['decoded_size'] == (2000, 1500)
+    assert report['output_size'] == (1200, 900)
+
+def test_mpo_rendition_is_a_plain_jpeg(mpo_path, tmp_path):
+    output_path = tmp_path / 'out.jpg'
+    process_image(mpo_path, output_path, max_size=(1200, 1200))
+    
+    with Image.open(output_path) as img:
+        assert img.format == 'JPEG'
+        assert img.size == (1200, 900)
+        assert img.getpixel((600, 450))[0] > 200
+
+@pytest.fixture
+def pipeline(app):
+    pipeline = MediaPipeline(app)
+    for path in (pipeline.output_path('a.jpg'), pipeline.raw_path('a.jpg')):
+        open(path, 'wb').close()
+    db.session.add(MediaFile(content_hash='a' * 64, filename='a.jpg', status=MediaStatus.READY, ref_count=1))
+    db.session.commit()
+    return pipeline
+
+def test_release_keeps_files_when_the_transaction_rolls_back(pipeline):
+    pipeline.release('a' * 64)
+    db.session.rollback()
+    
+    assert db.session.get(MediaFile, 'a' * 64) is not None
+    assert os.path.exists(pipeline.output_path('a.jpg'))
+    assert os.path.exists(pipeline.raw_path('a.jpg'))
+    
+    # Nothing is left queued for a later, unrelated commit
+    db.session.commit()
+    assert os.path.exists(pipeline.output_path('a.jpg'))
+
+def test_release_removes_files_only_after_commit(pipeline):
+    pipeline.release('a' * 64)
+    assert os.path.exists(pipeline.output_path('a.jpg'))
+    
+    db.session.commit()
+    assert db.session.get(MediaFile, 'a' * 64) is None
+    assert not os.path.exists(pipeline.output_path('a.jpg'))
+    assert not os.path.exists(pipeline.raw_path('a.jpg'))
+
+def png_bytes():
+    buf = io.BytesIO()
+    Image.new('RGB', (20, 20), 'green').save(buf, format='PNG')
+    return buf.getvalue()
+
+def store(pipeline, data):
+    return pipeline.store_upload(FileStorage(stream=io.BytesIO(data), filename='image.png'), '.png')
+
+@pytest.mark.parametrize('status', [MediaStatus.READY, MediaStatus.PENDING])
+def test_uploading_stored_content_again_only_adds_a_reference(pipeline, status):
+    data = png_bytes()
+    content_hash = hashlib.sha256(data).hexdigest()
+    db.session.add(MediaFile(content_hash=content_hash, filename=f'{content_hash}.png', status=status, ref_count=1))
+    db.session.commit()
+    
+    media, created = store(pipeline, data)
+    
+    assert not created
+    assert (media.status, media.ref_count) == (status, 2)
+    assert os.listdir(pipeline.raw_folder) == ['a.jpg']
+
+def test_uploading_content_that_failed_processing_retries_it(pipeline):
+    data = png_bytes()
+    content_hash = hashlib.sha256(data).hexdigest()
+    db.session.add(MediaFile(content_hash=content_hash, filename=f'{content_hash}.png',
+                             status=MediaStatus.FAILED, ref_count=1))
+    db.session.commit()
+    
+    media, created = store(pipeline, data)
+    db.session.commit()
+    
+    # The caller enqueues it again, as for new content
+    assert created
+    assert (media.status, media.ref_count) == (MediaStatus.PENDING, 2)
+    with open(pipeline.raw_path(media.filename), 'rb') as raw:
+        assert raw.read() == data
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, select, update
+from database import (
+    db, User, Post, PostStatus, UserPostCounter, delete_posts, insert_posts, rebuild_user_stats, update_posts
+)
+
+@pytest.fixture
+def user(app):
+    user = User(linkedin_id='member', name='Member', access_token='token')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def counters(user_id):
+    row = db.session.get(UserPostCounter, user_id, populate_existing=True)
+    return {status.value: getattr(row, status.value) for status in PostStatus}
+
+def recount(user_id):
+    counts = {status.value: 0 for status in PostStatus}
+    rows = db.session.execute(
+        select(Post.status, func.count(Post.id)).where(Post.user_id == user_id).group_by(Post.status)
+    )
+    for status, count in rows:
+        counts[status.value] = count
+    return counts
+
+def test_orm_inserts_status_changes_and_deletes_keep_counters_in_step(user):
+    posts = [Post(user_id=user.id, content=f'post {i}', status=status)
+             for i, status in enumerate([PostStatus.DRAFT, PostStatus.DRAFT, PostStatus.SCHEDULED, None])]
+    db.session.add_all(posts)
+    db.session.commit()
+    assert counters(user.id) == recount(user.id) == {**recount(user.id), 'draft': 3, 'scheduled': 1}
+    
+    posts[0].status = PostStatus.SCHEDULED
+    posts[2].status = PostStatus.PUBLISHED
+    posts[3].status = PostStatus.FAILED
+    db.session.commit()
+    assert counters(user.id) == recount(user.id)
+    
+    # A status set and set back in one flush is no change at all
+    posts[1].status = PostStatus.CANCELLED
+    posts[1].status = PostStatus.DRAFT
+    posts[3].content = 'edited, status untouched'
+    db.session.delete(posts[2])
+    db.session.commit()
+    assert counters(user.id) == recount(user.id) == {
+        'draft': 1, 'scheduled': 1, 'published': 0, 'failed': 1, 'cancelled': 0
+    }
+
+def test_bulk_helpers_keep_counters_in_step(user):
+    now = datetime.utcnow()
+    insert_posts([
+        {'user_id': user.id, 'content': f'post {i}', 'status': status, 'scheduled_time': now + timedelta(hours=i)}
+        for i, status in enumerate([PostStatus.SCHEDULED] * 4 + [PostStatus.DRAFT] * 2)
+    ])
+    db.session.commit()
+    assert counters(user.id) == recount(user.id)
+    
+    own_posts = [Post.user_id == user.id]
+    update_posts(own_posts + [Post.scheduled_time < now + timedelta(hours=2)],
+                 {'status': PostStatus.CANCELLED}, (PostStatus.SCHEDULED, PostStatus.DRAFT))
+    db.session.commit()
+    assert counters(user.id) == recount(user.id)
+    
+    # Rows already in the target status are matched but not counted twice
+    update_posts(own_posts, {'status': PostStatus.DRAFT}, (PostStatus.DRAFT, PostStatus.CANCELLED))
+    db.session.commit()
+    assert counters(user.id) == recount(user.id)
+    
+    delete_posts(own_posts + [Post.status == PostStatus.DRAFT])
+    db.session.commit()
+    assert counters(user.id) == recount(user.id) == {
+        'draft': 0, 'scheduled': 2, 'published': 0, 'failed': 0, 'cancelled': 0
+    }
+
+def test_counters_of_other_users_are_untouched(user):
+    other = User(linkedin_id='other', name='Other', access_token='token')
+    db.session.add(other)
+    db.session.flush()
+    db.session.add_all([Post(user_id=other.id, content='theirs', status=PostStatus.SCHEDULED),
+                        Post(user_id=user.id, content='mine', status=PostStatus.SCHEDULED)])
+    db.session.commit()
+    
+    delete_posts([Post.user_id == user.id])
+    db.session.commit()
+    assert counters(other.id) == recount(other.id) == {**recount(other.id), 'scheduled': 1}
+    assert counters(user.id) == recount(user.id)
+
+def test_rebuild_repairs_counters_and_bumps_the_version(user):
+    db.session.add_all([Post(user_id=user.id, content=f'post {i}', status=PostStatus.PUBLISHED) for i in range(3)])
+    db.session.commit()
+    
+    # Counters changed behind the app's back
+    db.session.execute(update(UserPostCounter).values(published=99, draft=-4))
+    db.session.commit()
+    version = db.session.get(UserPostCounter, user.id, populate_existing=True).version
+    
+    rebuild_user_stats(user.id)
+    assert counters(user.id) == recount(user.id)
+    assert db.session.get(UserPostCounter, user.id, populate_existing=True).version == version + 1
@@ -0,0 +1,76 @@
+import pytest
+from linkedin_api import LinkedInAPI
+from rate_limiter import APP_BUCKET, RateLimited, RateLimiter, member_bucket
+
+@pytest.fixture
+def limiter(app):
+    # Members: 2 tokens, one more a second; the app: 3 tokens, one more an hour
+    app.config.update(RATE_LIMIT_MEMBER_BURST=2, RATE_LIMIT_MEMBER_PER_HOUR=3600,
+                      RATE_LIMIT_APP_BURST=3, RATE_LIMIT_APP_PER_HOUR=1)
+    return RateLimiter(app)
+
+def level(limiter, key):
+    [bucket] = limiter.levels([key])
+    return bucket
+
+def test_bucket_starts_full_and_refills_at_its_rate(limiter):
+    key = member_bucket('a')
+    assert limiter.try_acquire(key, now=1000) == 0
+    assert limiter.try_acquire(key, now=1000) == 0
+    assert limiter.try_acquire(key, now=1000) == pytest.approx(1)
+    assert limiter.try_acquire(key, now=1000.25) == pytest.approx(0.75)
+    assert limiter.try_acquire(key, now=1001) == 0
+
+def test_refill_stops_at_capacity(limiter):
+    key = member_bucket('a')
+    limiter.try_acquire(key, now=1000)
+    # An hour idle refills to the burst size, not to 3600 tokens
+    assert [limiter.try_acquire(key, now=4600) for _ in range(3)] == [0, 0, pytest.approx(1)]
+
+def test_reserve_takes_member_and_app_tokens_and_refunds_the_member_when_the_app_is_empty(limiter):
+    assert limiter.reserve('a') == (0, None)
+    assert limiter.reserve('b') == (0, None)
+    assert limiter.reserve('b') == (0, None)
+    assert level(limiter, APP_BUCKET)['tokens'] == pytest.approx(0, abs=0.01)
+    
+    wait, key = limiter.reserve('a')
+    assert key == APP_BUCKET
+    assert wait == pytest.approx(3600, abs=1)
+    # The member token taken before the app bucket said no is put back
+    assert level(limiter, member_bucket('a'))['tokens'] == pytest.approx(1, abs=0.1)
+
+def test_acquire_raises_past_max_wait(limiter):
+    for _ in range(3):
+        limiter.acquire()
+    
+    with pytest.raises(RateLimited) as raised:
+        limiter.acquire(max_wait=0)
+    assert raised.value.key == APP_BUCKET
+    assert raised.value.retry_after == pytest.approx(3600, abs=1)
+    assert not raised.value.from_linkedin
+
+def test_block_holds_the_bucket_until_retry_after_then_refills_from_empty(limiter):
+    limiter.block('a', retry_after=120)
+    
+    bucket = level(limiter, member_bucket('a'))
+    assert bucket['blocked_for_seconds'] == pytest.approx(120, abs=1)
+    # Nothing refills while blocked, so the first token comes a second after the block
+    wait = limiter.try_acquire(member_bucket('a'))
+    assert wait == pytest.approx(121, abs=1)
+    
+    # A shorter block never cuts an existing one short
+    limiter.block('a', retry_after=30)
+    assert level(limiter, member_bucket('a'))['blocked_for_seconds'] == pytest.approx(120, abs=1)
+
+def test_linkedin_429_blocks_the_member(app, limiter, fake_linkedin):
+    fake_linkedin.state.config.throttle_rate = 1.0
+    fake_linkedin.state.config.retry_after = 90
+    api = LinkedInAPI('id', 'secret', 'http://localhost/callback', rate_limiter=limiter,
+                      base_url=app.config['LINKEDIN_API_BASE_URL'])
+    
+    with pytest.raises(RateLimited) as raised:
+        api.create_post('token', 'member', 'hello')
+    
+    assert raised.value.from_linkedin
+    assert (raised.value.key, raised.value.retry_after) == (member_bucket('member'), 90)
+    assert level(limiter, member_bucket('member'))['blocked_for_seconds'] == pytest.approx(90, abs=1)
@@ -0,0 +1,50 @@
+import random
+import pytest
+from linkedin_api import LinkedInAPIError
+from rate_limiter import RateLimited
+from retry_policy import FailureClass, RetryPolicy, classify_failure
+
+@pytest.mark.parametrize('error, failure_class', [
+    (RateLimited('member:m', 30), FailureClass.RATE_LIMIT),
+    (LinkedInAPIError('throttled', 429), FailureClass.RATE_LIMIT),
+    (LinkedInAPIError('server error', 500), FailureClass.TRANSIENT),
+    (LinkedInAPIError('bad gateway', 502), FailureClass.TRANSIENT),
+    (LinkedInAPIError('timeout', 408), FailureClass.TRANSIENT),
+    (LinkedInAPIError('no response'), FailureClass.TRANSIENT),
+    (LinkedInAPIError('bad request', 400), FailureClass.PERMANENT),
+    (LinkedInAPIError('unauthorized', 401), FailureClass.PERMANENT),
+    (LinkedInAPIError('created without an id', 201), FailureClass.PERMANENT),
+    (FileNotFoundError('image.jpg'), FailureClass.PERMANENT),
+    (ConnectionError('reset'), FailureClass.TRANSIENT),
+])
+def test_classify_failure(error, failure_class):
+    assert classify_failure(error) == failure_class
+
+@pytest.mark.parametrize('failure_class, cap', [
+    (FailureClass.TRANSIENT, 3),
+    (FailureClass.RATE_LIMIT, 10),
+    (FailureClass.PERMANENT, 1),
+])
+def test_each_failure_class_has_its_own_cap(failure_class, cap):
+    policy = RetryPolicy(rng=random.Random(1))
+    assert all(policy.next_delay(failure_class, attempt) is not None for attempt in range(1, cap))
+    assert policy.next_delay(failure_class, cap) is None
+
+def test_caps_come_from_config():
+    policy = RetryPolicy.from_config({'RETRY_MAX_ATTEMPTS_TRANSIENT': 5, 'RETRY_MAX_ATTEMPTS_PERMANENT': 2})
+    assert policy.next_delay(FailureClass.TRANSIENT, 4) is not None
+    assert policy.next_delay(FailureClass.TRANSIENT, 5) is None
+    assert policy.next_delay(FailureClass.PERMANENT, 1) is not None
+    assert policy.next_delay(FailureClass.PERMANENT, 2) is None
+
+def test_transient_backoff_grows_with_equal_jitter_up_to_the_maximum():
+    policy = RetryPolicy(base_delay=100, max_delay=300, multiplier=2,
+                         max_attempts={FailureClass.TRANSIENT: 10}, rng=random.Random(1))
+    for attempt, backoff in [(1, 100), (2, 200), (3, 300), (6, 300)]:
+        delay = policy.next_delay(FailureClass.TRANSIENT, attempt)
+        assert backoff / 2 <= delay <= backoff
+
+def test_rate_limit_delay_follows_retry_after():
+    policy = RetryPolicy(rate_limit_jitter=0.1, rng=random.Random(1))
+    delay = policy.next_delay(FailureClass.RATE_LIMIT, 1, retry_after=600)
+    assert 600 <= delay <= 660
@@ -0,0 +1,132 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import delete, select, update
+from database import (
+    db, User, Post, PostStatus, UserDailyStats, UserHourlyStats, insert_posts, rebuild_all_user_rollups, update_posts
+)
+
+MONDAY_MORNING = datetime(2026, 10, 12, 9, 30)
+TUESDAY_EVENING = datetime(2026, 10, 13, 17, 5)
+FIELDS = ('published', 'failed', 'scheduled', 'likes', 'comments')
+ENGAGEMENT = ('published', 'likes', 'comments')
+
+@pytest.fixture
+def user(app):
+    user = User(linkedin_id='member', name='Member', access_token='token')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def rollups(user_id):
+    """The stored rollup rows as {key: {field: count}}, zero counts left out"""
+    tables = {}
+    for model, key in ((UserDailyStats, lambda row: row.day),
+                       (UserHourlyStats, lambda row: (row.weekday, row.hour))):
+        rows = db.session.scalars(select(model).where(model.user_id == user_id).execution_options(populate_existing=True))
+        tables[model] = {key(row): {field: getattr(row, field) for field in FIELDS if getattr(row, field)}
+                         for row in rows}
+        tables[model] = {key: counts for key, counts in tables[model].items() if counts}
+    return tables
+
+def recount(user_id):
+    """The rollups recounted from the posts, dated the way a rebuild dates them"""
+    daily = defaultdict(Counter)
+    hourly = defaultdict(Counter)
+    for post in db.session.scalars(select(Post).where(Post.user_id == user_id).execution_options(populate_existing=True)):
+        events = []
+        if post.scheduled_time:
+            events.append((post.created_at, 'scheduled', 1))
+        if post.status == PostStatus.PUBLISHED:
+            events += [(post.published_time, 'published', 1), (post.published_time, 'likes', post.like_count or 0),
+                       (post.published_time, 'comments', post.comment_count or 0)]
+        elif post.status == PostStatus.FAILED:
+            events.append((post.updated_at, 'failed', 1))
+        for when, field, amount in events:
+            daily[when.date()][field] += amount
+            hourly[(when.weekday(), when.hour)][field] += amount
+    return {model: {key: {field: n for field, n in counts.items() if n} for key, counts in table.items() if +counts}
+            for model, table in ((UserDailyStats, daily), (UserHourlyStats, hourly))}
+
+def only(tables, fields):
+    return {model: {key: {f: n for f, n in counts.items() if f in fields} for key, counts in table.items()
+                    if any(f in fields for f in counts)}
+            for model, table in tables.items()}
+
+def totals(tables, model=UserDailyStats):
+    return sum((Counter(counts) for counts in tables[model].values()), Counter())
+
+def assert_matches_recount(user_id):
+    """Engagement is dated by published_time, so it matches exactly; live
+    scheduled/failed events are dated by the clock at the change, so only
+    their totals are compared."""
+    stored, expected = rollups(user_id), recount(user_id)
+    assert only(stored, ENGAGEMENT) == only(expected, ENGAGEMENT)
+    for model in (UserDailyStats, UserHourlyStats):
+        assert totals(stored, model) == totals(expected, model)
+
+def test_orm_changes_keep_rollups_in_step(user):
+    published = [Post(user_id=user.id, content=f'post {i}', status=PostStatus.PUBLISHED, published_time=when)
+                 for i, when in enumerate([MONDAY_MORNING, MONDAY_MORNING, TUESDAY_EVENING])]
+    # Already has engagement when added, as an imported post would
+    published[2].like_count = 4
+    scheduled = Post(user_id=user.id, content='later', status=PostStatus.SCHEDULED,
+                     scheduled_time=datetime.utcnow() + timedelta(days=1))
+    draft = Post(user_id=user.id, content='draft')
+    db.session.add_all(published + [scheduled, draft])
+    db.session.commit()
+    assert_matches_recount(user.id)
+    
+    published[0].like_count, published[0].comment_count = 10, 2
+    published[1].like_count = 3
+    db.session.commit()
+    published[0].like_count = 7
+    published[2].comment_count = 1
+    draft.status = PostStatus.FAILED
+    scheduled.status = PostStatus.PUBLISHED
+    scheduled.published_time = TUESDAY_EVENING
+    db.session.commit()
+    assert_matches_recount(user.id)
+    
+    stored = rollups(user.id)
+    assert stored[UserDailyStats][MONDAY_MORNING.date()] == {'published': 2, 'likes': 10, 'comments': 2}
+    assert stored[UserHourlyStats][(1, 17)] == {'published': 2, 'likes': 4, 'comments': 1}
+    assert totals(stored) == Counter(published=4, failed=1, scheduled=1, likes=14, comments=3)
+
+def test_bulk_helpers_keep_rollups_in_step(user):
+    later = datetime.utcnow() + timedelta(days=1)
+    insert_posts(
+        [{'user_id': user.id, 'content': 'out', 'status': PostStatus.PUBLISHED, 'published_time': when,
+          'like_count': likes} for when, likes in ((MONDAY_MORNING, 5), (TUESDAY_EVENING, 0))]
+        + [{'user_id': user.id, 'content': 'queued', 'status': PostStatus.SCHEDULED, 'scheduled_time': later}] * 3
+    )
+    db.session.commit()
+    assert_matches_recount(user.id)
+    
+    update_posts([Post.user_id == user.id], {'status': PostStatus.FAILED}, (PostStatus.SCHEDULED,))
+    db.session.commit()
+    assert_matches_recount(user.id)
+    assert totals(rollups(user.id)) == Counter(published=2, failed=3, scheduled=3, likes=5)
+
+def test_rebuild_matches_the_recount(user):
+    other = User(linkedin_id='other', name='Other', access_token='token')
+    db.session.add(other)
+    db.session.flush()
+    db.session.add_all([
+        Post(user_id=user.id, content='out', status=PostStatus.PUBLISHED, published_time=MONDAY_MORNING, like_count=6),
+        Post(user_id=user.id, content='lost', status=PostStatus.FAILED, scheduled_time=MONDAY_MORNING),
+        Post(user_id=other.id, content='theirs', status=PostStatus.PUBLISHED, published_time=TUESDAY_EVENING,
+             comment_count=2),
+    ])
+    db.session.commit()
+    
+    # Rollups drifted: a stray row and a wrong count
+    db.session.add(UserDailyStats(user_id=user.id, day=TUESDAY_EVENING.date(), published=5))
+    db.session.execute(update(UserHourlyStats).where(UserHourlyStats.user_id == other.id).values(comments=40))
+    db.session.execute(delete(UserDailyStats).where(UserDailyStats.user_id == other.id))
+    db.session.commit()
+    
+    rebuild_all_user_rollups()
+    for member in (user, other):
+        assert rollups(member.id) == recount(member.id)
+    assert rollups(user.id)[UserDailyStats][MONDAY_MORNING.date()] == {'published': 1, 'likes': 6}
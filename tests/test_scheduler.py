@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+import pytest
+from database import db, User, Post, PostStatus
+from rate_limiter import RateLimited
+from scheduler import PostScheduler
+
+class StubLinkedInAPI:
+    def __init__(self):
+        self.created = []
+    
+    def create_post(self, access_token, person_id, content, image_asset_id=None):
+        self.created.append(content)
+        return f'urn:li:share:{len(self.created)}'
+
+def make_scheduler(app, api=None):
+    # Not started: tests drive the scheduler's methods directly
+    scheduler = PostScheduler()
+    scheduler.app = app
+    scheduler.mode = 'dispatcher'
+    scheduler.linkedin_api = api or StubLinkedInAPI()
+    return scheduler
+
+@pytest.fixture
+def due_posts(app):
+    user = User(linkedin_id='member', name='Member', access_token='token')
+    db.session.add(user)
+    db.session.flush()
+    now = datetime.utcnow()
+    posts = [Post(user_id=user.id, content=f'post {i}', status=PostStatus.SCHEDULED,
+                  scheduled_time=now - timedelta(minutes=1)) for i in range(3)]
+    db.session.add_all(posts)
+    db.session.commit()
+    return [post.id for post in posts]
+
+def test_claimed_posts_are_not_claimed_again_until_the_lease_expires(app, due_posts):
+    first, second = make_scheduler(app), make_scheduler(app)
+    now = datetime.utcnow()
+    
+    token, claimed = first.claim_posts(10, now=now)
+    assert sorted(claimed) == sorted(due_posts)
+    assert second.claim_posts(10, now=now)[1] == []
+    
+    after_lease = now + timedelta(seconds=app.config.get('DISPATCH_LEASE_SECONDS', 300) + 1)
+    other_token, reclaimed = second.claim_posts(10, now=after_lease)
+    assert sorted(reclaimed) == sorted(due_posts)
+    assert other_token != token
+
+def test_extend_lease_renews_only_posts_still_held(app, due_posts):
+    scheduler = make_scheduler(app)
+    token, claimed = scheduler.claim_posts(10)
+    db.session.execute(db.update(Post).where(Post.id == claimed[0]).values(claimed_by='other worker'))
+    db.session.commit()
+    
+    assert sorted(scheduler.extend_lease(claimed, token)) == sorted(claimed[1:])
+
+def test_publish_post_stops_when_another_worker_took_the_lease(app, due_posts, monkeypatch):
+    api = StubLinkedInAPI()
+    scheduler = make_scheduler(app, api)
+    token, claimed = scheduler.claim_posts(1)
+    
+    def slow_token_check(user):
+        # The lease runs out while waiting and another worker claims the post
+        db.session.execute(db.update(Post).where(Post.id == claimed[0]).values(claimed_by='other worker'))
+        db.session.commit()
+        return True
+    monkeypatch.setattr(scheduler, '_ensure_token', slow_token_check)
+    
+    scheduler.publish_post(claimed[0], claim_token=token)
+    
+    assert api.created == []
+    post = db.session.get(Post, claimed[0])
+    assert post.status == PostStatus.SCHEDULED
+    assert post.claimed_by == 'other worker'
+
+def test_publish_post_publishes_while_it_holds_the_lease(app, due_posts):
+    api = StubLinkedInAPI()
+    scheduler = make_scheduler(app, api)
+    token, claimed = scheduler.claim_posts(1)
+    
+    scheduler.publish_post(claimed[0], claim_token=token)
+    
+    post = db.session.get(Post, claimed[0])
+    assert post.status == PostStatus.PUBLISHED
+    assert post.claimed_by is None
+    assert api.created == [post.content]
+
+def test_publish_posts_async_skips_posts_claimed_away_mid_batch(app, due_posts, fake_linkedin, monkeypatch):
+    scheduler = make_scheduler(app)
+    token, claimed = scheduler.claim_posts(10)
+    stolen = claimed[0]
+    
+    extend_lease = scheduler.extend_lease
+    def extend_after_takeover(post_ids, claim_token):
+        db.session.execute(db.update(Post).where(Post.id == stolen).values(claimed_by='other worker'))
+        db.session.commit()
+        return extend_lease(post_ids, claim_token)
+    monkeypatch.setattr(scheduler, 'extend_lease', extend_after_takeover)
+    
+    scheduler.publish_posts_async(claimed, claim_token=token)
+    
+    statuses = {post.id: (post.status, post.claimed_by) for post in Post.query}
+    assert statuses[stolen] == (PostStatus.SCHEDULED, 'other worker')
+    assert all(statuses[post_id] == (PostStatus.PUBLISHED, None) for post_id in claimed[1:])
+    assert fake_linkedin.state.stats()['posts'] == 2
+
+def test_local_rate_limit_defers_without_using_an_attempt(app, due_posts):
+    scheduler = make_scheduler(app)
+    post = db.session.get(Post, due_posts[0])
+    post.rate_limit_count = 9
+    
+    for _ in range(20):
+        assert scheduler.record_failure(post, RateLimited('member:member', 30))
+    
+    assert (post.status, post.rate_limit_count) == (PostStatus.SCHEDULED, 9)
+    assert post.scheduled_time > datetime.utcnow() + timedelta(seconds=29)
+
+def test_linkedin_429s_use_up_the_rate_limit_cap(app, due_posts):
+    scheduler = make_scheduler(app)
+    post = db.session.get(Post, due_posts[0])
+    post.rate_limit_count = 8
+    throttled = RateLimited('member:member', 30, from_linkedin=True)
+    
+    assert scheduler.record_failure(post, throttled)
+    assert not scheduler.record_failure(post, throttled)
+    assert (post.status, post.rate_limit_count, post.retry_count) == (PostStatus.FAILED, 10, 0)
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import delete, update
+from database import db, User
+from user_cache import UserCache
+
+@pytest.fixture
+def user_id(app):
+    user = User(linkedin_id='member', name='Before', access_token='token')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+def elsewhere(statement):
+    """Change the users table the way another process would, behind the cache's back"""
+    db.session.execute(statement)
+    db.session.commit()
+
+def test_hit_serves_the_cached_profile(user_id):
+    cache = UserCache(ttl_seconds=60)
+    first = cache.get(user_id)
+    # A change that does not move last_login (a token refresh, say) keeps the entry
+    elsewhere(update(User).where(User.id == user_id).values(name='Renamed', access_token='refreshed'))
+    
+    assert cache.get(user_id) is first
+    assert first.name == 'Before'
+    assert first.access_token == 'refreshed'
+
+def test_user_deleted_by_another_process_is_not_served(user_id):
+    cache = UserCache(ttl_seconds=60)
+    assert cache.get(user_id) is not None
+    elsewhere(delete(User).where(User.id == user_id))
+    
+    assert cache.get(user_id) is None
+    assert cache.get(user_id) is None
+
+def test_login_through_another_process_reloads_the_profile(user_id):
+    cache = UserCache(ttl_seconds=60)
+    cache.get(user_id)
+    elsewhere(update(User).where(User.id == user_id)
+              .values(name='After', last_login=datetime.utcnow() + timedelta(seconds=1)))
+    
+    assert cache.get(user_id).name == 'After'
+
+def test_invalidate_reloads_on_the_next_get(user_id):
+    cache = UserCache(ttl_seconds=60)
+    first = cache.get(user_id)
+    cache.invalidate(user_id)
+    
+    assert cache.get(user_id) is not first
+
+def test_least_recently_used_entry_is_evicted(app):
+    users = [User(linkedin_id=f'member{i}', name=f'User {i}', access_token='token') for i in range(3)]
+    db.session.add_all(users)
+    db.session.commit()
+    cache = UserCache(ttl_seconds=60, max_size=2)
+    
+    first = cache.get(users[0].id)
+    cache.get(users[1].id)
+    cache.get(users[0].id)
+    cache.get(users[2].id)
+    
+    assert list(cache._entries) == [users[0].id, users[2].id]
+    assert cache.get(users[0].id) is first
+
+def test_zero_ttl_turns_the_cache_off(user_id):
+    cache = UserCache(ttl_seconds=0)
+    
+    assert cache.get(user_id) is not cache.get(user_id)
+    assert not cache._entries
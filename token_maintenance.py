@@ -0,0 +1,170 @@
+"""
+Access-token maintenance.
+
+Refreshes LinkedIn access tokens that are about to expire, so posts don't
+fail on an expired token. The scheduler runs refresh_expiring_tokens()
+periodically; it can also be run by hand:
+    
+    python token_maintenance.py
+    python token_maintenance.py --status
+"""
+
+from datetime import datetime, timedelta
+import sys
+from sqlalchemy import select, update, func
+from database import db, User, TokenRefreshLog, build_expiring_tokens_query
+from rate_limiter import RateLimited
+from retry_policy import classify_failure, FailureClass
+
+def refresh_user_token(linkedin_api, user):
+    """Refresh one user's access token and log the outcome (caller commits).
+    
+    Returns True on success. A refresh token LinkedIn rejects outright is
+    recorded on the user and not tried again until they reconnect.
+    RateLimited is raised without recording anything.
+    """
+    previous_expires_at = user.token_expires_at
+    user.token_refresh_attempted_at = datetime.utcnow()
+    
+    try:
+        token_data = linkedin_api.refresh_access_token(user.refresh_token)
+    except RateLimited:
+        raise
+    except Exception as e:
+        if classify_failure(e) == FailureClass.PERMANENT:
+            user.token_refresh_error = str(e)
+        db.session.add(TokenRefreshLog(
+            user_id=user.id,
+            success=False,
+            error_message=str(e),
+            previous_expires_at=previous_expires_at
+        ))
+        return False
+    
+    user.set_tokens(token_data)
+    db.session.add(TokenRefreshLog(
+        user_id=user.id,
+        success=True,
+        previous_expires_at=previous_expires_at,
+        new_expires_at=user.token_expires_at
+    ))
+    return True
+
+def claim_expiring_tokens(limit, horizon, retry_before, now):
+    """Stamp up to `limit` users due a refresh with attempted_at=now and return their ids.
+    
+    The stamp is the claim: the UPDATE re-checks the retry condition, so
+    two processes running the job never refresh the same user.
+    """
+    due = build_expiring_tokens_query(horizon, retry_before, limit)
+    db.session.execute(
+        update(User)
+        .where(
+            User.id.in_(due.scalar_subquery()),
+            db.or_(User.token_refresh_attempted_at.is_(None), User.token_refresh_attempted_at < retry_before)
+        )
+        .values(token_refresh_attempted_at=now),
+        execution_options={'synchronize_session': False}
+    )
+    user_ids = db.session.execute(
+        select(User.id).where(User.token_refresh_attempted_at == now)
+    ).scalars().all()
+    db.session.commit()
+    return user_ids
+
+def refresh_expiring_tokens(config, linkedin_api, now=None):
+    """Refresh, in batches, every token expiring within TOKEN_REFRESH_WINDOW_HOURS.
+    
+    Each refresh goes through the shared rate limiter; if it runs dry the
+    remaining users are handed back for the next run. Returns a summary of
+    refreshed / failed / deferred counts.
+    """
+    now = now or datetime.utcnow()
+    horizon = now + timedelta(hours=config.get('TOKEN_REFRESH_WINDOW_HOURS', 72))
+    retry_before = now - timedelta(minutes=config.get('TOKEN_REFRESH_RETRY_MINUTES', 60))
+    batch_size = config.get('TOKEN_REFRESH_BATCH_SIZE', 50)
+    max_per_run = config.get('TOKEN_REFRESH_MAX_PER_RUN', 500)
+    
+    summary = {'refreshed': 0, 'failed': 0, 'deferred': 0}
+    processed = 0
+    
+    while processed < max_per_run:
+        user_ids = claim_expiring_tokens(min(batch_size, max_per_run - processed), horizon, retry_before, now)
+        if not user_ids:
+            break
+        
+        for index, user_id in enumerate(user_ids):
+            user = db.session.get(User, user_id)
+            try:
+                if refresh_user_token(linkedin_api, user):
+                    summary['refreshed'] += 1
+                else:
+                    summary['failed'] += 1
+                db.session.commit()
+            except RateLimited as e:
+                # Out of API budget - release the rest of the batch for the next run
+                db.session.rollback()
+                remaining = user_ids[index:]
+                db.session.execute(
+                    update(User)
+                    .where(User.id.in_(remaining))
+                    .values(token_refresh_attempted_at=None),
+                    execution_options={'synchronize_session': False}
+                )
+                db.session.commit()
+                summary['deferred'] += len(remaining)
+                print(f"Token refresh paused by rate limiting ({e.retry_after:.0f}s)")
+                print(f"Token refresh: {summary}")
+                return summary
+        
+        processed += len(user_ids)
+        if len(user_ids) < batch_size:
+            break
+    
+    if processed:
+        print(f"Token refresh: {summary}")
+    return summary
+
+def get_token_status(now=None):
+    """Counts of users by token state, and the outcome of the last day's refreshes"""
+    now = now or datetime.utcnow()
+    counts = db.session.execute(
+        select(
+            func.count().filter(User.token_expires_at < now).label('expired'),
+            func.count().filter(User.token_refresh_error.isnot(None)).label('refresh_rejected'),
+            func.count().filter(User.refresh_token.is_(None)).label('no_refresh_token'),
+            func.count().label('users')
+        )
+    ).mappings().one()
+    recent = db.session.execute(
+        select(TokenRefreshLog.success, func.count())
+        .where(TokenRefreshLog.attempted_at >= now - timedelta(days=1))
+        .group_by(TokenRefreshLog.success)
+    ).all()
+    
+    status = dict(counts)
+    status['refreshed_last_day'] = sum(count for success, count in recent if success)
+    status['failed_last_day'] = sum(count for success, count in recent if not success)
+    return status
+
+def main():
+    from flask import Flask
+    from config import load_config
+    from linkedin_api import LinkedInAPI
+    from rate_limiter import RateLimiter
+    
+    app = Flask(__name__)
+    app.config.from_object(load_config())
+    db.init_app(app)
+    
+    with app.app_context():
+        if '--status' in sys.argv:
+            for key, value in get_token_status().items():
+                print(f"{key:20s} {value}")
+            return
+        
+        RateLimiter(app)
+        refresh_expiring_tokens(app.config, LinkedInAPI.from_config(app.config))
+
+if __name__ == '__main__':
+    main()
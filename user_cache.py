@@ -0,0 +1,108 @@
+"""
+Per-process cache of the logged-in user.
+
+Flask-Login calls load_user on every request that touches current_user.
+Instead of loading the whole User row (tokens included) each time, the web
+tier gets a SessionUser holding only the fields pages need, cached for
+USER_CACHE_TTL_SECONDS in an LRU of USER_CACHE_MAX_SIZE entries. Tokens are
+read from the database only when a request actually publishes.
+
+The cache is per process, so a hit is checked against users.last_login
+with one primary-key lookup: the OAuth callback rewrites the profile and
+last_login together, so a user deleted or logged in again through another
+process is reloaded rather than served stale. Logout and the OAuth callback
+also invalidate their own process's entry.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+from flask_login import UserMixin
+from sqlalchemy import select
+from database import db, User
+from metrics import USER_CACHE_LOOKUPS
+
+# Columns the web tier reads from current_user
+SESSION_USER_COLUMNS = ('id', 'linkedin_id', 'name', 'email', 'profile_picture')
+
+# Set whenever the profile columns are rewritten, so a changed value means a stale entry
+CHANGE_MARKER = User.last_login
+
+class SessionUser(UserMixin):
+    """The logged-in user as the web tier sees it: profile fields, tokens on demand"""
+    
+    def __init__(self, id, linkedin_id, name, email=None, profile_picture=None):
+        self.id = id
+        self.linkedin_id = linkedin_id
+        self.name = name
+        self.email = email
+        self.profile_picture = profile_picture
+    
+    @property
+    def access_token(self):
+        """Read fresh from the database; tokens are never cached"""
+        return db.session.execute(select(User.access_token).where(User.id == self.id)).scalar()
+    
+    def __repr__(self):
+        return f'<SessionUser {self.id}>'
+
+class UserCache:
+    """TTL + LRU cache of SessionUser by user id, safe to share between threads"""
+    
+    def __init__(self, ttl_seconds=60, max_size=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            ttl_seconds=config.get('USER_CACHE_TTL_SECONDS', 60),
+            max_size=config.get('USER_CACHE_MAX_SIZE', 10000)
+        )
+    
+    def get(self, user_id):
+        """The SessionUser for user_id, from the cache or one narrow query; None if there is no such user"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry and entry[0] > now:
+            marker = db.session.execute(select(CHANGE_MARKER).where(User.id == user_id)).first()
+            if marker is not None and marker[0] == entry[2]:
+                with self._lock:
+                    if user_id in self._entries:
+                        self._entries.move_to_end(user_id)
+                USER_CACHE_LOOKUPS.labels('hit').inc()
+                return entry[1]
+            USER_CACHE_LOOKUPS.labels('stale').inc()
+            self.invalidate(user_id)
+            if marker is None:
+                return None
+        else:
+            USER_CACHE_LOOKUPS.labels('miss').inc()
+        
+        row = db.session.execute(
+            select(*[getattr(User, column) for column in SESSION_USER_COLUMNS], CHANGE_MARKER.label('marker'))
+            .where(User.id == user_id)
+        ).mappings().first()
+        if row is None:
+            return None
+        
+        user = SessionUser(**{column: row[column] for column in SESSION_USER_COLUMNS})
+        if self.ttl_seconds > 0:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl_seconds, user, row['marker'])
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return user
+    
+    def invalidate(self, user_id):
+        """Forget a user, e.g. after their profile or tokens changed"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+LinkedIn Scheduler - Publisher Worker
+
+This script runs the post scheduler and the image pipeline on their own,
+without the web app, so publish throughput can be scaled separately from
+web latency. Run the web processes with RUN_SCHEDULER=false next to it.
+
+Usage:
+    python worker.py
+    python worker.py --threads 40 --media-workers 4
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from config import load_config
+from database import init_db
+from media import MediaPipeline
+from metrics import start_worker_server
+from rate_limiter import RateLimiter
+from scheduler import PostScheduler
+
+def create_worker_app(threads=None, media_workers=None, dispatch_workers=None):
+    """Create a Flask app that carries the config and database for background work only"""
+    app = Flask(__name__)
+    app.config.from_object(load_config())
+    
+    # This process always does the background work, whatever the web processes are set to
+    app.config['RUN_SCHEDULER'] = True
+    if threads:
+        app.config['SCHEDULER_THREADS'] = threads
+    if media_workers:
+        app.config['MEDIA_WORKERS'] = media_workers
+    if dispatch_workers:
+        app.config['DISPATCH_WORKERS'] = dispatch_workers
+    
+    return app
+
+def main():
+    """Run the scheduler and media pipeline until stopped"""
+    parser = argparse.ArgumentParser(description="Run the LinkedIn Scheduler publisher worker")
+    parser.add_argument('--threads', type=int, help="Scheduler threads (default: SCHEDULER_THREADS)")
+    parser.add_argument('--media-workers', type=int, help="Image processes (default: MEDIA_WORKERS)")
+    parser.add_argument('--dispatch-workers', type=int,
+                        help="Dispatcher publish threads (default: DISPATCH_WORKERS)")
+    args = parser.parse_args()
+    
+    print("🚀 Starting LinkedIn Scheduler worker...")
+    
+    app = create_worker_app(args.threads, args.media_workers, args.dispatch_workers)
+    
+    try:
+        init_db(app)
+    except Exception as e:
+        print(f"❌ Database initialization failed: {e}")
+        sys.exit(1)
+    
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    RateLimiter(app)
+    media_pipeline = MediaPipeline(app)
+    post_scheduler = PostScheduler(app)
+    
+    print("\n📋 Configuration:")
+    print(f"   - Scheduler mode: {post_scheduler.mode}")
+    print(f"   - Scheduler threads: {app.config['SCHEDULER_THREADS']}")
+    print(f"   - Media workers: {app.config['MEDIA_WORKERS']}")
+    print(f"   - Database: {app.config['SQLALCHEMY_DATABASE_URI']}")
+    
+    metrics_port = app.config['WORKER_METRICS_PORT']
+    if app.config['METRICS_ENABLED'] and metrics_port:
+        start_worker_server(metrics_port)
+        print(f"   - Metrics: http://0.0.0.0:{metrics_port}/metrics")
+    
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+    
+    # Pick up images the web processes stored, until asked to stop
+    poll_seconds = app.config['WORKER_POLL_SECONDS']
+    while not stopping.is_set():
+        try:
+            media_pipeline.recover_pending()
+        except Exception as e:
+            print(f"Error polling for pending media: {e}")
+        stopping.wait(poll_seconds)
+    
+    print("\n👋 Stopping worker...")
+    post_scheduler.shutdown()
+    media_pipeline.shutdown()
+
+if __name__ == '__main__':
+    main()